@@ -0,0 +1,142 @@
+"""
+AI Response Cache
+Caché persistente (tabla ai_cache de strategy_data.db) de las respuestas de
+OpenAI, direccionada por contenido: la clave es el sha256 de
+(modelo, prompt de sistema, prompt de usuario, temperatura), así que un prompt
+idéntico a uno anterior se responde sin llamar a la API.
+Las entradas caducan a los AI_CACHE_TTL segundos y, por encima de
+AI_CACHE_MAX_ENTRIES, se eliminan las menos usadas recientemente (LRU).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database import StrategyDatabase, db
+
+SELECT_ENTRY_SQL = '''
+    SELECT response, created_at FROM ai_cache WHERE cache_key = ?
+'''
+
+UPSERT_ENTRY_SQL = '''
+    INSERT INTO ai_cache (cache_key, model, response, created_at, last_accessed, hit_count)
+    VALUES (?, ?, ?, ?, ?, 0)
+    ON CONFLICT(cache_key) DO UPDATE SET
+        model = excluded.model,
+        response = excluded.response,
+        created_at = excluded.created_at,
+        last_accessed = excluded.last_accessed
+'''
+
+# Deja max_entries entradas: borra las de last_accessed más antiguo
+EVICT_LRU_SQL = '''
+    DELETE FROM ai_cache WHERE cache_key IN (
+        SELECT cache_key FROM ai_cache
+        ORDER BY last_accessed
+        LIMIT max(0, (SELECT COUNT(*) FROM ai_cache) - ?)
+    )
+'''
+
+
+def cache_key(model: str, messages: List[Dict], temperature: float) -> str:
+    """sha256 de (modelo, prompt de sistema, prompt de usuario, temperatura)"""
+    system_prompt = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    user_prompt = "\n".join(m["content"] for m in messages if m["role"] != "system")
+    payload = json.dumps([model, system_prompt, user_prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AIResponseCache:
+    def __init__(self, database: StrategyDatabase, ttl_seconds: float = None,
+                 max_entries: int = None, enabled: bool = None):
+        self.db = database
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None \
+            else float(os.getenv("AI_CACHE_TTL", "86400"))
+        self.max_entries = max_entries if max_entries is not None \
+            else int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+        self.enabled = enabled if enabled is not None \
+            else os.getenv("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Respuesta cacheada (texto JSON) o None si no existe o caducó"""
+        now = time.time()
+        cursor = self.db.pool.get().cursor()
+        cursor.execute(SELECT_ENTRY_SQL, (key,))
+        row = cursor.fetchone()
+
+        if row is None or now - row[1] > self.ttl_seconds:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self.db.pool.transaction() as conn:
+            conn.execute(
+                "UPDATE ai_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, key)
+            )
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        """Guarda la respuesta y aplica el límite LRU"""
+        now = time.time()
+        with self.db.pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(UPSERT_ENTRY_SQL, (key, model, response, now, now))
+            cursor.execute(EVICT_LRU_SQL, (self.max_entries,))
+            evicted = cursor.rowcount
+        if evicted > 0:
+            with self._lock:
+                self.evictions += evicted
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas caducadas (lo llama la retención)"""
+        with self.db.pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM ai_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            purged = cursor.rowcount
+        with self._lock:
+            self.expired += purged
+        return purged
+
+    def clear(self) -> int:
+        with self.db.pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM ai_cache")
+            return cursor.rowcount
+
+    def stats(self) -> Dict:
+        cursor = self.db.pool.get().cursor()
+        cursor.execute("SELECT COUNT(*) FROM ai_cache")
+        entries = cursor.fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expired": self.expired
+        }
+
+
+# Instancia global
+ai_cache = AIResponseCache(db)
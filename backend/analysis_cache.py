@@ -0,0 +1,93 @@
+"""
+Analysis Snapshot Cache
+Caché en memoria con TTL para los "snapshots" de análisis (historial + sesiones,
+horario, riesgo y símbolos) calculados a partir de un mismo deals_df.
+Las claves son (login, days_back); si varias peticiones piden la misma clave a
+la vez, solo una calcula y las demás esperan su resultado. Los snapshots con
+"error" no se guardan: la siguiente petición vuelve a intentarlo.
+
+`compute` puede tomar la sesión MT5 dentro del bloqueo de su clave, así que
+nunca debe llamarse a get_or_compute con la sesión MT5 ya tomada.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable
+
+
+class AnalysisSnapshotCache:
+    def __init__(self, ttl_seconds: float = None, max_entries: int = 32):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None \
+            else float(os.getenv("ANALYSIS_CACHE_TTL", "30"))
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, tuple] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _get_fresh(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Dict]) -> Dict:
+        """Devuelve el snapshot cacheado o lo calcula (una sola vez por clave)"""
+        snapshot = self._get_fresh(key)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        with self._key_lock(key):
+            # Otro hilo pudo calcularlo mientras esperábamos
+            snapshot = self._get_fresh(key)
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            snapshot = compute()
+
+            with self._lock:
+                if not (isinstance(snapshot, dict) and snapshot.get("error")):
+                    self._entries[key] = (time.monotonic(), snapshot)
+                if len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                    del self._entries[oldest]
+                self._prune_key_locks()
+
+            return snapshot
+
+    def _prune_key_locks(self):
+        """Quita los bloqueos de claves sin entrada que nadie tiene tomados (days_back es libre)"""
+        for key in [k for k, lock in self._key_locks.items() if k not in self._entries and not lock.locked()]:
+            del self._key_locks[key]
+
+    def invalidate(self, key: Hashable = None):
+        """Invalida una clave o toda la caché"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._prune_key_locks()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instancia global
+analysis_cache = AnalysisSnapshotCache()
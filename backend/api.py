@@ -1,24 +1,75 @@
-from fastapi import FastAPI, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
 from dotenv import load_dotenv
 import os
+import sys
+import asyncio
+import json
+import threading
 
 # Cargar variables de entorno ANTES de cualquier import que las use
 load_dotenv()
 
-from strategy_engine import analyze_trades
+# strategy_engine (pandas, numpy) y el SDK de openai se importan en el primer
+# uso o en el calentamiento en segundo plano, no al importar la API
 from strategy_templates import generate_code_and_explanation
 from openai_analyzer import ai_analyzer
 from database import db
-from openai_health_check import validate_openai_or_exit
-
-# ====== VALIDAR OPENAI AL ARRANQUE ======
-openai_status = validate_openai_or_exit(allow_continue=True)
-
-app = FastAPI()
+from openai_health_check import openai_health
+from mt5_session import mt5_session
+from analysis_cache import analysis_cache
+from retention import retention_engine
+from backup_manager import backup_manager
+from ai_cache import ai_cache
+from job_queue import job_queue
+from multi_account import multi_account_runner, load_profiles, public_profile
+from position_feed import position_feed
+
+def warm_up():
+    """
+    Inicialización diferida fuera del camino de arranque: esquema de la DB,
+    módulos de análisis (pandas/numpy) y sesión MT5. Las peticiones que
+    lleguen antes simplemente hacen esa misma inicialización bajo demanda.
+    """
+    started = datetime.now()
+    try:
+        db.ensure_schema()
+        import strategy_engine  # noqa: F401
+        # Una única sesión MT5 para todo el proceso
+        mt5_session.start()
+        print(f"✅ Calentamiento completado en {(datetime.now() - started).total_seconds():.2f}s")
+    except Exception as e:
+        print(f"⚠️ Error en el calentamiento: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Ping a OpenAI y calentamiento en segundo plano: el servidor acepta
+    # peticiones de inmediato
+    openai_health.start()
+    if os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes"):
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    retention_engine.start()
+    await job_queue.start()
+    yield
+    await position_feed.stop()
+    await job_queue.stop()
+    retention_engine.stop()
+    backup_manager.shutdown()
+    multi_account_runner.shutdown()
+    # param_optimizer (pandas, numpy) solo está cargado si se usó
+    if "param_optimizer" in sys.modules:
+        sys.modules["param_optimizer"].parameter_optimizer.shutdown()
+    mt5_session.stop()
+    db.pool.close_all()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Obtener orígenes CORS desde .env
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001")
@@ -38,16 +89,100 @@ def health_check():
     """Verifica el estado del sistema incluyendo OpenAI"""
     return {
         "status": "ok",
-        "openai_status": openai_status,
+        "openai_status": openai_health.status(),
         "mt5_required": True,
+        "mt5_session": mt5_session.status(),
+        "schema_ready": db.schema_ready,
+        "analysis_cache": analysis_cache.stats(),
+        "openai": ai_analyzer.stats(),
+        "ai_cache": ai_cache.stats(),
+        "jobs": job_queue.stats(),
+        "position_feed": position_feed.stats(),
         "database": "strategy_data.db"
     }
 
 @app.get("/analyze")
-def analyze_account():
-    result = analyze_trades()
+async def analyze_account(no_cache: bool = Query(False)):
+    from strategy_engine import analyze_trades_async
+    result = await analyze_trades_async(use_ai_cache=not no_cache)
     return result
 
+@app.get("/jobs")
+def list_jobs(limit: int = Query(50)):
+    """Lista los trabajos en segundo plano recientes"""
+    return {"jobs": job_queue.list_jobs(limit)}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Estado de un trabajo (pending, running, completed, failed, cancelled) y su resultado"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"error": f"Trabajo no encontrado: {job_id}"}
+    return job
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events del trabajo: `status` al conectar; al terminar, un evento
+    con el nombre del tipo de trabajo (p. ej. `ai_analysis`) y su resultado, o
+    `error`, y finalmente `done`
+    """
+    async def event_stream():
+        async for kind, job in job_queue.events(job_id):
+            if kind == "keepalive":
+                yield ": keepalive\n\n"
+            elif job["status"] == "completed":
+                yield _sse(job["kind"], job["result"])
+            elif job["status"] in ("failed", "cancelled"):
+                yield _sse("error", {"job_id": job_id, "status": job["status"], "error": job["error"]})
+            else:
+                yield _sse("status", {"job_id": job_id, "status": job["status"]})
+        
+        job = job_queue.get(job_id)
+        yield _sse("done", {"job_id": job_id, "status": job["status"] if job else "not_found"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/positions")
+async def positions_socket(websocket: WebSocket):
+    """
+    Posiciones abiertas en tiempo real: `snapshot` al conectar y después solo
+    `diff` (añadidas, cerradas, modificadas y P&L agregado) cuando cambian.
+    Todos los clientes comparten un único sondeo de MT5 (position_feed).
+    """
+    await websocket.accept()
+    queue = await position_feed.subscribe()
+
+    async def wait_disconnect():
+        # El cliente no envía nada: solo interesa detectar el cierre
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(wait_disconnect())
+    try:
+        while not receiver.done():
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            await websocket.send_text(json.dumps(getter.result(), default=str))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        position_feed.unsubscribe(queue)
+
 @app.get("/strategy/template")
 def get_template(strategy: str = Query(...)):
     codes = generate_code_and_explanation(strategy)
@@ -79,6 +214,12 @@ def get_strategy_history(strategy_name: str):
     evolution = db.get_strategy_evolution(strategy_name)
     return {"strategy": strategy_name, "evolution": evolution}
 
+@app.get("/history/daily/{strategy_name:path}")
+def get_strategy_daily_history(strategy_name: str, limit: int = Query(30)):
+    """Obtiene los resúmenes diarios de los snapshots antiguos de una estrategia"""
+    daily = db.get_daily_summaries(strategy_name, limit)
+    return {"strategy": strategy_name, "daily": daily}
+
 @app.get("/alerts")
 def get_alerts(limit: int = Query(10)):
     """Obtiene las últimas alertas del sistema"""
@@ -98,10 +239,48 @@ def get_symbol_performance(symbol: str):
     return performance
 
 @app.post("/backup")
-def create_backup():
-    """Crea un backup de la base de datos"""
-    backup_path = db.backup_database()
-    return {"message": "Backup creado exitosamente", "path": backup_path}
+def create_backup(compress: bool = Query(False)):
+    """Inicia un backup online de la base de datos (en segundo plano)"""
+    job = backup_manager.start_backup(compress=compress)
+    return {"message": "Backup iniciado", **job}
+
+@app.get("/backup")
+def list_backups():
+    """Lista los backups lanzados y su estado"""
+    return {"backups": backup_manager.list_jobs()}
+
+@app.get("/backup/download")
+def download_backup():
+    """Descarga un backup consistente comprimido con gzip, sin guardarlo en backups/"""
+    filename = f"strategy_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz"
+    return StreamingResponse(
+        backup_manager.stream_backup(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/backup/{backup_id}")
+def get_backup_status(backup_id: str):
+    """Estado y progreso de un backup"""
+    job = backup_manager.get_job(backup_id)
+    if job is None:
+        return {"error": f"Backup no encontrado: {backup_id}"}
+    return job
+
+@app.get("/maintenance/retention")
+def get_retention_status():
+    """Estado de la política de retención e informes de las últimas ejecuciones"""
+    return retention_engine.status()
+
+@app.post("/maintenance/retention")
+def run_retention():
+    """Ejecuta ahora la retención (compactación + VACUUM incremental)"""
+    return retention_engine.run()
+
+@app.delete("/maintenance/ai-cache")
+def clear_ai_cache():
+    """Vacía la caché de respuestas de OpenAI"""
+    return {"message": "Caché de IA vaciada", "deleted": ai_cache.clear()}
 
 
 # ===============================================================
@@ -109,17 +288,19 @@ def create_backup():
 # ===============================================================
 
 @app.get("/analyze/full")
-def analyze_full():
+async def analyze_full(no_cache: bool = Query(False)):
     """
     Análisis completo con todas las métricas históricas y análisis IA
     Este endpoint reemplaza a /analyze cuando se quiere el análisis completo
+    (no_cache=true omite la caché de respuestas de IA)
     """
-    result = analyze_trades()
+    from strategy_engine import analyze_trades_async
+    result = await analyze_trades_async(use_ai_cache=not no_cache)
     return result
 
 
 @app.post("/strategy/optimize")
-def optimize_strategy(strategy_data: Dict):
+async def optimize_strategy(strategy_data: Dict, no_cache: bool = Query(False)):
     """
     Optimiza parámetros de la estrategia usando IA de OpenAI
     
@@ -143,11 +324,13 @@ def optimize_strategy(strategy_data: Dict):
     """
     try:
         current_performance = strategy_data.get("current_performance", {})
-        optimization = ai_analyzer.optimize_parameters_with_ai(strategy_data, current_performance)
+        optimization = await ai_analyzer.optimize_parameters_with_ai_async(
+            strategy_data, current_performance, use_cache=not no_cache
+        )
         
         # Guardar optimización en DB
         try:
-            db.save_optimization(strategy_data.get("strategy_name"), optimization)
+            await asyncio.to_thread(db.save_optimization, strategy_data.get("strategy_name"), optimization)
         except Exception as e:
             print(f"Error guardando optimización: {e}")
         
@@ -167,7 +350,7 @@ class OptimizationRequest(BaseModel):
 
 
 @app.post("/strategy/optimize-enhanced")
-def optimize_strategy_enhanced(request: OptimizationRequest):
+async def optimize_strategy_enhanced(request: OptimizationRequest, no_cache: bool = Query(False)):
     """
     Versión mejorada del endpoint de optimización con validación de datos
     """
@@ -178,14 +361,15 @@ def optimize_strategy_enhanced(request: OptimizationRequest):
             "current_parameters": request.current_parameters
         }
         
-        optimization = ai_analyzer.optimize_parameters_with_ai(
+        optimization = await ai_analyzer.optimize_parameters_with_ai_async(
             strategy_data, 
-            request.current_performance
+            request.current_performance,
+            use_cache=not no_cache
         )
         
         # Guardar optimización en DB
         try:
-            db.save_optimization(request.strategy_name, optimization)
+            await asyncio.to_thread(db.save_optimization, request.strategy_name, optimization)
         except Exception as e:
             print(f"Error guardando optimización: {e}")
         
@@ -197,23 +381,54 @@ def optimize_strategy_enhanced(request: OptimizationRequest):
         }
 
 
+@app.post("/strategy/optimize/stream")
+async def optimize_strategy_stream(request: OptimizationRequest, no_cache: bool = Query(False)):
+    """
+    Optimización con IA en streaming (Server-Sent Events). Mismo body que
+    /strategy/optimize-enhanced. Eventos: `start` inmediato, `delta` (texto
+    nuevo de reasoning y demás campos de texto), `item` (cada parámetro
+    optimizado o advertencia completa), `field` (campo completo), `error`,
+    `result` (optimización final, ya guardada en la DB) y `done`
+    """
+    strategy_data = {
+        "strategy_name": request.strategy_name,
+        "strategy_description": request.strategy_description,
+        "current_parameters": request.current_parameters
+    }
+    
+    async def event_stream():
+        yield _sse("start", {"strategy_name": request.strategy_name, "ai_enabled": ai_analyzer.enabled})
+        async for event, data in ai_analyzer.optimize_parameters_stream(
+            strategy_data, request.current_performance, use_cache=not no_cache
+        ):
+            if event == "result":
+                try:
+                    await asyncio.to_thread(db.save_optimization, request.strategy_name, data)
+                except Exception as e:
+                    print(f"Error guardando optimización: {e}")
+            yield _sse(event, data)
+        yield _sse("done", {"strategy_name": request.strategy_name})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/analyze/sessions")
 def get_session_analysis():
     """
     Obtiene análisis detallado por sesiones de trading (Asian, London, NY)
     """
     try:
-        from strategy_engine import analyze_trading_sessions, analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data()
-        session_analysis = analyze_trading_sessions(historical_data.get("deals_df"))
-        
-        mt5.shutdown()
-        return session_analysis
+        snapshot = get_analysis_snapshot()
+        return snapshot["session_analysis"]
     except Exception as e:
         return {"error": str(e)}
 
@@ -224,17 +439,13 @@ def get_schedule_analysis():
     Obtiene análisis de performance por hora y día de la semana
     """
     try:
-        from strategy_engine import analyze_trading_schedule, analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data()
-        schedule_analysis = analyze_trading_schedule(historical_data.get("deals_df"))
-        
-        mt5.shutdown()
-        return schedule_analysis
+        snapshot = get_analysis_snapshot()
+        return snapshot["schedule_analysis"]
     except Exception as e:
         return {"error": str(e)}
 
@@ -245,17 +456,13 @@ def get_risk_analysis():
     Obtiene análisis de gestión de riesgo
     """
     try:
-        from strategy_engine import analyze_risk_management, analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data()
-        risk_analysis = analyze_risk_management(historical_data.get("deals_df"))
-        
-        mt5.shutdown()
-        return risk_analysis
+        snapshot = get_analysis_snapshot()
+        return snapshot["risk_analysis"]
     except Exception as e:
         return {"error": str(e)}
 
@@ -266,17 +473,13 @@ def get_symbols_analysis():
     Obtiene análisis de performance por símbolo
     """
     try:
-        from strategy_engine import analyze_symbols_performance, analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data()
-        symbols_analysis = analyze_symbols_performance(historical_data.get("deals_df"))
-        
-        mt5.shutdown()
-        return symbols_analysis
+        snapshot = get_analysis_snapshot()
+        return snapshot["symbol_analysis"]
     except Exception as e:
         return {"error": str(e)}
 
@@ -287,73 +490,265 @@ def get_historical_analysis(days_back: int = Query(90)):
     Obtiene métricas históricas completas de los últimos X días
     """
     try:
-        from strategy_engine import analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot, public_metrics
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data(days_back)
+        snapshot = get_analysis_snapshot(days_back)
         
         # Remover DataFrames del resultado (no JSON serializable)
-        result = {k: v for k, v in historical_data.items() 
-                 if not k.endswith("_df")}
-        
-        mt5.shutdown()
-        return result
+        return public_metrics(snapshot["historical_metrics"])
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/analyze/metrics")
+def get_incremental_metrics(days_back: int = Query(90)):
+    """
+    Métricas de trades cerrados (win rate, profit factor, drawdown, rachas...)
+    de los últimos X días a partir de los acumuladores diarios: solo se
+    procesan los deals nuevos desde la última sincronización
+    """
+    try:
+        from deal_store import deal_store
+
+        with mt5_session.session() as mt5:
+            if not getattr(mt5, "persist_deals", True):
+                return {"error": "La fuente de datos actual no usa el historial local de deals"}
+            return deal_store.get_metrics(mt5, days_back)
     except Exception as e:
         return {"error": str(e)}
 
 
 @app.get("/trades/history")
-def get_trades_history(limit: int = Query(100), days_back: int = Query(30)):
+def get_trades_history(
+    limit: int = Query(100),
+    days_back: int = Query(30),
+    cursor: Optional[str] = Query(None),
+    format: str = Query("rows")
+):
     """
-    Obtiene el historial completo de operaciones cerradas de MT5
+    Obtiene el historial de operaciones cerradas de MT5 (una fila por posición
+    o tramo cerrado), paginado por cursor
+
+    - format=rows: lista de trades (formato original)
+    - format=columns: dict de arrays, más compacto y rápido para páginas grandes
+    - cursor: valor next_cursor de la página anterior
     """
     try:
-        from strategy_engine import analyze_historical_data
-        import MetaTrader5 as mt5
+        from strategy_engine import get_analysis_snapshot
+        from trades_serializer import paginate_closed_trades, trades_to_columns, columns_to_rows
         
-        if not mt5.initialize():
+        if not mt5_session.ensure_connected():
             return {"error": "MT5 no inicializado"}
         
-        historical_data = analyze_historical_data(days_back)
-        deals_df = historical_data.get("deals_df")
-        
-        if deals_df is None or len(deals_df) == 0:
-            mt5.shutdown()
-            return {"trades": [], "total": 0}
+        snapshot = get_analysis_snapshot(days_back)
+        positions_df = snapshot["historical_metrics"].get("positions_df")
         
-        # Filtrar solo deals de cierre y convertir a formato JSON serializable
-        closed_trades = deals_df[deals_df["entry"] == 1].copy()
-        closed_trades = closed_trades.sort_values("time", ascending=False)
-        closed_trades = closed_trades.head(limit)
+        if positions_df is None or len(positions_df) == 0:
+            return {"trades": [], "total": 0, "next_cursor": None}
         
-        # Convertir a lista de diccionarios
-        trades = []
-        for _, trade in closed_trades.iterrows():
-            trades.append({
-                "ticket": int(trade["ticket"]),
-                "symbol": str(trade["symbol"]),
-                "type": "BUY" if trade["type"] == 0 else "SELL",
-                "volume": float(trade["volume"]),
-                "price": float(trade["price"]),
-                "profit": float(trade["profit"]),
-                "time": trade["time"].isoformat(),
-                "commission": float(trade.get("commission", 0)),
-                "swap": float(trade.get("swap", 0))
-            })
+        # Página de posiciones cerradas ordenadas por tiempo de cierre descendente
+        pagination = paginate_closed_trades(positions_df, limit, cursor)
+        columns = trades_to_columns(pagination["page"])
+        total = len(columns["position_id"])
         
-        mt5.shutdown()
-        return {
-            "trades": trades,
-            "total": len(trades),
+        response = {
+            "total": total,
+            "total_available": pagination["total_available"],
+            "next_cursor": pagination["next_cursor"],
             "days_back": days_back
         }
+        if format == "columns":
+            response["format"] = "columns"
+            response["columns"] = columns
+        else:
+            response["trades"] = columns_to_rows(columns)
+        
+        # Contenido ya JSON nativo: evitar jsonable_encoder sobre cada fila
+        return JSONResponse(content=response)
     except Exception as e:
         return {"error": str(e), "trades": [], "total": 0}
 
 
+# ===============================================================
+#  Backtesting de las plantillas sobre barras históricas
+# ===============================================================
+
+class BacktestRequest(BaseModel):
+    strategy: str = "Grid Scalping"
+    symbol: str = "EURUSD"
+    days_back: int = 365
+    timeframe: str = "M1"
+    params: Optional[Dict] = None  # por defecto, los de la plantilla del bot
+    initial_balance: float = 10000.0
+    compare_account: bool = True
+
+
+@app.post("/strategy/backtest")
+def backtest_strategy(request: Optional[BacktestRequest] = None):
+    """
+    Backtest de la plantilla de la estrategia sobre las barras de MT5
+    (copy_rates_range) y comparación con el resultado real de la cuenta en
+    el mismo símbolo y ventana
+    """
+    request = request or BacktestRequest()
+    try:
+        from backtester import (account_symbol_metrics, load_rates, public_result, run_backtest,
+                                strategy_kind, symbol_spec)
+
+        kind = strategy_kind(request.strategy)
+        if kind is None:
+            return {"error": f"La estrategia '{request.strategy}' no tiene motor de backtest (grid o ma_cross)"}
+
+        with mt5_session.session() as mt5:
+            rates = load_rates(mt5, request.symbol, request.days_back, request.timeframe)
+            spec = symbol_spec(request.symbol, mt5)
+
+        result = run_backtest(kind, rates, request.params, spec["point"], spec["contract_size"],
+                              spec["spread"], request.initial_balance)
+        response = {
+            "symbol": request.symbol,
+            "timeframe": request.timeframe,
+            "days_back": request.days_back,
+            "backtest": public_result(result)
+        }
+
+        if request.compare_account:
+            from strategy_engine import get_analysis_snapshot
+            snapshot = get_analysis_snapshot(request.days_back)
+            response["account"] = account_symbol_metrics(
+                snapshot["historical_metrics"].get("positions_df"), request.symbol
+            )
+        return response
+    except Exception as e:
+        return {"error": str(e)}
+
+
+class SweepRequest(BaseModel):
+    strategy: str = "Grid Scalping"
+    symbol: str = "EURUSD"
+    days_back: int = 180
+    timeframe: str = "M1"
+    method: str = "random"  # grid, random o halving
+    space: Optional[Dict] = None  # por defecto, param_optimizer.DEFAULT_SPACES
+    samples: int = 100
+    seed: int = 42
+    objective: str = "profit_factor"  # profit_factor, net_profit o recovery_factor
+    min_trades: int = 30
+    max_drawdown_pct: Optional[float] = None
+    eta: int = 3
+    top: int = 20
+    initial_balance: float = 10000.0
+
+
+@app.post("/strategy/optimize/sweep")
+def optimize_strategy_sweep(request: Optional[SweepRequest] = None):
+    """
+    Optimización local de parámetros sin IA: búsqueda grid, random o
+    successive halving sobre el backtester, en un pool de procesos. Devuelve
+    el run_id; el progreso y el ranking se consultan en /strategy/optimize/sweep/{run_id}
+    """
+    request = request or SweepRequest()
+    try:
+        from backtester import load_rates, strategy_kind, symbol_spec
+        from param_optimizer import parameter_optimizer
+
+        kind = strategy_kind(request.strategy)
+        if kind is None:
+            return {"error": f"La estrategia '{request.strategy}' no tiene motor de backtest (grid o ma_cross)"}
+
+        with mt5_session.session() as mt5:
+            rates = load_rates(mt5, request.symbol, request.days_back, request.timeframe)
+            spec = symbol_spec(request.symbol, mt5)
+
+        run = parameter_optimizer.submit(
+            kind, rates, spec, method=request.method, space=request.space, samples=request.samples,
+            seed=request.seed, objective=request.objective, min_trades=request.min_trades,
+            max_drawdown_pct=request.max_drawdown_pct, eta=request.eta, top=request.top,
+            initial_balance=request.initial_balance
+        )
+        return {"message": "Optimización iniciada", "symbol": request.symbol,
+                "timeframe": request.timeframe, "days_back": request.days_back, **run}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/strategy/optimize/sweep")
+def list_sweeps(limit: int = Query(20)):
+    """Optimizaciones recientes y su progreso"""
+    from param_optimizer import parameter_optimizer
+    return {**parameter_optimizer.status(), "runs": parameter_optimizer.list_runs(limit)}
+
+
+@app.get("/strategy/optimize/sweep/{run_id}")
+def get_sweep(run_id: str):
+    """Progreso, mejor combinación hasta ahora y ranking final de una optimización"""
+    from param_optimizer import parameter_optimizer
+    run = parameter_optimizer.get_run(run_id)
+    if run is None:
+        return {"error": f"Optimización no encontrada: {run_id}"}
+    return run
+
+
+@app.delete("/strategy/optimize/sweep/{run_id}")
+def cancel_sweep(run_id: str):
+    """Cancela una optimización; conserva el ranking de lo ya evaluado"""
+    from param_optimizer import parameter_optimizer
+    run = parameter_optimizer.cancel(run_id)
+    if run is None:
+        return {"error": f"Optimización no encontrada: {run_id}"}
+    return {"message": "Cancelación solicitada", **run}
+
+
+
+# ===============================================================
+#  Multi-cuenta: análisis en paralelo de varias cuentas MT5
+# ===============================================================
+
+class MultiAccountRequest(BaseModel):
+    accounts: Optional[List[Dict]] = None  # por defecto, los perfiles de MT5_ACCOUNTS_FILE
+    days_back: int = 90
+
+
+@app.get("/accounts")
+def list_accounts():
+    """Perfiles de cuenta configurados (sin contraseñas) y terminales disponibles"""
+    try:
+        return {"accounts": [public_profile(p) for p in load_profiles()], **multi_account_runner.status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.post("/accounts/analyze")
+def analyze_accounts(request: Optional[MultiAccountRequest] = None):
+    """Lanza el análisis de todas las cuentas en segundo plano (un terminal por proceso)"""
+    request = request or MultiAccountRequest()
+    try:
+        profiles = request.accounts if request.accounts is not None else load_profiles()
+        if not profiles:
+            return {"error": "No hay perfiles de cuenta configurados (MT5_ACCOUNTS_FILE)"}
+        run = multi_account_runner.submit(profiles, request.days_back)
+        return {"message": "Análisis multi-cuenta iniciado", **run}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/accounts/runs")
+def list_account_runs(limit: int = Query(20)):
+    """Ejecuciones multi-cuenta recientes y su progreso"""
+    return {"runs": multi_account_runner.list_runs(limit)}
+
+
+@app.get("/accounts/runs/{run_id}")
+def get_account_run(run_id: str):
+    """Informe por cuenta y de cartera de una ejecución"""
+    run = multi_account_runner.get_run(run_id)
+    if run is None:
+        return {"error": f"Ejecución no encontrada: {run_id}"}
+    return run
+
 # ===============================================================
 
 if __name__ == "__main__":
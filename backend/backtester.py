@@ -0,0 +1,427 @@
+"""
+Backtester
+Backtesting sobre barras OHLC (NumPy) de la lógica de los bots de
+strategy_templates, para validar la estrategia detectada contra precios
+históricos sin un terminal en vivo:
+
+- grid (GridScalpingBot): con 0 posiciones abre BUY; si el cierre se aleja
+  grid_step puntos del último precio de apertura y hay menos de max_orders
+  posiciones, abre BUY (si subió) o SELL (si bajó). Cada posición tiene su TP/SL.
+- ma_cross (TrendFollowingLong): BUY cuando la media rápida cruza por encima de
+  la lenta con RSI < rsi_max y no hay posición abierta; TP/SL en puntos.
+
+En lugar de recorrer barra a barra, el motor salta de evento en evento
+(aperturas y cierres): la siguiente señal y la barra en la que cada posición
+toca su TP o SL se buscan sobre un índice de máximos / mínimos por bloques
+(_RangeIndex), así que el coste depende del número de trades, no de barras.
+
+Convenciones: las aperturas se ejecutan al cierre de la barra (BUY al ask =
+close + spread), TP/SL se comprueban con high/low desde la barra siguiente y,
+si ambos caen en la misma barra, se asume el SL. Las posiciones que siguen
+abiertas al final se cierran al último cierre (exit_reason = "end").
+
+`rates` puede ser el array de mt5.copy_rates_range, un DataFrame o un dict
+de arrays con time (epoch s), high, low y close.
+"""
+
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from deal_sources import DEFAULT_SYMBOL_SPEC, SYMBOL_SPECS, TIMEFRAMES
+from metric_accumulators import TradeStatsAccumulator
+
+# Parámetros por defecto: los de los bots de strategy_templates
+GRID_DEFAULTS = {"grid_step": 50, "lot_size": 0.01, "max_orders": 20, "take_profit": 30, "stop_loss": 100}
+MA_CROSS_DEFAULTS = {"ma_fast": 50, "ma_slow": 200, "lot_size": 0.01, "take_profit": 200, "stop_loss": 100,
+                     "rsi_period": 14, "rsi_max": 70}
+
+TRADE_COLUMNS = ["entry_bar", "exit_bar", "type", "volume", "open_time", "close_time", "price_open",
+                 "price_close", "profit", "duration_minutes", "exit_reason"]
+
+# Barras por bloque del índice de máximos / mínimos (y bloques por superbloque)
+RANGE_BLOCK = 16
+
+
+def _block_extremes(high: np.ndarray, low: np.ndarray, size: int):
+    """Máximo de high y mínimo de low por bloques de `size` (relleno neutro al final)"""
+    pad = (-len(high)) % size
+    high = np.concatenate([high, np.full(pad, -np.inf)]).reshape(-1, size).max(axis=1)
+    low = np.concatenate([low, np.full(pad, np.inf)]).reshape(-1, size).min(axis=1)
+    return high, low
+
+
+class _RangeIndex:
+    """
+    Búsqueda de la primera barra que toca un nivel: salta bloques y
+    superbloques cuyo máximo / mínimo no lo alcanzan y solo recorre barra a
+    barra el bloque donde está el cruce. Se recorre en Python (memoryview y
+    listas) porque las distancias típicas (decenas de barras) son demasiado
+    cortas para amortizar una llamada de NumPy por búsqueda.
+    """
+
+    def __init__(self, high: np.ndarray, low: np.ndarray):
+        self.n = len(high)
+        block_high, block_low = _block_extremes(high, low, RANGE_BLOCK)
+        super_high, super_low = _block_extremes(block_high, block_low, RANGE_BLOCK)
+        self.high, self.low = memoryview(high), memoryview(low)
+        self.block_high, self.block_low = block_high.tolist(), block_low.tolist()
+        self.super_high, self.super_low = super_high.tolist(), super_low.tolist()
+
+    def first_hit(self, start: int, upper: float, lower: float) -> int:
+        """Primera barra >= start con high >= upper o low <= lower; -1 si no hay"""
+        high, low = self.high, self.low
+        # Resto del bloque de `start`
+        stop = (start // RANGE_BLOCK + 1) * RANGE_BLOCK
+        if stop >= self.n:
+            for j in range(start, self.n):
+                if high[j] >= upper or low[j] <= lower:
+                    return j
+            return -1
+        for j in range(start, stop):
+            if high[j] >= upper or low[j] <= lower:
+                return j
+
+        block_high, block_low = self.block_high, self.block_low
+        super_high, super_low = self.super_high, self.super_low
+        blocks, groups = len(block_high), len(super_high)
+        block = stop // RANGE_BLOCK
+        while block < blocks:
+            if block % RANGE_BLOCK == 0:
+                group = block // RANGE_BLOCK
+                while group < groups and super_high[group] < upper and super_low[group] > lower:
+                    group += 1
+                if group == groups:
+                    return -1
+                block = group * RANGE_BLOCK
+            if block_high[block] >= upper or block_low[block] <= lower:
+                # El relleno no cruza ningún nivel: el cruce está dentro del bloque
+                j = block * RANGE_BLOCK
+                while high[j] < upper and low[j] > lower:
+                    j += 1
+                return j
+            block += 1
+        return -1
+
+
+class _Book:
+    """Posiciones simuladas: aperturas, cierres por TP/SL y resultado"""
+
+    def __init__(self, bars: _RangeIndex, close: list, point: float, contract_size: float, spread: float,
+                 take_profit: float, stop_loss: float):
+        self.bars, self.close = bars, close
+        self.point = point
+        self.contract_size = contract_size
+        self.spread = spread * point
+        self.take_profit = take_profit * point
+        self.stop_loss = stop_loss * point
+        self.trades = []
+
+    def open(self, bar: int, direction: int, volume: float) -> int:
+        """
+        Abre al cierre de `bar`; devuelve la barra en la que toca TP/SL o
+        len(close) si sigue abierta al final (se registra cerrada en la última barra)
+        """
+        if direction > 0:
+            price = self.close[bar] + self.spread
+            tp, sl = price + self.take_profit, price - self.stop_loss
+            # BUY cierra al bid: high/low de las barras
+            exit_bar = self.bars.first_hit(bar + 1, tp, sl)
+            if exit_bar >= 0:
+                reason = "sl" if self.bars.low[exit_bar] <= sl else "tp"
+                exit_price = sl if reason == "sl" else tp
+        else:
+            price = self.close[bar]
+            tp, sl = price - self.take_profit, price + self.stop_loss
+            # SELL cierra al ask: bid + spread
+            exit_bar = self.bars.first_hit(bar + 1, sl - self.spread, tp - self.spread)
+            if exit_bar >= 0:
+                reason = "sl" if self.bars.high[exit_bar] + self.spread >= sl else "tp"
+                exit_price = sl if reason == "sl" else tp
+
+        if exit_bar < 0:
+            reason = "end"
+            exit_price = self.close[-1] + (self.spread if direction < 0 else 0.0)
+
+        profit = (exit_price - price) * direction * volume * self.contract_size
+        recorded_bar = exit_bar if exit_bar >= 0 else len(self.close) - 1
+        self.trades.append((bar, recorded_bar, direction, volume, price, exit_price, profit, reason))
+        return exit_bar if exit_bar >= 0 else len(self.close)
+
+
+def _backtest_grid(close: np.ndarray, params: Dict, book: _Book):
+    step = params["grid_step"] * book.point
+    lot = params["lot_size"]
+    max_orders = int(params["max_orders"])
+    # La señal de la rejilla solo mira el cierre
+    closes = _RangeIndex(close, close)
+    close = book.close
+    n = len(close)
+
+    exits = []  # heap de barras de salida de las posiciones abiertas
+    heapq.heappush(exits, book.open(0, 1, lot))
+    last_price = close[0]
+    search_from = 1
+
+    while search_from < n:
+        next_exit = exits[0] if exits else n
+        trigger = -1
+        if len(exits) < max_orders:
+            trigger = closes.first_hit(search_from, last_price + step, last_price - step)
+
+        if trigger >= 0 and trigger < next_exit:
+            direction = 1 if close[trigger] > last_price else -1
+            heapq.heappush(exits, book.open(trigger, direction, lot))
+            last_price = close[trigger]
+            search_from = trigger + 1
+        elif next_exit < n:
+            # Cierres por TP/SL en esa barra; el grid vuelve a mirar su cierre
+            while exits and exits[0] == next_exit:
+                heapq.heappop(exits)
+            search_from = next_exit
+            if not exits:
+                heapq.heappush(exits, book.open(next_exit, 1, lot))
+                last_price = close[next_exit]
+                search_from = next_exit + 1
+        else:
+            break
+
+
+def _sma(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if period <= len(values):
+        cumulative = np.cumsum(np.concatenate(([0.0], values)))
+        result[period - 1:] = (cumulative[period:] - cumulative[:-period]) / period
+    return result
+
+
+def _rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """RSI de Wilder (media exponencial con alpha = 1 / period)"""
+    delta = np.diff(close, prepend=close[0])
+    gains = pd.Series(np.maximum(delta, 0.0)).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+    losses = pd.Series(np.maximum(-delta, 0.0)).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + gains / losses)
+    rsi[losses == 0] = 100.0
+    rsi[:period] = np.nan
+    return rsi
+
+
+def _backtest_ma_cross(close: np.ndarray, params: Dict, book: _Book):
+    fast = _sma(close, int(params["ma_fast"]))
+    slow = _sma(close, int(params["ma_slow"]))
+    rsi = _rsi(close, int(params["rsi_period"]))
+
+    above = fast > slow
+    with np.errstate(invalid="ignore"):
+        cross = np.zeros(len(close), dtype=bool)
+        cross[1:] = above[1:] & (fast[:-1] <= slow[:-1]) & (rsi[1:] < params["rsi_max"])
+    signals = np.flatnonzero(cross)
+
+    # Una posición a la vez: la siguiente señal después del cierre de la anterior
+    free_from = 0
+    while True:
+        k = int(np.searchsorted(signals, free_from))
+        if k >= len(signals):
+            break
+        free_from = book.open(int(signals[k]), 1, params["lot_size"]) + 1
+
+
+STRATEGIES = {
+    "grid": (_backtest_grid, GRID_DEFAULTS),
+    "ma_cross": (_backtest_ma_cross, MA_CROSS_DEFAULTS),
+}
+
+
+def strategy_kind(strategy: str) -> Optional[str]:
+    """Motor para el nombre de estrategia (mismos criterios que generate_code_and_explanation)"""
+    strategy_lower = strategy.lower()
+    if "grid" in strategy_lower or "scalping" in strategy_lower:
+        return "grid"
+    if "trend following" in strategy_lower or strategy_lower in ("ma_cross", "ma cross"):
+        return "ma_cross"
+    return None
+
+
+def symbol_spec(symbol: str, source=None) -> Dict:
+    """Punto, tamaño de contrato y spread: de symbol_info (MT5) o de SYMBOL_SPECS"""
+    spec = dict(SYMBOL_SPECS.get(symbol, DEFAULT_SYMBOL_SPEC))
+    info = getattr(source, "symbol_info", None) if source is not None else None
+    if info is not None:
+        try:
+            symbol_info = info(symbol)
+        except Exception:
+            symbol_info = None
+        if symbol_info is not None:
+            spec.update(point=symbol_info.point, contract_size=symbol_info.trade_contract_size,
+                        spread=symbol_info.spread)
+    return spec
+
+
+def run_backtest(kind: str, rates, params: Dict = None, point: float = None, contract_size: float = None,
+                 spread: float = 0, initial_balance: float = 10_000.0) -> Dict:
+    """
+    Ejecuta el backtest `kind` ("grid" o "ma_cross") sobre `rates`.
+
+    Args:
+        params: parámetros de la estrategia (se completan con GRID_DEFAULTS / MA_CROSS_DEFAULTS);
+                grid_step, take_profit y stop_loss van en puntos
+        point, contract_size: del símbolo (por defecto los de EURUSD)
+        spread: spread en puntos
+
+    Returns:
+        {"strategy", "params", "trades": DataFrame (TRADE_COLUMNS), "equity": array por barra,
+         "metrics": {...}}
+    """
+    if kind not in STRATEGIES:
+        raise ValueError(f"Estrategia sin backtest: {kind} (disponibles: {list(STRATEGIES)})")
+    engine, defaults = STRATEGIES[kind]
+    params = {**defaults, **{k: v for k, v in (params or {}).items() if k in defaults and v is not None}}
+
+    close = np.ascontiguousarray(rates["close"], dtype=float)
+    high = np.ascontiguousarray(rates["high"], dtype=float)
+    low = np.ascontiguousarray(rates["low"], dtype=float)
+    times = np.asarray(rates["time"], dtype=np.int64)
+    spec = DEFAULT_SYMBOL_SPEC
+    book = _Book(_RangeIndex(high, low), memoryview(close),
+                 point if point is not None else spec["point"],
+                 contract_size if contract_size is not None else spec["contract_size"],
+                 spread, params["take_profit"], params["stop_loss"])
+    if len(close) >= 2:
+        engine(close, params, book)
+
+    trades = _trades_frame(book.trades, times)
+    equity = _equity_curve(trades, close, book.contract_size, initial_balance)
+    return {
+        "strategy": kind,
+        "params": params,
+        "trades": trades,
+        "equity": equity,
+        "metrics": backtest_metrics(trades, equity, initial_balance, times)
+    }
+
+
+def _trades_frame(trades: list, times: np.ndarray) -> pd.DataFrame:
+    if not trades:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    entry_bar, exit_bar, direction, volume, price_open, price_close, profit, reason = map(np.array, zip(*trades))
+    open_time = pd.to_datetime(times[entry_bar], unit="s")
+    close_time = pd.to_datetime(times[exit_bar], unit="s")
+    frame = pd.DataFrame({
+        "entry_bar": entry_bar,
+        "exit_bar": exit_bar,
+        "type": np.where(direction > 0, "BUY", "SELL"),
+        "volume": volume,
+        "open_time": open_time,
+        "close_time": close_time,
+        "price_open": price_open,
+        "price_close": price_close,
+        "profit": profit,
+        "duration_minutes": (close_time - open_time).total_seconds() / 60,
+        "exit_reason": reason
+    })
+    # Orden de cierre (el de las métricas y la curva de resultados)
+    return frame.sort_values(["exit_bar", "entry_bar"], kind="stable").reset_index(drop=True)
+
+
+def _equity_curve(trades: pd.DataFrame, close: np.ndarray, contract_size: float,
+                  initial_balance: float) -> np.ndarray:
+    """
+    Equity al cierre de cada barra: balance + resultado realizado + flotante de
+    las posiciones abiertas. El flotante es close * Σ(dir·vol·cs) - Σ(dir·vol·cs·precio)
+    sobre las posiciones vivas, con ambas sumas acumuladas por diferencias
+    """
+    n = len(close)
+    if n == 0:
+        return np.array([])
+    if len(trades) == 0:
+        return np.full(n, float(initial_balance))
+
+    entry_bar = trades["entry_bar"].to_numpy()
+    exit_bar = trades["exit_bar"].to_numpy()
+    exposure = np.where(trades["type"].to_numpy() == "BUY", 1.0, -1.0) * trades["volume"].to_numpy() * contract_size
+    cost = exposure * trades["price_open"].to_numpy()
+
+    realized = np.cumsum(np.bincount(exit_bar, weights=trades["profit"].to_numpy(), minlength=n))
+    live_exposure = np.cumsum(np.bincount(entry_bar, exposure, n + 1) - np.bincount(exit_bar, exposure, n + 1))[:n]
+    live_cost = np.cumsum(np.bincount(entry_bar, cost, n + 1) - np.bincount(exit_bar, cost, n + 1))[:n]
+    return initial_balance + realized + close * live_exposure - live_cost
+
+
+def backtest_metrics(trades: pd.DataFrame, equity: np.ndarray, initial_balance: float,
+                     times: np.ndarray = None) -> Dict:
+    """Métricas por trade (nombres de analyze_historical_data) y de la curva de equity"""
+    metrics = TradeStatsAccumulator.from_profits(trades["profit"].to_numpy(dtype=float)).metrics()
+    metrics["trade_drawdown"] = metrics.pop("max_drawdown")
+    metrics.pop("current_drawdown", None)
+
+    if len(equity):
+        peak = np.maximum.accumulate(equity)
+        drawdown = peak - equity
+        worst = int(drawdown.argmax())
+        metrics["max_drawdown"] = float(drawdown[worst])
+        metrics["max_drawdown_pct"] = float(drawdown[worst] / peak[worst] * 100) if peak[worst] > 0 else 0.0
+        metrics["final_equity"] = float(equity[-1])
+        metrics["return_pct"] = float((equity[-1] / initial_balance - 1) * 100) if initial_balance else 0.0
+    else:
+        metrics.update(max_drawdown=0.0, max_drawdown_pct=0.0, final_equity=initial_balance, return_pct=0.0)
+
+    durations = trades["duration_minutes"].to_numpy(dtype=float) if len(trades) else np.array([])
+    metrics["avg_duration_minutes"] = float(durations.mean()) if len(durations) else 0.0
+    metrics["exit_reasons"] = {k: int(v) for k, v in trades["exit_reason"].value_counts().items()} \
+        if len(trades) else {}
+    metrics["bars"] = int(len(equity))
+    if times is not None and len(times):
+        metrics["from"] = datetime.fromtimestamp(int(times[0]), timezone.utc).replace(tzinfo=None).isoformat()
+        metrics["to"] = datetime.fromtimestamp(int(times[-1]), timezone.utc).replace(tzinfo=None).isoformat()
+    return metrics
+
+
+def load_rates(source, symbol: str, days_back: int = 365, timeframe: str = "M1"):
+    """Barras de `symbol` de los últimos `days_back` días desde `source` (MT5 o DealSource)"""
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Timeframe no soportado: {timeframe} (disponibles: {list(TIMEFRAMES)})")
+    date_to = datetime.now()
+    rates = source.copy_rates_range(symbol, TIMEFRAMES[timeframe], date_to - timedelta(days=days_back), date_to)
+    if rates is None or len(rates) == 0:
+        raise RuntimeError(f"Sin barras de {symbol} ({timeframe}) en la fuente de datos")
+    return rates
+
+
+def account_symbol_metrics(positions_df: pd.DataFrame, symbol: str) -> Dict:
+    """Resultado real de la cuenta en `symbol` (posiciones cerradas de build_positions)"""
+    if positions_df is None or len(positions_df) == 0:
+        return {"total_trades": 0}
+    closed = positions_df[(positions_df["status"] == "closed") & (positions_df["symbol"] == symbol)]
+    closed = closed.sort_values("close_time", kind="stable")
+    metrics = TradeStatsAccumulator.from_profits(closed["profit"].to_numpy(dtype=float)).metrics()
+    durations = closed["duration_minutes"].dropna()
+    return {
+        "total_trades": metrics["total_trades"],
+        "win_rate": metrics["win_rate"],
+        "profit_factor": metrics["profit_factor"],
+        "total_profit": metrics["total_profit"],
+        "avg_profit": metrics["avg_profit"],
+        "max_drawdown": metrics["max_drawdown"],
+        "avg_duration_minutes": float(durations.mean()) if len(durations) else 0.0,
+        "avg_volume": float(closed["volume"].mean()) if len(closed) else 0.0
+    }
+
+
+def public_result(result: Dict, max_trades: int = 200, max_points: int = 500) -> Dict:
+    """Resultado JSON: métricas, últimos trades y curva de equity submuestreada"""
+    trades = result["trades"].tail(max_trades).copy()
+    for column in ("open_time", "close_time"):
+        trades[column] = trades[column].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    equity = result["equity"]
+    step = max(1, int(np.ceil(len(equity) / max_points))) if len(equity) else 1
+    return {
+        "strategy": result["strategy"],
+        "params": result["params"],
+        "metrics": result["metrics"],
+        "trades": trades.drop(columns=["entry_bar", "exit_bar"]).to_dict(orient="records"),
+        "equity_curve": [round(float(v), 2) for v in equity[::step]]
+    }
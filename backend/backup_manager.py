@@ -0,0 +1,143 @@
+"""
+Backup Manager
+Backups online de strategy_data.db en segundo plano sobre
+StrategyDatabase.backup_database (protocolo de backup de SQLite, por pasos).
+Cada backup tiene un id con su progreso consultable, y existe además una
+descarga en streaming comprimida con gzip que no deja copia en backups/.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from database import StrategyDatabase, db
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupManager:
+    def __init__(self, database: StrategyDatabase, backup_dir: str = "backups",
+                 pages_per_step: int = None, max_jobs: int = 50):
+        """
+        Args:
+            database: base de datos a respaldar
+            backup_dir: directorio de los backups en archivo
+            pages_per_step: páginas copiadas por paso (DB_BACKUP_PAGES_PER_STEP)
+            max_jobs: estados de backup que se conservan en memoria
+        """
+        self.db = database
+        self.backup_dir = backup_dir
+        self.pages_per_step = pages_per_step if pages_per_step is not None \
+            else int(os.getenv("DB_BACKUP_PAGES_PER_STEP", "256"))
+        self.max_jobs = max_jobs
+        # Un backup a la vez: el resto queda en cola como "pending"
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_job(self, path: str, compress: bool) -> Dict:
+        job = {
+            "backup_id": uuid.uuid4().hex[:12],
+            "status": "pending",
+            "path": path,
+            "compressed": compress,
+            "pages_total": None,
+            "pages_remaining": None,
+            "progress": 0.0,
+            "size_bytes": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job["backup_id"]] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def _progress_callback(self, job: Dict):
+        def progress(status, remaining, total):
+            job["pages_total"] = total
+            job["pages_remaining"] = remaining
+            job["progress"] = round(100.0 * (total - remaining) / total, 1) if total else 100.0
+        return progress
+
+    def _run(self, job: Dict):
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+        try:
+            if job["compressed"]:
+                raw_path = job["path"][:-len(".gz")]
+                self.db.backup_database(raw_path, self.pages_per_step, self._progress_callback(job))
+                with open(raw_path, "rb") as src, gzip.open(job["path"], "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+                os.remove(raw_path)
+            else:
+                self.db.backup_database(job["path"], self.pages_per_step, self._progress_callback(job))
+            job["size_bytes"] = os.path.getsize(job["path"])
+            job["progress"] = 100.0
+            job["status"] = "completed"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"❌ Error en backup {job['backup_id']}: {e}")
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+
+    def start_backup(self, compress: bool = False) -> Dict:
+        """Encola un backup en archivo y devuelve su estado inicial"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.backup_dir, f"strategy_backup_{timestamp}_{uuid.uuid4().hex[:6]}.db")
+        if compress:
+            path += ".gz"
+        job = self._new_job(path, compress)
+        self._executor.submit(self._run, job)
+        return dict(job)
+
+    def get_job(self, backup_id: str) -> Optional[Dict]:
+        job = self._jobs.get(backup_id)
+        return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def stream_backup(self) -> Iterator[bytes]:
+        """
+        Backup a un archivo temporal y envío comprimido con gzip por bloques.
+        El temporal se elimina al terminar (o si el cliente corta la descarga).
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix="strategy_backup_", suffix=".db")
+        os.close(fd)
+        try:
+            self.db.backup_database(tmp_path, self.pages_per_step)
+            # wbits=31: formato gzip
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            with open(tmp_path, "rb") as f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    data = compressor.compress(chunk)
+                    if data:
+                        yield data
+            yield compressor.flush()
+        finally:
+            os.remove(tmp_path)
+
+    def shutdown(self):
+        """Espera a los backups en curso (hook de apagado de la API)"""
+        self._executor.shutdown(wait=True)
+
+
+# Instancia global
+backup_manager = BackupManager(db)
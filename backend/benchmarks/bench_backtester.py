@@ -0,0 +1,144 @@
+"""
+Benchmark: backtester (grid y cruce de medias) sobre barras M1 sintéticas
+Mide run_backtest por año de datos M1 y lo compara con una implementación de
+referencia que recorre barra a barra la lógica de los bots de
+strategy_templates (un "tick" por barra), comprobando que ambos producen
+exactamente los mismos trades.
+
+Uso (desde backend/):
+    python benchmarks/bench_backtester.py [--symbol EURUSD] [--years 1] [--reference-days 60]
+        [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backtester import GRID_DEFAULTS, MA_CROSS_DEFAULTS, _rsi, _sma, run_backtest  # noqa: E402
+from deal_sources import SYMBOL_SPECS, generate_rates  # noqa: E402
+
+CASES = [
+    ("grid", GRID_DEFAULTS),
+    ("grid", {**GRID_DEFAULTS, "grid_step": 200, "take_profit": 150, "stop_loss": 300}),
+    ("ma_cross", MA_CROSS_DEFAULTS),
+]
+
+
+def reference_backtest(kind: str, rates, params: dict, point: float, contract_size: float, spread: float) -> list:
+    """Bucle barra a barra: cierres por TP/SL, y después la regla de apertura del bot"""
+    high, low, close = (rates[c].tolist() for c in ("high", "low", "close"))
+    n = len(close)
+    sp, tp_dist, sl_dist = spread * point, params["take_profit"] * point, params["stop_loss"] * point
+    if kind == "ma_cross":
+        fast, slow = _sma(rates["close"], params["ma_fast"]), _sma(rates["close"], params["ma_slow"])
+        rsi = _rsi(rates["close"], params["rsi_period"])
+    positions, trades = [], []
+
+    def open_position(bar, direction):
+        price = close[bar] + sp if direction > 0 else close[bar]
+        tp = price + direction * tp_dist
+        sl = price - direction * sl_dist
+        positions.append((bar, direction, price, tp, sl))
+
+    def close_position(position, bar, exit_price, reason):
+        entry_bar, direction, price = position[:3]
+        profit = (exit_price - price) * direction * params["lot_size"] * contract_size
+        trades.append((entry_bar, bar, direction, round(profit, 8), reason))
+
+    last_price = close[0]
+    if kind == "grid":
+        open_position(0, 1)
+    for j in range(1, n):
+        remaining = []
+        for position in positions:
+            direction, tp, sl = position[1], position[3], position[4]
+            if direction > 0 and low[j] <= sl:
+                close_position(position, j, sl, "sl")
+            elif direction > 0 and high[j] >= tp:
+                close_position(position, j, tp, "tp")
+            elif direction < 0 and high[j] + sp >= sl:
+                close_position(position, j, sl, "sl")
+            elif direction < 0 and low[j] + sp <= tp:
+                close_position(position, j, tp, "tp")
+            else:
+                remaining.append(position)
+        positions = remaining
+
+        if kind == "grid":
+            if not positions:
+                open_position(j, 1)
+                last_price = close[j]
+            elif len(positions) < params["max_orders"] and (
+                    close[j] >= last_price + params["grid_step"] * point
+                    or close[j] <= last_price - params["grid_step"] * point):
+                open_position(j, 1 if close[j] > last_price else -1)
+                last_price = close[j]
+        elif not positions and fast[j] > slow[j] and fast[j - 1] <= slow[j - 1] and rsi[j] < params["rsi_max"]:
+            open_position(j, 1)
+
+    for position in positions:
+        close_position(position, n - 1, close[-1] + (sp if position[1] < 0 else 0.0), "end")
+    return sorted(trades, key=lambda t: (t[1], t[0], t[2]))
+
+
+def engine_trades(result) -> list:
+    trades = result["trades"]
+    return sorted(zip(trades["entry_bar"].tolist(), trades["exit_bar"].tolist(),
+                      np.where(trades["type"] == "BUY", 1, -1).tolist(),
+                      np.round(trades["profit"].to_numpy(), 8).tolist(), trades["exit_reason"].tolist()),
+                  key=lambda t: (t[1], t[0], t[2]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del backtester sobre barras M1")
+    parser.add_argument("--symbol", default="EURUSD")
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--reference-days", type=int, default=60,
+                        help="días sobre los que se ejecuta también la referencia barra a barra")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    spec = SYMBOL_SPECS[args.symbol]
+    end = datetime(2026, 1, 1)
+    rates = generate_rates(args.symbol, end - timedelta(days=int(365 * args.years)), end)
+    reference_rates = rates[-args.reference_days * 1440 * 5 // 7:]
+    options = {"point": spec["point"], "contract_size": spec["contract_size"], "spread": spec["spread"]}
+
+    print(f"📊 {args.symbol} M1 | {len(rates):,} barras ({args.years:g} años) | "
+          f"referencia sobre {len(reference_rates):,} barras")
+    print("=" * 92)
+    print(f"{'estrategia':<10}{'grid_step/tp/sl':>18}{'trades':>9}{'motor':>12}{'por año':>12}"
+          f"{'referencia':>14}{'speedup':>9}  iguales")
+    for kind, params in CASES:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = run_backtest(kind, rates, params, **options)
+            times.append(time.perf_counter() - start)
+        seconds = statistics.median(times)
+
+        # Misma ventana corta con el motor y con la referencia barra a barra
+        start = time.perf_counter()
+        expected = reference_backtest(kind, reference_rates, params, **options)
+        reference_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        short = run_backtest(kind, reference_rates, params, **options)
+        short_seconds = time.perf_counter() - start
+        same = engine_trades(short) == expected
+
+        label = f"{params.get('grid_step', '-')}/{params['take_profit']}/{params['stop_loss']}"
+        print(f"{kind:<10}{label:>18}{result['metrics']['total_trades']:>9,}{seconds * 1000:>10.1f}ms"
+              f"{seconds / args.years * 1000:>10.1f}ms{reference_seconds * 1000:>12.1f}ms"
+              f"{reference_seconds / short_seconds:>8.0f}x  {'✅' if same else '❌'}")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
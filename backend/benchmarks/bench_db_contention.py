@@ -0,0 +1,138 @@
+"""
+Benchmark: contención en strategy_data.db
+Lectores concurrentes de /history (get_analysis_history) mientras varios
+escritores ejecutan save_analysis. Compara el modo anterior (una conexión por
+llamada, journal por defecto) con el pool por hilo + WAL.
+
+Uso (desde backend/):
+    python benchmarks/bench_db_contention.py [segundos] [lectores] [escritores] [posiciones]
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import StrategyDatabase, SQLiteConnectionPool  # noqa: E402
+
+
+class ConnectPerCallPool(SQLiteConnectionPool):
+    """Reproduce el comportamiento anterior: conexión nueva en cada llamada"""
+    def get(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+
+def make_analysis(n_positions: int) -> dict:
+    return {
+        "summary": {
+            "strategy": "Grid/Scalping",
+            "strategy_description": "benchmark",
+            "timeframe": "M1-M5",
+            "indicators": ["MA"],
+            "total_trades": n_positions,
+            "net_profit": 12.5,
+            "explanation": "benchmark"
+        },
+        "trades": [
+            {"ticket": i, "symbol": "EURUSD", "type": "BUY", "volume": 0.01,
+             "price_open": 1.1, "profit": 0.5, "time": "2024-01-01 00:00:00"}
+            for i in range(n_positions)
+        ]
+    }
+
+
+def run(mode: str, seconds: float, readers: int, writers: int, positions: int) -> dict:
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, f"bench_{mode}.db")
+
+    if mode == "legacy":
+        db = StrategyDatabase.__new__(StrategyDatabase)
+        db.db_path = db_path
+        db.raw_format = "json"
+        db.pool = ConnectPerCallPool(db_path, pragmas={})
+        db.init_database()
+    else:
+        db = StrategyDatabase(db_path, raw_format="json")
+
+    analysis = make_analysis(positions)
+    for _ in range(50):
+        db.save_analysis(analysis)
+
+    stop = threading.Event()
+    read_latencies, write_latencies, errors = [], [], []
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.get_analysis_history(50)
+            except sqlite3.Error as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - start)
+
+    def writer():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.save_analysis(analysis)
+            except sqlite3.Error as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                write_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    db.pool.close_all()
+
+    def pct(values, p):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+    return {
+        "reads_per_s": len(read_latencies) / seconds,
+        "writes_per_s": len(write_latencies) / seconds,
+        "read_p50_ms": pct(read_latencies, 0.50),
+        "read_p95_ms": pct(read_latencies, 0.95),
+        "write_p95_ms": pct(write_latencies, 0.95),
+        "errors": len(errors)
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    positions = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    print(f"📊 Contención SQLite: {readers} lectores /history, {writers} escritores save_analysis "
+          f"({positions} posiciones), {seconds:.0f}s")
+    print("=" * 78)
+    print(f"{'modo':<8}{'lecturas/s':>12}{'escrituras/s':>14}{'p50 lect.':>12}{'p95 lect.':>12}{'p95 escr.':>12}{'errores':>8}")
+    for mode in ("legacy", "pooled"):
+        r = run(mode, seconds, readers, writers, positions)
+        print(f"{mode:<8}{r['reads_per_s']:>12.0f}{r['writes_per_s']:>14.0f}"
+              f"{r['read_p50_ms']:>10.2f}ms{r['read_p95_ms']:>10.2f}ms{r['write_p95_ms']:>10.2f}ms{r['errors']:>8}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: refresco de métricas históricas tras unos pocos deals nuevos
+Compara, con N deals ya sincronizados en un DealStore temporal:
+- recalcular: deal_store.get_deals (sincroniza + carga la ventana) y
+  historical_metrics_from_deals sobre todo el historial
+- acumuladores: deal_store.get_metrics (sincroniza los deals nuevos, los suma
+  a su acumulador diario y combina las particiones de la ventana)
+
+Uso (desde backend/):
+    python benchmarks/bench_metric_accumulators.py [n_deals] [nuevos_deals] [days_back]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from deal_sources import SyntheticDealSource, generate_deals  # noqa: E402
+from deal_store import DealStore  # noqa: E402
+from strategy_engine import historical_metrics_from_deals  # noqa: E402
+
+LOGIN = 424242
+CHECK_KEYS = ("total_trades", "wins", "total_profit", "best_trade", "worst_trade",
+              "longest_win_streak", "longest_loss_streak", "max_drawdown")
+
+
+def with_new_deals(base: pd.DataFrame, n_new: int, offset: int) -> SyntheticDealSource:
+    """Fuente con `n_new` deals de cierre más (de posiciones distintas), en el último minuto"""
+    now = int(datetime.now().timestamp())
+    last = base.iloc[-1]
+    extra = pd.DataFrame([last] * n_new)
+    extra["ticket"] = base["ticket"].max() + offset + np.arange(1, n_new + 1)
+    extra["position_id"] = extra["ticket"]
+    extra["time"] = now - 60 + np.arange(n_new)
+    extra["time_msc"] = extra["time"] * 1000
+    extra["entry"] = 1
+    extra["profit"] = [5.0 - i for i in range(n_new)]
+    return SyntheticDealSource(deals=pd.concat([base, extra], ignore_index=True), login=LOGIN, open_positions=0)
+
+
+def main():
+    n_deals = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    n_new = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    days_back = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+
+    workdir = tempfile.mkdtemp(prefix="bench_accumulators_")
+    try:
+        store = DealStore(os.path.join(workdir, "deals.db"))
+        base = generate_deals(n_deals, days=days_back, end=datetime.now() - timedelta(hours=1))
+        source = SyntheticDealSource(deals=base, login=LOGIN, open_positions=0)
+
+        start = time.perf_counter()
+        store.get_metrics(source, days_back)
+        print(f"📊 {len(base):,} deals, ventana de {days_back} días, refresco con {n_new} deals nuevos")
+        print(f"   sincronización inicial + acumuladores: {time.perf_counter() - start:.2f}s")
+        print("=" * 64)
+
+        # Recalcular todo (camino de analyze_historical_data)
+        source = with_new_deals(base, n_new, 0)
+        start = time.perf_counter()
+        full = historical_metrics_from_deals(store.get_deals(source, days_back))
+        full_time = time.perf_counter() - start
+
+        # Acumuladores (otros n_new deals nuevos)
+        source = with_new_deals(base, n_new, n_new)
+        start = time.perf_counter()
+        incremental = store.get_metrics(source, days_back)
+        incremental_time = time.perf_counter() - start
+
+        print(f"{'recalcular (carga + métricas)':<36}{full_time * 1000:>12.1f} ms")
+        print(f"{'acumuladores diarios':<36}{incremental_time * 1000:>12.1f} ms"
+              f"   ({full_time / incremental_time:.0f}x)")
+        print("=" * 64)
+
+        # Mismas métricas que recalculando (con todos los deals nuevos)
+        check = historical_metrics_from_deals(store.get_deals(source, days_back))
+        mismatches = [k for k in CHECK_KEYS if abs(float(check[k]) - float(incremental[k])) > 1e-6]
+        print("✅ Métricas idénticas al recálculo completo" if not mismatches
+              else f"❌ Diferencias en: {mismatches}")
+        print(f"   trades: {full['total_trades']:,} → {incremental['total_trades']:,}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
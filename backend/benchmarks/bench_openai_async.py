@@ -0,0 +1,85 @@
+"""
+Benchmark: camino síncrono vs asíncrono de OpenAIAnalyzer contra el stub local
+- N análisis idénticos concurrentes: el camino síncrono hace N peticiones,
+  el asíncrono las coalesce en una
+- N análisis distintos: el semáforo acota la concurrencia hacia la API
+- latencia mayor que OPENAI_TIMEOUT: timeout por llamada y fallback
+
+Uso (desde backend/):
+    python benchmarks/bench_openai_async.py [peticiones] [latencia_s] [concurrencia]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from openai_stub import start_stub_server  # noqa: E402
+
+
+def trading_data(i: int) -> dict:
+    return {
+        "summary": {"strategy": "Grid/Scalping", "total_trades": 10 + i, "net_profit": 12.5},
+        "trades": [{"type": "BUY", "symbol": "EURUSD", "profit": 1.0}],
+        "historical_metrics": {}
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    server, state = start_stub_server(0, latency)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_MAX_CONCURRENCY"] = str(concurrency)
+    os.environ["OPENAI_TIMEOUT"] = str(latency * 4)
+    # Se mide la API, no la caché de respuestas
+    os.environ["AI_CACHE_ENABLED"] = "false"
+
+    from openai_analyzer import OpenAIAnalyzer
+    analyzer = OpenAIAnalyzer()
+
+    print(f"📊 OpenAI stub: {n} peticiones, latencia {latency}s, concurrencia máx. {concurrency}")
+    print("=" * 78)
+    print(f"{'escenario':<34}{'tiempo':>10}{'peticiones API':>16}{'máx. simult.':>14}")
+
+    def report(name, elapsed):
+        stats = state.snapshot()
+        print(f"{name:<34}{elapsed:>9.2f}s{stats['requests']:>16}{stats['max_in_flight']:>14}")
+        state.reset()
+
+    # Síncrono: un hilo bloqueado por petición (como el threadpool de FastAPI)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        list(pool.map(lambda _: analyzer.analyze_strategy_with_ai(trading_data(0)), range(n)))
+    report("síncrono, idénticas", time.perf_counter() - start)
+
+    async def run_async(datas):
+        return await asyncio.gather(*(analyzer.analyze_strategy_with_ai_async(d) for d in datas))
+
+    start = time.perf_counter()
+    asyncio.run(run_async([trading_data(0)] * n))
+    report("asíncrono, idénticas (coalescidas)", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    asyncio.run(run_async([trading_data(i) for i in range(n)]))
+    report("asíncrono, distintas (semáforo)", time.perf_counter() - start)
+
+    # Timeout por llamada: la latencia supera OPENAI_TIMEOUT
+    analyzer.timeout = latency / 2
+    start = time.perf_counter()
+    results = asyncio.run(run_async([trading_data(1000)]))
+    report("asíncrono, timeout", time.perf_counter() - start)
+    print("=" * 78)
+    print(f"fallback tras timeout: {not results[0]['ai_powered']} | métricas: {analyzer.stats()}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: optimización con IA completa vs en streaming contra el stub local
+Mide el tiempo hasta el primer dato utilizable (TTFB) y hasta el resultado
+final de optimize_parameters_with_ai_async y de optimize_parameters_stream
+(primer `delta` del reasoning, primer parámetro optimizado y primera
+advertencia).
+
+Uso (desde backend/):
+    python benchmarks/bench_optimize_stream.py [latencia_s] [repeticiones]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from openai_stub import start_stub_server  # noqa: E402
+
+STRATEGY = {"strategy_name": "Grid Scalping", "strategy_description": "Grid en rango",
+            "current_parameters": {"grid_step": 50, "lot_size": 0.01}}
+PERFORMANCE = {"win_rate": 62.0, "profit_factor": 1.4, "max_drawdown": 300, "total_trades": 150}
+
+
+async def measure_full(analyzer) -> dict:
+    start = time.perf_counter()
+    await analyzer.optimize_parameters_with_ai_async(STRATEGY, PERFORMANCE, use_cache=False)
+    elapsed = time.perf_counter() - start
+    return {"first": elapsed, "reasoning": elapsed, "parameter": elapsed, "warning": elapsed, "total": elapsed}
+
+
+async def measure_stream(analyzer) -> dict:
+    start = time.perf_counter()
+    marks = {}
+    async for event, data in analyzer.optimize_parameters_stream(STRATEGY, PERFORMANCE, use_cache=False):
+        now = time.perf_counter() - start
+        marks.setdefault("first", now)
+        if event == "delta" and data["field"] == "reasoning":
+            marks.setdefault("reasoning", now)
+        elif event == "item" and data["field"] == "optimized_parameters":
+            marks.setdefault("parameter", now)
+        elif event == "item" and data["field"] == "warnings":
+            marks.setdefault("warning", now)
+        elif event == "result":
+            marks["total"] = now
+    return marks
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    server, _ = start_stub_server(0, latency)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_TIMEOUT"] = str(latency * 4)
+    # Se mide la API, no la caché de respuestas (y no se escribe en strategy_data.db)
+    os.environ["AI_CACHE_ENABLED"] = "false"
+
+    from openai_analyzer import OpenAIAnalyzer
+    analyzer = OpenAIAnalyzer()
+
+    async def run(measure):
+        results = [await measure(analyzer) for _ in range(repeat)]
+        return {k: sum(r.get(k, 0) for r in results) / len(results) for k in results[0]}
+
+    print(f"📊 Optimización IA: completa vs streaming (stub con {latency}s de generación, {repeat} repeticiones)")
+    print("=" * 78)
+    print(f"{'modo':<12}{'1er evento':>12}{'reasoning':>12}{'1er parám.':>12}{'1ª advert.':>12}{'total':>12}")
+    for name, measure in (("completa", measure_full), ("streaming", measure_stream)):
+        r = asyncio.run(run(measure))
+        print(f"{name:<12}{r['first']:>11.3f}s{r.get('reasoning', 0):>11.3f}s{r.get('parameter', 0):>11.3f}s"
+              f"{r.get('warning', 0):>11.3f}s{r['total']:>11.3f}s")
+    print("=" * 78)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
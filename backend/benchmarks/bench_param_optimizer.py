@@ -0,0 +1,75 @@
+"""
+Benchmark: optimizador de parámetros (param_optimizer) sobre barras M1 sintéticas
+Ejecuta la misma búsqueda con grid exhaustivo, random y successive halving y
+mide tiempo, backtests ejecutados y qué puesto del grid exhaustivo ocupa la
+mejor combinación que encuentra cada método. Repite con distinto número de
+workers para ver la escala del pool de procesos.
+
+Uso (desde backend/):
+    python benchmarks/bench_param_optimizer.py [--symbol EURUSD] [--days 180]
+        [--workers 1,2,4] [--samples 60] [--eta 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from deal_sources import SYMBOL_SPECS, generate_rates  # noqa: E402
+from param_optimizer import ParameterOptimizer  # noqa: E402
+
+# Espacio reducido para que el grid exhaustivo sea la referencia (7 x 7 x 6 x 2 = 588 combinaciones)
+SPACE = {
+    "grid_step": [20, 30, 50, 75, 100, 150, 200],
+    "take_profit": [10, 20, 30, 50, 75, 100, 150],
+    "stop_loss": [30, 50, 100, 150, 200, 300],
+    "lot_size": [0.01, 0.05]
+}
+
+
+def params_key(result) -> tuple:
+    return tuple(sorted(result["params"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del optimizador de parámetros")
+    parser.add_argument("--symbol", default="EURUSD")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--workers", default=f"1,{max(1, (os.cpu_count() or 2) - 1)}",
+                        help="tamaños de pool, separados por comas")
+    parser.add_argument("--samples", type=int, default=60)
+    parser.add_argument("--eta", type=int, default=3)
+    args = parser.parse_args()
+
+    spec = SYMBOL_SPECS[args.symbol]
+    end = datetime(2026, 1, 1)
+    rates = generate_rates(args.symbol, end - timedelta(days=args.days), end)
+    print(f"📊 {args.symbol} M1 | {len(rates):,} barras ({args.days} días) | "
+          f"{os.cpu_count()} CPU | samples={args.samples} eta={args.eta}")
+
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        optimizer = ParameterOptimizer(workers=workers)
+        print("=" * 84)
+        print(f"{'workers':<9}{'método':<10}{'evaluaciones':>14}{'backtests':>11}{'tiempo':>10}"
+              f"{'backtests/s':>13}{'mejor PF':>10}{'puesto':>8}")
+        exhaustive_rank = {}
+        for method in ("grid", "random", "halving"):
+            start = time.perf_counter()
+            run = optimizer.run("grid", rates, spec, method=method, space=SPACE, samples=args.samples,
+                                eta=args.eta, top=10_000)
+            seconds = time.perf_counter() - start
+            if method == "grid":
+                exhaustive_rank = {params_key(r): i + 1 for i, r in enumerate(run["ranking"])}
+            best = run["ranking"][0] if run["ranking"] else None
+            position = exhaustive_rank.get(params_key(best), "-") if best else "-"
+            print(f"{workers:<9}{method:<10}{run['evaluations_done']:>14,}{run['backtests']:>11,}"
+                  f"{seconds:>9.1f}s{run['backtests'] / seconds:>13.1f}"
+                  f"{best['score'] if best else 0:>10.3f}{position:>8}")
+    print("=" * 84)
+
+
+if __name__ == "__main__":
+    main()
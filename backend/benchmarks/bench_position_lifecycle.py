@@ -0,0 +1,132 @@
+"""
+Benchmark: reconstrucción del ciclo de vida de las posiciones (position_lifecycle)
+Genera historiales sintéticos de millones de deals, convierte una parte de los
+cierres en salidas parciales y en reversiones (entry = INOUT), y mide:
+- build_positions (deals -> tabla de posiciones)
+- historical_metrics_from_deals (métricas sobre las posiciones cerradas)
+
+Comprueba además que la tabla conserva el P&L y el volumen de los deals y
+compara avg_duration_minutes con la estimación anterior (media del tiempo
+entre deals consecutivos).
+
+Uso (desde backend/):
+    python benchmarks/bench_position_lifecycle.py [--sizes 1000000,2000000,5000000]
+        [--partial 0.2] [--reversal 0.05] [--repeat 3]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from deal_sources import generate_deals  # noqa: E402
+from position_lifecycle import build_positions  # noqa: E402
+from strategy_engine import historical_metrics_from_deals  # noqa: E402
+
+
+def with_lifecycle_events(deals: pd.DataFrame, partial: float, reversal: float, seed: int = 7) -> pd.DataFrame:
+    """
+    Convierte una fracción `partial` de los cierres en dos salidas de medio
+    volumen y una fracción `reversal` en una reversión (INOUT del doble de
+    volumen) seguida del cierre del tramo contrario
+    """
+    rng = np.random.default_rng(seed)
+    exits = deals.index[deals["entry"] == 1].to_numpy()
+    pick = rng.random(len(exits))
+    partial_idx = exits[pick < partial]
+    reversal_idx = exits[(pick >= partial) & (pick < partial + reversal)]
+
+    extra = []
+    # Salidas parciales: la mitad del volumen y del profit se cierra 5 minutos después
+    if len(partial_idx):
+        halves = deals.loc[partial_idx].copy()
+        halves["volume"] = np.round(halves["volume"] / 2, 3)
+        halves["profit"] = np.round(halves["profit"] / 2, 2)
+        deals.loc[partial_idx, "volume"] = deals.loc[partial_idx, "volume"] - halves["volume"]
+        deals.loc[partial_idx, "profit"] = deals.loc[partial_idx, "profit"] - halves["profit"]
+        halves["time"] = halves["time"] + 300
+        extra.append(halves)
+
+    # Reversiones: el cierre pasa a INOUT con el doble de volumen y el tramo
+    # contrario se cierra 10 minutos después
+    if len(reversal_idx):
+        closing = deals.loc[reversal_idx].copy()
+        closing["type"] = 1 - closing["type"]
+        closing["entry"] = 1
+        closing["time"] = closing["time"] + 600
+        closing["profit"] = np.round(rng.normal(0, 5.0, len(closing)), 2)
+        deals.loc[reversal_idx, "entry"] = 2
+        deals.loc[reversal_idx, "volume"] = deals.loc[reversal_idx, "volume"] * 2
+        extra.append(closing)
+
+    deals = pd.concat([deals, *extra], ignore_index=True).sort_values("time", kind="stable")
+    deals["ticket"] = np.arange(1, len(deals) + 1)
+    deals["time_msc"] = deals["time"] * 1000
+    deals["time"] = pd.to_datetime(deals["time"], unit="s")
+    return deals.reset_index(drop=True)
+
+
+def legacy_avg_duration(deals_df: pd.DataFrame) -> float:
+    """Estimación anterior: media del tiempo entre deals consecutivos (minutos)"""
+    return float((deals_df["time"].diff().dt.total_seconds().dropna() / 60).mean())
+
+
+def measure(fn, args, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_mb": (peak - baseline) / 1024 ** 2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de build_positions sobre millones de deals")
+    parser.add_argument("--sizes", default="1000000,2000000,5000000", help="número de deals, separados por comas")
+    parser.add_argument("--partial", type=float, default=0.2, help="fracción de cierres parciales")
+    parser.add_argument("--reversal", type=float, default=0.05, help="fracción de reversiones")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"📊 position_lifecycle | {args.partial:.0%} cierres parciales | {args.reversal:.0%} reversiones"
+          f" | {args.repeat} repeticiones")
+    print("=" * 78)
+    for n_deals in (int(s.replace("_", "")) for s in args.sizes.split(",")):
+        deals = with_lifecycle_events(generate_deals(n_deals, days=args.days), args.partial, args.reversal)
+        positions = build_positions(deals)
+        closed = positions[positions["status"] == "closed"]
+
+        print(f"{len(deals):,} deals -> {len(positions):,} posiciones "
+              f"({int((positions['leg'] > 0).sum()):,} tramos por reversión, "
+              f"{int((positions['exits'] > 1).sum()):,} con salidas parciales)")
+        for name, fn in (("build_positions", build_positions),
+                         ("historical_metrics_from_deals", historical_metrics_from_deals)):
+            result = measure(fn, (deals,), args.repeat)
+            print(f"   {name:<32}{result['seconds'] * 1000:>10.1f} ms"
+                  f"{len(deals) / result['seconds'] / 1e6:>8.2f} M deals/s{result['peak_mb']:>9.1f} MB")
+
+        # Conservación: P&L y volumen de salida de los deals = suma de la tabla
+        profit_ok = np.isclose(deals["profit"].sum(), positions["profit"].sum())
+        volume_ok = np.isclose(closed["closed_volume"].sum(), closed["volume"].sum())
+        print(f"   {'✅' if profit_ok and volume_ok else '❌'} P&L y volumen conservados | "
+              f"duración media: {closed['duration_minutes'].mean():.1f} min "
+              f"(antes: {legacy_avg_duration(deals):.1f} min entre deals)")
+        print("-" * 78)
+
+
+if __name__ == "__main__":
+    main()
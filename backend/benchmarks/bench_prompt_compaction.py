@@ -0,0 +1,179 @@
+"""
+Benchmark: tamaño y latencia del prompt de análisis, antes y después de la
+compactación (prompt_compactor)
+- antes: plantilla anterior con json.dumps(historical_metrics, indent=2), con
+  las métricas tal y como llegaban (deals_df / closed_trades_df incluidos: no
+  serializable) o con los DataFrames volcados como registros
+- después: sketches de tamaño fijo ajustados al presupuesto de tokens
+Mide caracteres, tokens, tiempo de construcción y la ida y vuelta contra el
+stub de OpenAI (benchmarks/openai_stub.py).
+
+Uso (desde backend/):
+    python benchmarks/bench_prompt_compaction.py [trades_cerrados] [posiciones] [símbolos]
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from run_length import run_stats  # noqa: E402
+from prompt_compactor import (  # noqa: E402
+    COMPACTION_LEVELS, compact_prompt, count_tokens, profit_distribution, tiktoken
+)
+from openai_stub import start_stub_server  # noqa: E402
+
+
+def synthetic_data(n_closed: int, n_open: int, n_symbols: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    closed = rng.normal(0.4, 6.0, n_closed).round(2)
+    runs = run_stats(closed)
+    symbols = [f"SYM{i:03d}" for i in range(n_symbols)]
+    symbol_ids = rng.integers(0, n_symbols, n_closed)
+
+    deals_df = pd.DataFrame({
+        "ticket": np.arange(n_closed),
+        "time": pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(n_closed) * 5, unit="min"),
+        "symbol": np.array(symbols)[symbol_ids],
+        "type": rng.integers(0, 2, n_closed),
+        "entry": 1,
+        "volume": 0.01,
+        "price": 1.1,
+        "profit": closed
+    })
+    historical_metrics = {
+        "total_trades": n_closed,
+        "wins": int((closed > 0).sum()),
+        "losses": int((closed <= 0).sum()),
+        "win_rate": float((closed > 0).mean() * 100),
+        "total_profit": float(closed.sum()),
+        "best_trade": float(closed.max()),
+        "worst_trade": float(closed.min()),
+        **runs,
+        "avg_duration_minutes": 42.0,
+        "profit_distribution": profit_distribution(closed),
+        "deals_df": deals_df,
+        "closed_trades_df": deals_df
+    }
+    symbol_stats = {}
+    for i, symbol in enumerate(symbols):
+        profits = closed[symbol_ids == i]
+        if profits.size:
+            symbol_stats[symbol] = {
+                "total_profit": float(profits.sum()), "avg_profit": float(profits.mean()),
+                "trade_count": int(profits.size), "best_trade": float(profits.max()),
+                "worst_trade": float(profits.min())
+            }
+
+    trades = [
+        {"ticket": i, "symbol": symbols[int(rng.integers(0, n_symbols))],
+         "type": "BUY" if rng.random() < 0.5 else "SELL", "volume": 0.01,
+         "price_open": 1.1, "profit": round(float(rng.normal(0, 3)), 2), "time": "2024-01-01 00:00:00"}
+        for i in range(n_open)
+    ]
+    summary = {"total_trades": n_open, "net_profit": sum(t["profit"] for t in trades), "win_rate": 50.0,
+               "profit_factor": 1.1, "max_drawdown": 80.0, "sharpe_ratio": 0.3, "timeframe": "M1-M5"}
+    return {"summary": summary, "trades": trades, "historical_metrics": historical_metrics,
+            "symbol_analysis": {"symbols": symbol_stats}}
+
+
+def dataframes_as_records(historical_metrics: dict) -> dict:
+    """Métricas con los DataFrames volcados como lista de registros"""
+    return {k: v.to_dict("records") if isinstance(v, pd.DataFrame) else v
+            for k, v in historical_metrics.items()}
+
+
+def legacy_prompt(analyzer, trading_data: dict, historical_metrics: dict) -> str:
+    """Plantilla anterior: métricas históricas completas en JSON indentado"""
+    summary = trading_data["summary"]
+    trades = trading_data["trades"]
+    buys = sum(1 for t in trades if t.get("type") == "BUY")
+    profits = [t.get("profit", 0) for t in trades]
+    sections = analyzer._strategy_analysis_template(summary, {"historical": {}, "open_positions": {}, "symbols": {}})
+    instructions = sections[sections.index("**INSTRUCCIONES:**"):]
+    return f"""Analiza esta estrategia de trading basándote en los siguientes datos:
+
+**MÉTRICAS ACTUALES:**
+- Total de trades: {summary.get('total_trades', 0)}
+- Profit neto: ${summary.get('net_profit', 0):.2f}
+- Win Rate: {summary.get('win_rate', 0):.2f}%
+- Profit Factor: {summary.get('profit_factor', 0):.2f}
+- Max Drawdown: ${summary.get('max_drawdown', 0):.2f}
+- Sharpe Ratio: {summary.get('sharpe_ratio', 0):.2f}
+- Timeframe detectado: {summary.get('timeframe', 'N/A')}
+
+**MÉTRICAS HISTÓRICAS:**
+{json.dumps(historical_metrics, indent=2, default=str) if historical_metrics else "No disponibles"}
+
+**PATRONES DE TRADING DETECTADOS:**
+- Ratio BUY/SELL: {buys} BUY / {len(trades) - buys} SELL
+- Símbolos operados: {list(set(t.get('symbol', '') for t in trades))[:5]}
+- Distribución de profits: {sum(1 for p in profits if p > 0)} wins / {sum(1 for p in profits if p < 0)} losses / {sum(1 for p in profits if p == 0)} neutral
+
+{instructions}"""
+
+
+def timed(fn, repeat: int = 20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return value, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    n_closed = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_open = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    n_symbols = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+
+    server, _ = start_stub_server(0, 0.0)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["AI_CACHE_ENABLED"] = "false"
+    from openai_analyzer import OpenAIAnalyzer, STRATEGY_ANALYSIS_SYSTEM_PROMPT
+    analyzer = OpenAIAnalyzer()
+
+    data = synthetic_data(n_closed, n_open, n_symbols)
+    tokenizer = "tiktoken" if tiktoken is not None else "aprox. chars/4"
+
+    print(f"📊 Prompt de análisis: {n_closed} trades cerrados, {n_open} posiciones, {n_symbols} símbolos "
+          f"(tokens: {tokenizer})")
+    print("=" * 78)
+    print(f"{'prompt':<24}{'caracteres':>12}{'tokens':>10}{'construcción':>15}{'ida y vuelta':>15}")
+
+    def roundtrip(prompt):
+        messages = [{"role": "system", "content": STRATEGY_ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}]
+        return analyzer._complete(messages, use_cache=False)
+
+    try:
+        json.dumps(data["historical_metrics"], indent=2)
+    except TypeError as e:
+        print(f"{'antes (DataFrames)':<24}no serializable: {e}")
+
+    records = dataframes_as_records(data["historical_metrics"])
+    public = {k: v for k, v in data["historical_metrics"].items() if not k.endswith("_df")}
+    rows = [("antes (registros)", lambda: legacy_prompt(analyzer, data, records), 1),
+            ("antes (sin DataFrames)", lambda: legacy_prompt(analyzer, data, public), 20),
+            ("después (sketches)", lambda: analyzer._build_strategy_analysis_prompt(data), 20)]
+    for name, build, repeat in rows:
+        prompt, build_ms = timed(build, repeat)
+        _, rtt_ms = timed(lambda: roundtrip(prompt), repeat=max(1, repeat // 2))
+        print(f"{name:<24}{len(prompt):>12}{count_tokens(prompt):>10}{build_ms:>13.2f}ms{rtt_ms:>13.2f}ms")
+
+    print("-" * 78)
+    print("Ajuste al presupuesto (nivel de compactación elegido):")
+    for budget in (4000, 1000, 800, 650):
+        _, info = compact_prompt(data, lambda s: analyzer._strategy_analysis_template(data["summary"], s), budget)
+        print(f"  presupuesto {budget:>5} tokens -> nivel {info['level']}/{len(COMPACTION_LEVELS) - 1}, "
+              f"{info['tokens']} tokens{' (excede)' if info['over_budget'] else ''}")
+    print("=" * 78)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
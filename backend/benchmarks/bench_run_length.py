@@ -0,0 +1,77 @@
+"""
+Benchmark: rachas y pérdidas consecutivas con bucle Python vs kernels NumPy
+Uso (desde backend/):  python benchmarks/bench_run_length.py [n_deals]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from run_length import run_stats, longest_run  # noqa: E402
+
+
+def loop_streaks(profits):
+    """Implementación original de analyze_historical_data()"""
+    win_streak = loss_streak = longest_win_streak = longest_loss_streak = 0
+    for is_win in profits > 0:
+        if is_win:
+            win_streak += 1
+            loss_streak = 0
+            longest_win_streak = max(longest_win_streak, win_streak)
+        else:
+            loss_streak += 1
+            win_streak = 0
+            longest_loss_streak = max(longest_loss_streak, loss_streak)
+    return longest_win_streak, longest_loss_streak
+
+
+def loop_consecutive_losses(profits):
+    """Implementación original de detect_alerts()"""
+    consecutive_losses = max_consecutive_losses = 0
+    for profit in profits:
+        if profit < 0:
+            consecutive_losses += 1
+            max_consecutive_losses = max(max_consecutive_losses, consecutive_losses)
+        else:
+            consecutive_losses = 0
+    return max_consecutive_losses
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(42)
+    profits = rng.normal(0.5, 10.0, n)
+
+    print(f"📊 Rachas sobre {n:,} deals")
+    print("=" * 60)
+
+    t_loop, loop_result = timed(loop_streaks, profits)
+    t_vec, stats = timed(run_stats, profits)
+    assert loop_result == (stats["longest_win_streak"], stats["longest_loss_streak"])
+    print(f"Rachas (bucle Python):        {t_loop * 1000:10.1f} ms")
+    print(f"Rachas + drawdown (NumPy):    {t_vec * 1000:10.1f} ms   x{t_loop / t_vec:.0f}")
+
+    t_loop, loop_result = timed(loop_consecutive_losses, profits)
+    t_vec, vec_result = timed(longest_run, profits < 0)
+    assert loop_result == vec_result
+    print(f"Pérdidas consecutivas (bucle):{t_loop * 1000:10.1f} ms")
+    print(f"Pérdidas consecutivas (NumPy):{t_vec * 1000:10.1f} ms   x{t_loop / t_vec:.0f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
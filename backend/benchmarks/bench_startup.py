@@ -0,0 +1,127 @@
+"""
+Benchmark: arranque en frío de la API
+En procesos nuevos (y con una DB nueva en un directorio temporal) mide:
+- import de api.py
+- arranque del lifespan (TestClient) hasta poder servir
+- primera respuesta de /health
+- primera respuesta de /analyze (incluye lo que se haya diferido)
+OpenAI apunta al stub local con la latencia indicada, para ver cuánto pesa el
+ping de health check. Si MetaTrader5 no está instalado se usa un terminal
+simulado en memoria (solo dentro del proceso medido).
+
+Con --ref <commit> mide además el árbol de ese commit (git archive) para
+comparar antes/después.
+
+Uso (desde backend/):
+    python benchmarks/bench_startup.py [latencia_openai_s] [repeticiones] [--ref HEAD~1]
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from openai_stub import start_stub_server  # noqa: E402
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+MEASURE_SNIPPET = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+
+from mt5_session import mt5_session
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    class FakeMT5:
+        def initialize(self): return True
+        def shutdown(self): pass
+        def last_error(self): return (0, "ok")
+        def terminal_info(self): return {"connected": True}
+        def account_info(self): return None
+        def positions_get(self): return []
+        def history_deals_get(self, *args): return []
+    mt5_session._mt5 = FakeMT5()
+
+from fastapi.testclient import TestClient
+with TestClient(api.app) as client:
+    t2 = time.perf_counter()
+    client.get("/health")
+    t3 = time.perf_counter()
+    client.get("/analyze")
+    t4 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "lifespan": t2 - t1, "health": t3 - t0, "analyze": t4 - t0}))
+'''
+
+
+def measure(backend_dir: str, env: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        run_env = dict(env, PYTHONPATH=backend_dir + os.pathsep + env.get("PYTHONPATH", ""))
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE_SNIPPET], cwd=workdir, env=run_env,
+            capture_output=True, text=True, timeout=300
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if output.returncode != 0 or not lines:
+            raise RuntimeError(output.stderr[-500:])
+        return json.loads(lines[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def export_ref(ref: str) -> str:
+    """Extrae backend/ del commit `ref` en un directorio temporal"""
+    target = tempfile.mkdtemp(prefix="bench_startup_ref_")
+    repo_root = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    relative = os.path.relpath(BACKEND_DIR, repo_root)
+    archive = subprocess.run(["git", "archive", ref, relative], cwd=repo_root,
+                             capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return os.path.join(target, relative)
+
+
+def report(name: str, backend_dir: str, env: dict, repeat: int):
+    runs = [measure(backend_dir, env) for _ in range(repeat)]
+    avg = {k: sum(r[k] for r in runs) / len(runs) for k in runs[0]}
+    print(f"{name:<14}{avg['import']:>11.3f}s{avg['lifespan']:>11.3f}s{avg['health']:>13.3f}s{avg['analyze']:>13.3f}s")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    ref = sys.argv[sys.argv.index("--ref") + 1] if "--ref" in sys.argv else None
+    if ref in args:
+        args.remove(ref)
+    latency = float(args[0]) if len(args) > 0 else 2.0
+    repeat = int(args[1]) if len(args) > 1 else 3
+
+    server, _ = start_stub_server(0, latency)
+    env = dict(os.environ, OPENAI_API_KEY="stub",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{server.server_address[1]}/v1",
+               AI_CACHE_ENABLED="false", RETENTION_INTERVAL_HOURS="0")
+
+    print(f"📊 Arranque en frío de la API (ping OpenAI con {latency}s de latencia, {repeat} repeticiones)")
+    print("=" * 64)
+    print(f"{'árbol':<14}{'import':>12}{'lifespan':>12}{'1er /health':>14}{'1er /analyze':>14}")
+    if ref:
+        ref_dir = export_ref(ref)
+        try:
+            report(ref[:14], ref_dir, env, repeat)
+        finally:
+            shutil.rmtree(os.path.dirname(ref_dir) if os.path.basename(ref_dir) == "backend" else ref_dir,
+                          ignore_errors=True)
+    report("actual", BACKEND_DIR, env, repeat)
+    print("=" * 64)
+    print("Tiempos acumulados desde el inicio del import, salvo 'lifespan'")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Benchmark: funciones de análisis de strategy_engine sobre historiales sintéticos
+Genera historiales con deal_sources.generate_deals (símbolos, sesiones y
+comportamiento grid / martingale / hedge configurables) y mide, por tamaño:
+- analyze_historical_data (carga de la ventana desde la fuente + métricas)
+- build_positions (reconstrucción de posiciones del deals_df de la ventana)
+- analyze_trading_sessions, analyze_trading_schedule, analyze_risk_management,
+  analyze_symbols_performance (sobre esa tabla de posiciones)
+- calculate_advanced_metrics y detect_strategy (sobre una posición por deal de entrada)
+
+Tiempo: mediana y mejor de N repeticiones (sin tracemalloc). Memoria: pico de
+tracemalloc durante una ejecución aparte, descontando lo ya reservado antes.
+
+Cada ejecución añade una línea JSON por (comportamiento, tamaño, función) a
+benchmarks/results/strategy_engine.jsonl con el commit actual, de modo que con
+--compare se ven las regresiones frente a otro commit (por defecto, el último
+distinto del actual que haya en el archivo).
+
+Uso (desde backend/):
+    python benchmarks/bench_strategy_engine.py [--sizes 10000,100000,1000000]
+        [--behavior random|grid|martingale|hedge|all] [--symbols EURUSD,XAUUSD]
+        [--repeat 3] [--days 365] [--compare [commit]] [--threshold 0.2] [--check] [--no-save]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from deal_sources import BEHAVIORS, SyntheticDealSource, generate_deals  # noqa: E402
+from position_lifecycle import build_positions  # noqa: E402
+from strategy_engine import (  # noqa: E402
+    analyze_historical_data, analyze_risk_management, analyze_symbols_performance,
+    analyze_trading_schedule, analyze_trading_sessions, calculate_advanced_metrics, detect_strategy
+)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "strategy_engine.jsonl")
+
+
+def git_revision() -> dict:
+    """Commit actual (y si hay cambios sin commitear en archivos versionados)"""
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD") or "unknown",
+                "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": "unknown", "dirty": False}
+
+
+def positions_frame(deals_df: pd.DataFrame) -> pd.DataFrame:
+    """Una "posición" por deal de entrada con el resultado de su salida (formato de _analyze_trades)"""
+    entries = deals_df[deals_df["entry"] == 0]
+    exits = deals_df[deals_df["entry"] == 1].set_index("position_id")["profit"]
+    return pd.DataFrame({
+        "ticket": entries["ticket"].to_numpy(),
+        "symbol": entries["symbol"].to_numpy(),
+        "type": np.where(entries["type"].to_numpy() == 0, "BUY", "SELL"),
+        "volume": entries["volume"].to_numpy(),
+        "price_open": entries["price"].to_numpy(),
+        "profit": exits.reindex(entries["position_id"]).fillna(0.0).to_numpy(),
+        "time": entries["time"].to_numpy()
+    })
+
+
+def measure(fn, args, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"seconds": statistics.median(times), "best": min(times), "peak_mb": (peak - baseline) / 1024 ** 2}
+
+
+def run_size(behavior: str, n_deals: int, symbols, days: int, repeat: int) -> list:
+    source = SyntheticDealSource(deals=generate_deals(n_deals, symbols, days, behavior=behavior),
+                                 open_positions=0)
+    deals_df = source.get_deals(days)
+    positions = positions_frame(deals_df)
+    lifecycle = build_positions(deals_df)
+
+    cases = [
+        ("analyze_historical_data", analyze_historical_data, (days, source)),
+        ("build_positions", build_positions, (deals_df,)),
+        ("analyze_trading_sessions", analyze_trading_sessions, (lifecycle,)),
+        ("analyze_trading_schedule", analyze_trading_schedule, (lifecycle,)),
+        ("analyze_risk_management", analyze_risk_management, (lifecycle,)),
+        ("analyze_symbols_performance", analyze_symbols_performance, (lifecycle,)),
+        ("calculate_advanced_metrics", calculate_advanced_metrics, (positions,)),
+        ("detect_strategy", detect_strategy, (positions,)),
+    ]
+    results = []
+    for name, fn, args in cases:
+        result = measure(fn, args, repeat)
+        result.update(function=name, behavior=behavior, n_deals=n_deals, window_deals=len(deals_df),
+                      deals_per_second=len(deals_df) / result["seconds"] if result["seconds"] else None)
+        results.append(result)
+        print(f"{behavior:<12}{n_deals:>11,}  {name:<30}{result['seconds'] * 1000:>11.1f} ms"
+              f"{result['peak_mb']:>11.1f} MB")
+    return results
+
+
+def load_records(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(current: list, records: list, ref: str, threshold: float) -> int:
+    """Imprime la comparación con `ref` y devuelve el número de regresiones"""
+    head = current[0]["commit"] if current else None
+    if ref is None:
+        # Último commit distinto del actual con resultados guardados
+        ref = next((r["commit"] for r in reversed(records) if r["commit"] != head), None)
+    if ref is None:
+        print("ℹ️ No hay resultados de otro commit con los que comparar")
+        return 0
+
+    # Última medición de ref para cada caso
+    baseline = {}
+    for record in records:
+        if record["commit"].startswith(ref):
+            baseline[(record["behavior"], record["n_deals"], record["function"])] = record
+
+    regressions = 0
+    print(f"\n📈 Comparación con {ref} (regresión si tarda > {threshold:.0%} más)")
+    print("=" * 86)
+    print(f"{'comportamiento':<15}{'deals':>11}  {'función':<30}{ref[:9]:>10}{'actual':>10}{'cambio':>10}")
+    for result in current:
+        key = (result["behavior"], result["n_deals"], result["function"])
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["seconds"], result["seconds"]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = " ⚠️"
+        print(f"{key[0]:<15}{key[1]:>11,}  {key[2]:<30}{before * 1000:>8.1f}ms{after * 1000:>8.1f}ms"
+              f"{change:>+10.1%}{flag}")
+    print("=" * 86)
+    print(f"{regressions} regresiones" if regressions else "✅ Sin regresiones")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de strategy_engine sobre historiales sintéticos")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="número de deals, separados por comas")
+    parser.add_argument("--behavior", default="random", choices=BEHAVIORS + ("all",))
+    parser.add_argument("--symbols", default="EURUSD,GBPUSD,XAUUSD")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", nargs="?", const="", default=None,
+                        help="commit con el que comparar (sin valor: el último distinto del actual)")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--check", action="store_true", help="sale con código 1 si hay regresiones")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(s.replace("_", "")) for s in args.sizes.split(",")]
+    behaviors = BEHAVIORS if args.behavior == "all" else (args.behavior,)
+    symbols = tuple(s.strip() for s in args.symbols.split(",") if s.strip())
+    revision = git_revision()
+    context = {
+        **revision,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()}",
+        "repeat": args.repeat,
+        "days": args.days
+    }
+
+    print(f"📊 strategy_engine @ {revision['commit']}{' (con cambios)' if revision['dirty'] else ''}"
+          f" | {args.repeat} repeticiones | {len(symbols)} símbolos | {args.days} días")
+    print("=" * 78)
+    print(f"{'comportamiento':<12}{'deals':>11}  {'función':<30}{'mediana':>14}{'pico mem.':>11}")
+    current = []
+    for behavior in behaviors:
+        for n_deals in sizes:
+            current += [{**context, **r} for r in run_size(behavior, n_deals, symbols, args.days, args.repeat)]
+    print("=" * 78)
+
+    records = load_records(args.output)
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in current:
+                f.write(json.dumps(record) + "\n")
+        print(f"💾 {len(current)} resultados añadidos a {args.output}")
+
+    regressions = 0
+    if args.compare is not None:
+        regressions = compare(current, records, args.compare or None, args.threshold)
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
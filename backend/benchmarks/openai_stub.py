@@ -0,0 +1,167 @@
+"""
+Servidor stub compatible con la API de OpenAI (POST /v1/chat/completions)
+Responde con un JSON fijo válido para el análisis de estrategia y para la
+optimización tras una latencia configurable. Con "stream": true envía el mismo
+JSON en trozos (chat.completion.chunk por SSE) repartidos a lo largo de esa
+latencia. Lleva la cuenta de peticiones y del máximo de peticiones
+simultáneas (GET /stats).
+
+Uso (desde backend/):
+    python benchmarks/openai_stub.py [puerto] [latencia_s]
+
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python api.py
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_CONTENT = {
+    "strategy_name": "Grid Scalping (stub)",
+    "strategy_description": "Respuesta del servidor stub",
+    "confidence_score": 80,
+    "indicators_detected": ["MA"],
+    "trading_style": "scalping",
+    "risk_profile": "moderate",
+    "detailed_analysis": "stub",
+    "strengths": [],
+    "weaknesses": [],
+    "market_conditions": "ranging",
+    "optimized_parameters": {"grid_step": 40},
+    "expected_improvement": "stub",
+    "reasoning": "Respuesta del servidor stub: reduce el paso del grid para capturar más rebotes "
+                 "en rango y mantiene el lote para no aumentar el drawdown.",
+    "risk_assessment": "stub",
+    "implementation_steps": [],
+    "warnings": ["Respuesta de prueba"]
+}
+
+STREAM_CHUNK_CHARS = 12
+
+
+class StubState:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "in_flight": self.in_flight,
+                    "max_in_flight": self.max_in_flight, "latency": self.latency}
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.max_in_flight = 0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente abandonó la petición (p. ej. por timeout)
+                pass
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(state.snapshot())
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send_json({"error": "not found"}, 404)
+                return
+
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                if request.get("stream"):
+                    self._stream(request)
+                    return
+                time.sleep(state.latency)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+            self._send_json({
+                "id": f"chatcmpl-stub-{state.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": json.dumps(STUB_CONTENT)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+
+        def _stream(self, request):
+            # Mismo contenido en trozos de STREAM_CHUNK_CHARS, espaciados para sumar la latencia
+            content = json.dumps(STUB_CONTENT, ensure_ascii=False)
+            pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            try:
+                for piece in pieces:
+                    time.sleep(state.latency / len(pieces))
+                    chunk = {
+                        "id": f"chatcmpl-stub-{state.requests}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model", "stub"),
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, latency: float = 0.5):
+    """Arranca el stub en un hilo; devuelve (server, state). port=0 elige uno libre"""
+    state = StubState(latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    server, _ = start_stub_server(port, latency)
+    print(f"🧪 Stub OpenAI en http://127.0.0.1:{server.server_address[1]}/v1 (latencia {latency}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
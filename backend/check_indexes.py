@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Verificación de Índices y Planes de Consulta
+Aplica las migraciones pendientes y comprueba con EXPLAIN QUERY PLAN que las
+consultas de historial, evolución, alertas y símbolos usan sus índices.
+Sale con código 1 si alguna consulta hace un recorrido completo de tabla.
+
+Uso:  python check_indexes.py [ruta_db]
+"""
+
+import sys
+from colorama import init, Fore, Style
+
+from database import StrategyDatabase
+
+# Inicializar colorama
+init(autoreset=True)
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "strategy_data.db"
+
+    print(f"\n{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}🔍 Verificación de Planes de Consulta - {db_path}{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
+
+    database = StrategyDatabase(db_path)
+    print(f"{Fore.YELLOW}🗄️  Versión de esquema: {database.get_schema_version()}{Style.RESET_ALL}\n")
+
+    all_ok = True
+    for result in database.check_query_plans():
+        if result["ok"]:
+            print(f"  {Fore.GREEN}✅ {result['query']}{Style.RESET_ALL}")
+        else:
+            all_ok = False
+            print(f"  {Fore.RED}❌ {result['query']} (esperado: {result['expected_index']}){Style.RESET_ALL}")
+        print(f"     {result['plan']}")
+
+    print(f"\n{Fore.CYAN}{'='*60}{Style.RESET_ALL}")
+    if all_ok:
+        print(f"{Fore.GREEN}✅ Todas las consultas usan sus índices{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.RED}❌ Hay consultas sin índice: revisa MIGRATIONS en database.py{Style.RESET_ALL}")
+    print(f"{Fore.CYAN}{'='*60}{Style.RESET_ALL}\n")
+
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    exit(main())
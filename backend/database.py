@@ -1,390 +1,919 @@
 import sqlite3
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import zlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date
+from typing import Callable, List, Dict, Optional
 import os
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Formatos de almacenamiento de strategy_analysis.raw_data
+RAW_FORMAT_JSON = "json"
+RAW_FORMAT_ZLIB = "zlib"
+RAW_FORMAT_ZSTD = "zstd"
+
+INSERT_ANALYSIS_SQL = '''
+    INSERT INTO strategy_analysis (
+        strategy_name, strategy_description, timeframe, indicators,
+        total_trades, net_profit, avg_profit, win_rate,
+        profit_factor, max_drawdown, sharpe_ratio,
+        explanation, raw_data, raw_format
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_TRADE_SQL = '''
+    INSERT INTO trades_history (
+        analysis_id, ticket, symbol, trade_type, volume,
+        price_open, profit, open_time
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+SELECT_HISTORY_SQL = '''
+    SELECT * FROM strategy_analysis
+    ORDER BY timestamp DESC
+    LIMIT ?
+'''
+
+SELECT_EVOLUTION_SQL = '''
+    SELECT * FROM strategy_analysis
+    WHERE strategy_name = ?
+    ORDER BY timestamp ASC
+'''
+
+SELECT_SYMBOL_PERFORMANCE_SQL = '''
+    SELECT
+        COUNT(*) as total_trades,
+        SUM(profit) as total_profit,
+        AVG(profit) as avg_profit,
+        MAX(profit) as best_trade,
+        MIN(profit) as worst_trade
+    FROM trades_history
+    WHERE symbol = ?
+'''
+
+SELECT_DAILY_SQL = '''
+    SELECT * FROM strategy_analysis_daily
+    WHERE strategy_name = ?
+    ORDER BY day DESC
+    LIMIT ?
+'''
+
+SELECT_TRADES_BY_ANALYSIS_SQL = '''
+    SELECT ticket, symbol, profit FROM trades_history WHERE analysis_id = ?
+'''
+
+SELECT_ALERTS_SQL = '''
+    SELECT * FROM alerts
+    ORDER BY timestamp DESC
+    LIMIT ?
+'''
+
+SELECT_SYMBOL_ROLLUP_SQL = '''
+    SELECT trade_count, total_profit, best_trade, worst_trade
+    FROM symbol_rollup
+    WHERE symbol = ?
+'''
+
+SELECT_GLOBAL_ROLLUP_SQL = '''
+    SELECT total_analysis, total_trades, total_profit, best_strategy_name, best_strategy_profit
+    FROM global_rollup
+    WHERE id = 1
+'''
+
+# Los rollups son contadores acumulados: se suman deltas, nunca se recalculan
+UPSERT_SYMBOL_ROLLUP_SQL = '''
+    INSERT INTO symbol_rollup (symbol, trade_count, total_profit, best_trade, worst_trade, updated_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(symbol) DO UPDATE SET
+        trade_count = trade_count + excluded.trade_count,
+        total_profit = COALESCE(total_profit, 0) + COALESCE(excluded.total_profit, 0),
+        best_trade = MAX(COALESCE(best_trade, excluded.best_trade), COALESCE(excluded.best_trade, best_trade)),
+        worst_trade = MIN(COALESCE(worst_trade, excluded.worst_trade), COALESCE(excluded.worst_trade, worst_trade)),
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+UPDATE_GLOBAL_ROLLUP_SQL = '''
+    UPDATE global_rollup SET
+        total_analysis = total_analysis + 1,
+        total_trades = total_trades + ?,
+        total_profit = COALESCE(total_profit, 0) + COALESCE(?, 0),
+        best_strategy_name = CASE
+            WHEN ? IS NOT NULL AND (best_strategy_profit IS NULL OR ? > best_strategy_profit) THEN ?
+            ELSE best_strategy_name END,
+        best_strategy_profit = CASE
+            WHEN ? IS NOT NULL AND (best_strategy_profit IS NULL OR ? > best_strategy_profit) THEN ?
+            ELSE best_strategy_profit END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+'''
+
+
+# ===============================================================
+#  MIGRACIONES DE ESQUEMA
+#  Versionadas y aplicadas en orden; cada una queda registrada en
+#  schema_migrations. Deben ser idempotentes y no se editan una vez
+#  publicadas: los cambios nuevos van en una migración nueva.
+# ===============================================================
+
+def _migration_raw_format(cursor):
+    cursor.execute("PRAGMA table_info(strategy_analysis)")
+    if "raw_format" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE strategy_analysis ADD COLUMN raw_format TEXT DEFAULT 'json'")
+
+
+def _migration_rollups(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS symbol_rollup (
+            symbol TEXT PRIMARY KEY,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            total_profit REAL,
+            best_trade REAL,
+            worst_trade REAL,
+            updated_at DATETIME
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS global_rollup (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_analysis INTEGER NOT NULL DEFAULT 0,
+            total_trades INTEGER NOT NULL DEFAULT 0,
+            total_profit REAL,
+            best_strategy_name TEXT,
+            best_strategy_profit REAL,
+            updated_at DATETIME
+        )
+    ''')
+    # Cargar los rollups con los datos ya existentes
+    cursor.execute("DELETE FROM symbol_rollup")
+    cursor.execute('''
+        INSERT INTO symbol_rollup (symbol, trade_count, total_profit, best_trade, worst_trade, updated_at)
+        SELECT symbol, COUNT(*), SUM(profit), MAX(profit), MIN(profit), CURRENT_TIMESTAMP
+        FROM trades_history
+        WHERE symbol IS NOT NULL
+        GROUP BY symbol
+    ''')
+    cursor.execute("DELETE FROM global_rollup")
+    cursor.execute('''
+        INSERT INTO global_rollup (
+            id, total_analysis, total_trades, total_profit,
+            best_strategy_name, best_strategy_profit, updated_at
+        )
+        SELECT 1,
+            (SELECT COUNT(*) FROM strategy_analysis),
+            (SELECT COUNT(*) FROM trades_history),
+            (SELECT SUM(net_profit) FROM strategy_analysis),
+            best.strategy_name, best.net_profit, CURRENT_TIMESTAMP
+        FROM (SELECT 1) LEFT JOIN (
+            SELECT strategy_name, net_profit FROM strategy_analysis
+            ORDER BY net_profit DESC LIMIT 1
+        ) AS best
+    ''')
+
+
+def _migration_retention(cursor):
+    cursor.execute("PRAGMA table_info(strategy_analysis)")
+    if "downsampled" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE strategy_analysis ADD COLUMN downsampled INTEGER DEFAULT 0")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS strategy_analysis_daily (
+            day TEXT NOT NULL,
+            strategy_name TEXT NOT NULL,
+            analysis_count INTEGER NOT NULL DEFAULT 0,
+            total_trades_max INTEGER,
+            net_profit_sum REAL,
+            net_profit_min REAL,
+            net_profit_max REAL,
+            win_rate_sum REAL,
+            first_timestamp DATETIME,
+            last_timestamp DATETIME,
+            PRIMARY KEY (strategy_name, day)
+        ) WITHOUT ROWID
+    ''')
+    # Una posición por (ticket, snapshot): eliminar duplicados antes del índice único
+    cursor.execute('''
+        DELETE FROM trades_history
+        WHERE ticket IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM trades_history
+            WHERE ticket IS NOT NULL
+            GROUP BY analysis_id, ticket
+        )
+    ''')
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_history_analysis_ticket "
+        "ON trades_history (analysis_id, ticket)"
+    )
+    cursor.execute("DROP INDEX IF EXISTS idx_trades_history_analysis")
+
+
+def _migration_ai_cache(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL,
+            hit_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_accessed ON ai_cache (last_accessed)")
+
+
+def _migration_deal_metrics_closing_entries(cursor):
+    # Los acumuladores diarios de deal_store contaban solo entry = 1: vaciarlos
+    # hace que la siguiente sincronización de cada cuenta los recalcule enteros
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mt5_deal_metrics'")
+    if cursor.fetchone() is not None:
+        cursor.execute("DELETE FROM mt5_deal_metrics")
+
+
+MIGRATIONS = [
+    (1, "strategy_analysis.raw_format", _migration_raw_format),
+    (2, "índices de historial, evolución, alertas, símbolos y optimizaciones", [
+        "CREATE INDEX IF NOT EXISTS idx_strategy_analysis_timestamp ON strategy_analysis (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_strategy_analysis_strategy_ts ON strategy_analysis (strategy_name, timestamp)",
+        # Índice cubriente: la agregación por símbolo no toca la tabla
+        "CREATE INDEX IF NOT EXISTS idx_trades_history_symbol_profit ON trades_history (symbol, profit)",
+        "CREATE INDEX IF NOT EXISTS idx_trades_history_analysis ON trades_history (analysis_id)",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_optimizations_strategy_ts ON ai_optimizations (strategy_name, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_optimizations_timestamp ON ai_optimizations (timestamp)"
+    ]),
+    (3, "rollups por símbolo y globales para /symbol y /statistics", _migration_rollups),
+    (4, "retención: resúmenes diarios y posiciones únicas por snapshot", _migration_retention),
+    (5, "caché de respuestas de OpenAI (ai_cache)", _migration_ai_cache),
+    (6, "acumuladores de deals: cierres INOUT y OUT_BY", _migration_deal_metrics_closing_entries),
+]
+
+# Planes esperados para las consultas críticas: índice que deben usar.
+# Ninguna puede recorrer la tabla completa ni ordenar con un B-tree temporal.
+QUERY_PLAN_EXPECTATIONS = [
+    ("get_analysis_history", SELECT_HISTORY_SQL, (50,), "idx_strategy_analysis_timestamp"),
+    ("get_strategy_evolution", SELECT_EVOLUTION_SQL, ("Grid/Scalping",), "idx_strategy_analysis_strategy_ts"),
+    ("get_symbol_performance", SELECT_SYMBOL_ROLLUP_SQL, ("EURUSD",), "PRIMARY KEY"),
+    ("get_statistics_summary", SELECT_GLOBAL_ROLLUP_SQL, (), "INTEGER PRIMARY KEY"),
+    ("rebuild_rollups (símbolo)", SELECT_SYMBOL_PERFORMANCE_SQL, ("EURUSD",), "idx_trades_history_symbol_profit"),
+    ("get_latest_alerts", SELECT_ALERTS_SQL, (10,), "idx_alerts_timestamp"),
+    ("get_daily_summaries", SELECT_DAILY_SQL, ("Grid/Scalping", 30), "PRIMARY KEY"),
+    ("retención (posiciones por snapshot)", SELECT_TRADES_BY_ANALYSIS_SQL, (1,), "idx_trades_history_analysis_ticket"),
+]
+
+
+def _json_default(value):
+    """Serializa los tipos de pandas/numpy presentes en los resultados de análisis"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "item") and hasattr(value, "dtype"):
+        # Escalares numpy
+        return value.item()
+    if hasattr(value, "to_dict") and hasattr(value, "columns"):
+        # Los DataFrames no se persisten en raw_data
+        return None
+    return str(value)
+
+
+def _sql_datetime(value):
+    """Fechas en el mismo formato que CURRENT_TIMESTAMP de SQLite"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(" ")
+    return value
+
+
+def _unique_trades(trades: List[Dict]) -> List[Dict]:
+    """Descarta tickets repetidos dentro de un mismo snapshot (conserva el primero)"""
+    seen = set()
+    unique = []
+    for trade in trades:
+        ticket = trade.get("ticket")
+        if ticket is not None:
+            if ticket in seen:
+                continue
+            seen.add(ticket)
+        unique.append(trade)
+    return unique
+
+
+def encode_raw_data(data: Dict, raw_format: str = RAW_FORMAT_JSON):
+    """Serializa el análisis completo y lo comprime según raw_format"""
+    payload = json.dumps(data, default=_json_default)
+    if raw_format == RAW_FORMAT_ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(payload.encode("utf-8")), RAW_FORMAT_ZSTD
+    if raw_format in (RAW_FORMAT_ZLIB, RAW_FORMAT_ZSTD):
+        return zlib.compress(payload.encode("utf-8"), 6), RAW_FORMAT_ZLIB
+    return payload, RAW_FORMAT_JSON
+
+
+def decode_raw_data(raw_data, raw_format: Optional[str]) -> Optional[str]:
+    """Devuelve raw_data como texto JSON independientemente de su formato"""
+    if raw_data is None:
+        return None
+    if raw_format == RAW_FORMAT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("raw_data comprimido con zstd: instala 'zstandard'")
+        return zstandard.ZstdDecompressor().decompress(raw_data).decode("utf-8")
+    if raw_format == RAW_FORMAT_ZLIB:
+        return zlib.decompress(raw_data).decode("utf-8")
+    return raw_data
+
+
+# Pragmas aplicados a cada conexión del pool
+CONNECTION_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",   # en bases nuevas; las existentes migran en retention.py
+    "journal_mode": "WAL",          # lectores concurrentes con un escritor
+    "synchronous": "NORMAL",        # seguro con WAL, sin fsync por commit
+    "cache_size": -32000,           # ~32 MB de caché de páginas
+    "mmap_size": 268435456,         # 256 MB de lectura por mmap
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000            # ms de espera ante bloqueos de escritura
+}
+
+
+class SQLiteConnectionPool:
+    """
+    Pool de conexiones SQLite con una conexión por hilo. FastAPI ejecuta los
+    endpoints síncronos en un threadpool, así que cada hilo reutiliza su propia
+    conexión en lugar de abrir y cerrar una por llamada.
+    """
+    def __init__(self, db_path: str, pragmas: Dict = None):
+        self.db_path = db_path
+        self.pragmas = CONNECTION_PRAGMAS if pragmas is None else pragmas
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+    
+    def get(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea en el primer uso)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Commit al salir del bloque, rollback si hay una excepción"""
+        conn = self.get()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def close_all(self):
+        """Cierra todas las conexiones abiertas por el pool"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> SQLiteConnectionPool:
+    """Pool compartido por todos los componentes que usan el mismo archivo"""
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = SQLiteConnectionPool(db_path)
+        return _pools[db_path]
+
+
 class StrategyDatabase:
-    def __init__(self, db_path: str = "strategy_data.db"):
+    def __init__(self, db_path: str = "strategy_data.db", raw_format: str = None, lazy: bool = False):
+        """
+        Args:
+            lazy: si es True, las tablas y migraciones se comprueban en el primer
+                  acceso a `pool` (o al llamar a ensure_schema) en lugar de aquí
+        """
         self.db_path = db_path
-        self.init_database()
+        self._pool = get_connection_pool(db_path)
+        self.raw_format = raw_format or os.getenv("DB_RAW_COMPRESSION", RAW_FORMAT_ZLIB)
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        if not lazy:
+            self.ensure_schema()
+    
+    @property
+    def pool(self) -> SQLiteConnectionPool:
+        if not self._schema_ready:
+            self.ensure_schema()
+        return self._pool
+    
+    @property
+    def schema_ready(self) -> bool:
+        return self._schema_ready
+    
+    def ensure_schema(self):
+        """Crea tablas y aplica migraciones una sola vez (seguro entre hilos)"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self.init_database()
+                self._schema_ready = True
     
     def init_database(self):
         """Inicializa las tablas de la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Tabla de análisis de estrategias
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS strategy_analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                strategy_name TEXT NOT NULL,
-                strategy_description TEXT,
-                timeframe TEXT,
-                indicators TEXT,
-                total_trades INTEGER,
-                net_profit REAL,
-                avg_profit REAL,
-                win_rate REAL,
-                profit_factor REAL,
-                max_drawdown REAL,
-                sharpe_ratio REAL,
-                account_balance REAL,
-                account_equity REAL,
-                explanation TEXT,
-                raw_data TEXT
-            )
-        ''')
-        
-        # Tabla de trades individuales
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_id INTEGER,
-                ticket INTEGER,
-                symbol TEXT,
-                trade_type TEXT,
-                volume REAL,
-                price_open REAL,
-                price_close REAL,
-                profit REAL,
-                commission REAL,
-                swap REAL,
-                open_time DATETIME,
-                close_time DATETIME,
-                duration_minutes INTEGER,
-                FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
-            )
-        ''')
-        
-        # Tabla de métricas por símbolo
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS symbol_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_id INTEGER,
-                symbol TEXT,
-                total_trades INTEGER,
-                win_rate REAL,
-                total_profit REAL,
-                avg_profit REAL,
-                best_trade REAL,
-                worst_trade REAL,
-                FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
-            )
-        ''')
-        
-        # Tabla de configuraciones de estrategia (para backup)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS strategy_configs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                strategy_name TEXT UNIQUE,
-                mql4_code TEXT,
-                mql5_code TEXT,
-                python_code TEXT,
-                parameters TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de alertas y eventos importantes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                alert_type TEXT,
-                severity TEXT,
-                message TEXT,
-                data TEXT
-            )
-        ''')
-        
-        # Tabla de optimizaciones generadas por IA
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ai_optimizations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                strategy_name TEXT,
-                optimized_parameters TEXT,
-                expected_improvement TEXT,
-                reasoning TEXT,
-                risk_assessment TEXT,
-                implementation_steps TEXT,
-                warnings TEXT,
-                ai_powered BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        # Tabla de análisis de sesiones
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS session_analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_id INTEGER,
-                session_name TEXT,
-                total_profit REAL,
-                avg_profit REAL,
-                trade_count INTEGER,
-                FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
-            )
-        ''')
+        with self._pool.transaction() as conn:
+            cursor = conn.cursor()
         
-        conn.commit()
-        conn.close()
+            # Tabla de análisis de estrategias
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS strategy_analysis (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    strategy_name TEXT NOT NULL,
+                    strategy_description TEXT,
+                    timeframe TEXT,
+                    indicators TEXT,
+                    total_trades INTEGER,
+                    net_profit REAL,
+                    avg_profit REAL,
+                    win_rate REAL,
+                    profit_factor REAL,
+                    max_drawdown REAL,
+                    sharpe_ratio REAL,
+                    account_balance REAL,
+                    account_equity REAL,
+                    explanation TEXT,
+                    raw_data TEXT
+                )
+            ''')
+        
+            # Tabla de trades individuales
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS trades_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    analysis_id INTEGER,
+                    ticket INTEGER,
+                    symbol TEXT,
+                    trade_type TEXT,
+                    volume REAL,
+                    price_open REAL,
+                    price_close REAL,
+                    profit REAL,
+                    commission REAL,
+                    swap REAL,
+                    open_time DATETIME,
+                    close_time DATETIME,
+                    duration_minutes INTEGER,
+                    FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
+                )
+            ''')
+        
+            # Tabla de métricas por símbolo
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS symbol_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    analysis_id INTEGER,
+                    symbol TEXT,
+                    total_trades INTEGER,
+                    win_rate REAL,
+                    total_profit REAL,
+                    avg_profit REAL,
+                    best_trade REAL,
+                    worst_trade REAL,
+                    FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
+                )
+            ''')
+        
+            # Tabla de configuraciones de estrategia (para backup)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS strategy_configs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    strategy_name TEXT UNIQUE,
+                    mql4_code TEXT,
+                    mql5_code TEXT,
+                    python_code TEXT,
+                    parameters TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+            # Tabla de alertas y eventos importantes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    alert_type TEXT,
+                    severity TEXT,
+                    message TEXT,
+                    data TEXT
+                )
+            ''')
+        
+            # Tabla de optimizaciones generadas por IA
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ai_optimizations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    strategy_name TEXT,
+                    optimized_parameters TEXT,
+                    expected_improvement TEXT,
+                    reasoning TEXT,
+                    risk_assessment TEXT,
+                    implementation_steps TEXT,
+                    warnings TEXT,
+                    ai_powered BOOLEAN DEFAULT 1
+                )
+            ''')
+        
+            # Tabla de análisis de sesiones
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS session_analysis (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    analysis_id INTEGER,
+                    session_name TEXT,
+                    total_profit REAL,
+                    avg_profit REAL,
+                    trade_count INTEGER,
+                    FOREIGN KEY (analysis_id) REFERENCES strategy_analysis (id)
+                )
+            ''')
+        
+        self.apply_migrations()
         print(f"✅ Base de datos inicializada: {self.db_path}")
     
+    def apply_migrations(self) -> List[int]:
+        """Aplica en orden las migraciones pendientes y devuelve sus versiones"""
+        applied = []
+        with self._pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            
+            for version, description, migration in MIGRATIONS:
+                if version in done:
+                    continue
+                if callable(migration):
+                    migration(cursor)
+                else:
+                    for statement in migration:
+                        cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+                applied.append(version)
+        
+        if applied:
+            print(f"✅ Migraciones aplicadas: {applied}")
+        return applied
+    
+    def get_schema_version(self) -> int:
+        """Versión de esquema actual (última migración aplicada)"""
+        cursor = self.pool.get().cursor()
+        cursor.execute("SELECT MAX(version) FROM schema_migrations")
+        return cursor.fetchone()[0] or 0
+    
+    def check_query_plans(self) -> List[Dict]:
+        """
+        Ejecuta EXPLAIN QUERY PLAN sobre las consultas críticas y verifica que
+        usan su índice (sin SCAN de tabla completa ni B-tree temporal)
+        """
+        cursor = self.pool.get().cursor()
+        results = []
+        for name, sql, params, expected_index in QUERY_PLAN_EXPECTATIONS:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[3] for row in cursor.fetchall()]
+            plan_text = " | ".join(plan)
+            full_scan = any(
+                step.startswith("SCAN") and "INDEX" not in step for step in plan
+            )
+            ok = expected_index in plan_text and not full_scan and "TEMP B-TREE" not in plan_text
+            results.append({
+                "query": name,
+                "expected_index": expected_index,
+                "plan": plan_text,
+                "ok": ok
+            })
+        return results
+    
     def save_analysis(self, analysis_data: Dict) -> int:
         """Guarda un análisis completo de estrategia"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        summary = analysis_data.get("summary", {})
-        
-        cursor.execute('''
-            INSERT INTO strategy_analysis (
-                strategy_name, strategy_description, timeframe, indicators,
-                total_trades, net_profit, avg_profit, win_rate,
-                profit_factor, max_drawdown, sharpe_ratio,
-                explanation, raw_data
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            summary.get("strategy"),
-            summary.get("strategy_description"),
-            summary.get("timeframe"),
-            json.dumps(summary.get("indicators", [])),
-            summary.get("total_trades", 0),
-            summary.get("net_profit", 0.0),
-            summary.get("avg_profit", 0.0),
-            summary.get("win_rate", 0.0),
-            summary.get("profit_factor", 0.0),
-            summary.get("max_drawdown", 0.0),
-            summary.get("sharpe_ratio", 0.0),
-            summary.get("explanation"),
-            json.dumps(analysis_data)
+        return self.save_analyses([analysis_data])[0]
+    
+    def save_analyses(self, analyses: List[Dict]) -> List[int]:
+        """
+        Guarda varios análisis (y sus posiciones) en una sola transacción.
+        Las posiciones se insertan con executemany sobre una sentencia preparada.
+        """
+        analysis_ids = []
+        
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            for analysis_data in analyses:
+                summary = analysis_data.get("summary", {})
+                raw_data, raw_format = encode_raw_data(analysis_data, self.raw_format)
+                
+                cursor.execute(INSERT_ANALYSIS_SQL, (
+                    summary.get("strategy"),
+                    summary.get("strategy_description"),
+                    summary.get("timeframe"),
+                    json.dumps(summary.get("indicators", [])),
+                    summary.get("total_trades", 0),
+                    summary.get("net_profit", 0.0),
+                    summary.get("avg_profit", 0.0),
+                    summary.get("win_rate", 0.0),
+                    summary.get("profit_factor", 0.0),
+                    summary.get("max_drawdown", 0.0),
+                    summary.get("sharpe_ratio", 0.0),
+                    summary.get("explanation"),
+                    raw_data,
+                    raw_format
+                ))
+                
+                analysis_id = cursor.lastrowid
+                analysis_ids.append(analysis_id)
+                
+                # Guardar trades individuales (una fila por ticket en cada snapshot)
+                trades = _unique_trades(analysis_data.get("trades", []))
+                cursor.executemany(INSERT_TRADE_SQL, [
+                    (
+                        analysis_id,
+                        trade.get("ticket"),
+                        trade.get("symbol"),
+                        trade.get("type"),
+                        trade.get("volume"),
+                        trade.get("price_open"),
+                        trade.get("profit"),
+                        _sql_datetime(trade.get("time"))
+                    )
+                    for trade in trades
+                ])
+                
+                self._update_rollups(cursor, summary, trades)
+        
+        return analysis_ids
+    
+    def _update_rollups(self, cursor, summary: Dict, trades: List[Dict]):
+        """Suma el análisis recién insertado a los rollups (misma transacción)"""
+        net_profit = summary.get("net_profit", 0.0)
+        strategy_name = summary.get("strategy")
+        cursor.execute(UPDATE_GLOBAL_ROLLUP_SQL, (
+            len(trades), net_profit,
+            net_profit, net_profit, strategy_name,
+            net_profit, net_profit, net_profit
         ))
         
-        analysis_id = cursor.lastrowid
-        
-        # Guardar trades individuales
-        trades = analysis_data.get("trades", [])
+        # Agregar el lote por símbolo antes de tocar la tabla
+        per_symbol = {}
         for trade in trades:
-            cursor.execute('''
-                INSERT INTO trades_history (
-                    analysis_id, ticket, symbol, trade_type, volume,
-                    price_open, profit, open_time
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                analysis_id,
-                trade.get("ticket"),
-                trade.get("symbol"),
-                trade.get("type"),
-                trade.get("volume"),
-                trade.get("price_open"),
-                trade.get("profit"),
-                trade.get("time")
-            ))
-        
-        conn.commit()
-        conn.close()
-        return analysis_id
+            symbol = trade.get("symbol")
+            if symbol is None:
+                continue
+            profit = trade.get("profit")
+            count, total, best, worst = per_symbol.get(symbol, (0, None, None, None))
+            if profit is not None:
+                profit = float(profit)
+                total = profit if total is None else total + profit
+                best = profit if best is None else max(best, profit)
+                worst = profit if worst is None else min(worst, profit)
+            per_symbol[symbol] = (count + 1, total, best, worst)
+        
+        cursor.executemany(UPSERT_SYMBOL_ROLLUP_SQL, [
+            (symbol,) + values for symbol, values in per_symbol.items()
+        ])
+    
+    def rebuild_rollups(self):
+        """Recalcula los rollups desde las tablas base (mantenimiento)"""
+        with self.pool.transaction() as conn:
+            _migration_rollups(conn.cursor())
     
     def save_strategy_code(self, strategy_name: str, codes: Dict):
         """Guarda el código generado de una estrategia"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO strategy_configs (
-                strategy_name, mql4_code, mql5_code, python_code, parameters, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            strategy_name,
-            codes.get("mql4", ""),
-            codes.get("mql5", ""),
-            codes.get("python", ""),
-            codes.get("parameters", "{}"),
-            datetime.now().isoformat()
-        ))
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute('''
+                INSERT OR REPLACE INTO strategy_configs (
+                    strategy_name, mql4_code, mql5_code, python_code, parameters, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                strategy_name,
+                codes.get("mql4", ""),
+                codes.get("mql5", ""),
+                codes.get("python", ""),
+                codes.get("parameters", "{}"),
+                datetime.now().isoformat()
+            ))
         
-        conn.commit()
-        conn.close()
     
     def get_analysis_history(self, limit: int = 50) -> List[Dict]:
         """Obtiene el historial de análisis"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.pool.get().cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute('''
-            SELECT * FROM strategy_analysis 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
+        cursor.execute(SELECT_HISTORY_SQL, (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
-        return [dict(row) for row in rows]
+        return [self._analysis_row(row) for row in rows]
     
     def get_strategy_evolution(self, strategy_name: str) -> List[Dict]:
         """Obtiene la evolución de una estrategia específica"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.pool.get().cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute('''
-            SELECT * FROM strategy_analysis 
-            WHERE strategy_name = ?
-            ORDER BY timestamp ASC
-        ''', (strategy_name,))
+        cursor.execute(SELECT_EVOLUTION_SQL, (strategy_name,))
         
         rows = cursor.fetchall()
-        conn.close()
         
-        return [dict(row) for row in rows]
+        return [self._analysis_row(row) for row in rows]
+    
+    def get_daily_summaries(self, strategy_name: str, limit: int = 30) -> List[Dict]:
+        """Resúmenes diarios de los snapshots antiguos ya compactados"""
+        cursor = self.pool.get().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        cursor.execute(SELECT_DAILY_SQL, (strategy_name, limit))
+        
+        summaries = []
+        for row in cursor.fetchall():
+            summary = dict(row)
+            count = summary["analysis_count"] or 0
+            summary["avg_net_profit"] = summary["net_profit_sum"] / count if count else 0
+            summary["avg_win_rate"] = summary["win_rate_sum"] / count if count else 0
+            summaries.append(summary)
+        return summaries
+    
+    def _analysis_row(self, row: sqlite3.Row) -> Dict:
+        """Fila de strategy_analysis con raw_data descomprimido a texto JSON"""
+        data = dict(row)
+        data["raw_data"] = decode_raw_data(data.get("raw_data"), data.pop("raw_format", None))
+        return data
     
     def get_symbol_performance(self, symbol: str) -> Dict:
         """Obtiene el rendimiento histórico de un símbolo"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_trades,
-                SUM(profit) as total_profit,
-                AVG(profit) as avg_profit,
-                MAX(profit) as best_trade,
-                MIN(profit) as worst_trade
-            FROM trades_history
-            WHERE symbol = ?
-        ''', (symbol,))
+        cursor = self.pool.get().cursor()
+        
+        # Lectura O(1) del rollup mantenido por save_analysis
+        cursor.execute(SELECT_SYMBOL_ROLLUP_SQL, (symbol,))
         
         result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return {
-                "symbol": symbol,
-                "total_trades": result[0],
-                "total_profit": result[1] or 0,
-                "avg_profit": result[2] or 0,
-                "best_trade": result[3] or 0,
-                "worst_trade": result[4] or 0
-            }
-        return {}
+        
+        if result is None:
+            result = (0, None, None, None)
+        
+        trade_count, total_profit, best_trade, worst_trade = result
+        return {
+            "symbol": symbol,
+            "total_trades": trade_count,
+            "total_profit": total_profit or 0,
+            "avg_profit": (total_profit / trade_count) if trade_count and total_profit is not None else 0,
+            "best_trade": best_trade or 0,
+            "worst_trade": worst_trade or 0
+        }
     
     def create_alert(self, alert_type: str, severity: str, message: str, data: Dict = None):
         """Crea una alerta en el sistema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO alerts (alert_type, severity, message, data)
-            VALUES (?, ?, ?, ?)
-        ''', (alert_type, severity, message, json.dumps(data) if data else None))
+            cursor.execute('''
+                INSERT INTO alerts (alert_type, severity, message, data)
+                VALUES (?, ?, ?, ?)
+            ''', (alert_type, severity, message, json.dumps(data) if data else None))
+
+    def create_alerts(self, alerts: List[Dict]):
+        """Crea varias alertas en una sola transacción"""
+        if not alerts:
+            return
+
+        with self.pool.transaction() as conn:
+            conn.executemany('''
+                INSERT INTO alerts (alert_type, severity, message, data)
+                VALUES (?, ?, ?, ?)
+            ''', [
+                (
+                    alert["alert_type"],
+                    alert["severity"],
+                    alert["message"],
+                    json.dumps(alert["data"]) if alert.get("data") else None
+                )
+                for alert in alerts
+            ])
         
-        conn.commit()
-        conn.close()
     
     def get_latest_alerts(self, limit: int = 10) -> List[Dict]:
         """Obtiene las últimas alertas"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.pool.get().cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute('''
-            SELECT * FROM alerts 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
+        cursor.execute(SELECT_ALERTS_SQL, (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
     
-    def backup_database(self, backup_path: str = None):
-        """Crea un backup de la base de datos"""
+    def backup_database(self, backup_path: str = None, pages: int = None,
+                        progress: Callable[[int, int, int], None] = None):
+        """
+        Crea un backup consistente con el protocolo de backup online de SQLite.
+        Copia `pages` páginas por paso liberando el bloqueo entre pasos, de modo
+        que los escritores no quedan bloqueados durante toda la copia.
+        
+        Args:
+            backup_path: archivo destino (por defecto backups/strategy_backup_<fecha>.db)
+            pages: páginas por paso (DB_BACKUP_PAGES_PER_STEP, por defecto 256)
+            progress: callback(status, remaining, pagecount) tras cada paso
+        """
         if backup_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = f"backups/strategy_backup_{timestamp}.db"
-        
-        os.makedirs(os.path.dirname(backup_path), exist_ok=True)
-        
-        # Copiar base de datos
-        import shutil
-        shutil.copy2(self.db_path, backup_path)
+        if pages is None:
+            pages = int(os.getenv("DB_BACKUP_PAGES_PER_STEP", "256"))
+        
+        backup_dir = os.path.dirname(backup_path)
+        if backup_dir:
+            os.makedirs(backup_dir, exist_ok=True)
+        
+        # Conexión propia: la lectura del backup no comparte transacción con el pool
+        source = sqlite3.connect(self.db_path, check_same_thread=False)
+        target = sqlite3.connect(backup_path)
+        try:
+            source.execute(f"PRAGMA busy_timeout={CONNECTION_PRAGMAS['busy_timeout']}")
+            source.backup(target, pages=pages, progress=progress, sleep=0.005)
+        finally:
+            target.close()
+            source.close()
         
         print(f"✅ Backup creado: {backup_path}")
         return backup_path
     
     def get_statistics_summary(self) -> Dict:
         """Obtiene estadísticas generales del sistema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total de análisis
-        cursor.execute("SELECT COUNT(*) FROM strategy_analysis")
-        total_analysis = cursor.fetchone()[0]
-        
-        # Total de trades
-        cursor.execute("SELECT COUNT(*) FROM trades_history")
-        total_trades = cursor.fetchone()[0]
-        
-        # Profit total
-        cursor.execute("SELECT SUM(net_profit) FROM strategy_analysis")
-        total_profit = cursor.fetchone()[0] or 0
+        cursor = self.pool.get().cursor()
         
-        # Mejor estrategia
-        cursor.execute('''
-            SELECT strategy_name, net_profit 
-            FROM strategy_analysis 
-            ORDER BY net_profit DESC 
-            LIMIT 1
-        ''')
-        best_strategy = cursor.fetchone()
-        
-        conn.close()
+        # Contadores globales mantenidos por save_analysis (sin recorrer tablas)
+        cursor.execute(SELECT_GLOBAL_ROLLUP_SQL)
+        rollup = cursor.fetchone() or (0, 0, None, None, None)
+        total_analysis, total_trades, total_profit, best_name, best_profit = rollup
         
         return {
             "total_analysis": total_analysis,
             "total_trades": total_trades,
-            "total_profit": total_profit,
+            "total_profit": total_profit or 0,
             "best_strategy": {
-                "name": best_strategy[0] if best_strategy else "N/A",
-                "profit": best_strategy[1] if best_strategy else 0
+                "name": best_name if best_name is not None else "N/A",
+                "profit": best_profit if best_profit is not None else 0
             }
         }
     
     def save_optimization(self, strategy_name: str, optimization: Dict):
         """Guarda una optimización generada por IA"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO ai_optimizations (
-                strategy_name, optimized_parameters, expected_improvement,
-                reasoning, risk_assessment, implementation_steps, warnings, ai_powered
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            strategy_name,
-            json.dumps(optimization.get("optimized_parameters", {})),
-            optimization.get("expected_improvement", ""),
-            optimization.get("reasoning", ""),
-            optimization.get("risk_assessment", ""),
-            json.dumps(optimization.get("implementation_steps", [])),
-            json.dumps(optimization.get("warnings", [])),
-            optimization.get("ai_powered", False)
-        ))
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute('''
+                INSERT INTO ai_optimizations (
+                    strategy_name, optimized_parameters, expected_improvement,
+                    reasoning, risk_assessment, implementation_steps, warnings, ai_powered
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                strategy_name,
+                json.dumps(optimization.get("optimized_parameters", {})),
+                optimization.get("expected_improvement", ""),
+                optimization.get("reasoning", ""),
+                optimization.get("risk_assessment", ""),
+                json.dumps(optimization.get("implementation_steps", [])),
+                json.dumps(optimization.get("warnings", [])),
+                optimization.get("ai_powered", False)
+            ))
         
-        conn.commit()
-        conn.close()
     
     def get_optimizations_history(self, strategy_name: str = None, limit: int = 10) -> List[Dict]:
         """Obtiene historial de optimizaciones"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.pool.get().cursor()
+        cursor.row_factory = sqlite3.Row
         
         if strategy_name:
             cursor.execute('''
@@ -401,9 +930,9 @@ class StrategyDatabase:
             ''', (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
 
-# Instancia global
-db = StrategyDatabase()
+# Instancia global: el esquema se comprueba en el primer uso (o en el
+# calentamiento en segundo plano de la API), no al importar el módulo
+db = StrategyDatabase(lazy=True)
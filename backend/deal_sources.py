@@ -0,0 +1,586 @@
+"""
+Deal Sources - Fuentes de datos intercambiables para el análisis
+Cada fuente expone el subconjunto de la API de MetaTrader5 que usa el backend
+(account_info, positions_get, history_deals_get, copy_rates_range,
+initialize/shutdown...), así que puede pasarse donde hoy se pasa el módulo
+`mt5` (mt5_session, deal_store, strategy_engine) sin cambiar el análisis:
+
+- MT5DealSource: terminal MetaTrader 5 real (solo Windows)
+- FileDealSource: replay de un export de deals en CSV o Parquet
+- SyntheticDealSource: historial y barras OHLC generados (reproducibles con `seed`)
+
+Las fuentes locales además devuelven el DataFrame de deals directamente
+(get_deals), sin pasar por el historial SQLite de deal_store.
+
+La fuente de la sesión compartida se elige con DEAL_SOURCE:
+    mt5 (por defecto) | file:<ruta.csv|ruta.parquet> | synthetic[:<n_deals>]
+
+Uso (desde backend/):
+    python deal_sources.py export <deals.csv|deals.parquet> [days_back]
+    python deal_sources.py analyze <deals.csv|deals.parquet|synthetic[:n]> [days_back]
+"""
+
+import importlib
+import os
+import sys
+import zlib
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Campos de TradeDeal tal como los devuelve mt5.history_deals_get()
+DEAL_COLUMNS = [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic",
+    "position_id", "reason", "volume", "price", "commission", "swap",
+    "profit", "fee", "symbol", "comment", "external_id"
+]
+
+# Campos de TradePosition tal como los devuelve mt5.positions_get()
+POSITION_COLUMNS = [
+    "ticket", "time", "time_msc", "time_update", "time_update_msc", "type",
+    "magic", "identifier", "reason", "volume", "price_open", "sl", "tp",
+    "price_current", "swap", "profit", "symbol", "comment", "external_id"
+]
+
+TradeDeal = namedtuple("TradeDeal", DEAL_COLUMNS)
+TradePosition = namedtuple("TradePosition", POSITION_COLUMNS)
+AccountInfo = namedtuple("AccountInfo", "login balance equity profit server name currency")
+TerminalInfo = namedtuple("TerminalInfo", "connected name")
+
+# Precio de referencia por símbolo para los datos sintéticos
+SYMBOL_PRICES = {"EURUSD": 1.08, "GBPUSD": 1.27, "USDJPY": 150.0, "XAUUSD": 2300.0, "BTCUSD": 60000.0}
+
+# Especificación por símbolo cuando la fuente no tiene symbol_info (sintética,
+# archivo): tamaño del punto, del contrato, spread típico en puntos y volatilidad anual
+SYMBOL_SPECS = {
+    "EURUSD": {"point": 0.00001, "contract_size": 100_000, "spread": 10, "volatility": 0.07},
+    "GBPUSD": {"point": 0.00001, "contract_size": 100_000, "spread": 12, "volatility": 0.08},
+    "USDJPY": {"point": 0.001, "contract_size": 100_000, "spread": 12, "volatility": 0.09},
+    "XAUUSD": {"point": 0.01, "contract_size": 100, "spread": 25, "volatility": 0.15},
+    "BTCUSD": {"point": 0.01, "contract_size": 1, "spread": 2000, "volatility": 0.6},
+}
+DEFAULT_SYMBOL_SPEC = {"point": 0.00001, "contract_size": 100_000, "spread": 10, "volatility": 0.1}
+
+# Timeframes (valores de las constantes TIMEFRAME_* de MetaTrader5) y sus minutos
+TIMEFRAMES = {"M1": 1, "M5": 5, "M15": 15, "M30": 30, "H1": 16385, "H4": 16388, "D1": 16408}
+TIMEFRAME_MINUTES = {1: 1, 5: 5, 15: 15, 30: 30, 16385: 60, 16388: 240, 16408: 1440}
+
+# Barras tal como las devuelve mt5.copy_rates_range()
+RATE_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8")
+])
+
+
+class DealSource(ABC):
+    """Fuente de deals y posiciones con la interfaz del módulo MetaTrader5"""
+
+    name = "base"
+    # True: los deals se copian al historial local (deal_store) y se
+    # sincronizan de forma incremental; False: se leen directamente
+    persist_deals = False
+
+    def initialize(self, *args, **kwargs) -> bool:
+        return True
+
+    def shutdown(self):
+        pass
+
+    def last_error(self):
+        return (1, "Success")
+
+    def terminal_info(self):
+        return TerminalInfo(connected=True, name=self.name)
+
+    @abstractmethod
+    def account_info(self):
+        """Cuenta de la fuente (login, balance, equity...)"""
+
+    @abstractmethod
+    def positions_get(self, **kwargs):
+        """Posiciones abiertas como tupla de TradePosition"""
+
+    @abstractmethod
+    def deals_frame(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        """Deals en [date_from, date_to] con columnas DEAL_COLUMNS y `time` en segundos"""
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from: datetime, date_to: datetime):
+        """Barras OHLC (array con RATE_DTYPE) o None si la fuente no tiene precios"""
+        return None
+
+    def history_deals_get(self, date_from: datetime, date_to: datetime):
+        frame = self.deals_frame(date_from, date_to)
+        return tuple(TradeDeal._make(row) for row in frame[DEAL_COLUMNS].itertuples(index=False))
+
+    def get_deals(self, days_back: int = 90) -> pd.DataFrame:
+        """Deals de los últimos `days_back` días en el formato de deal_store.get_deals"""
+        deals_df = self.deals_frame(datetime.now() - timedelta(days=days_back), datetime.now())
+        deals_df = deals_df.sort_values(["time", "ticket"], kind="stable").reset_index(drop=True)
+        deals_df["time"] = pd.to_datetime(deals_df["time"], unit="s")
+        return deals_df
+
+    def describe(self) -> Dict:
+        return {"source": self.name}
+
+
+class MT5DealSource(DealSource):
+    """Terminal MetaTrader 5 real; el resto de la API del módulo se delega tal cual"""
+
+    name = "mt5"
+    persist_deals = True
+
+    def __init__(self, module=None):
+        self._module = module
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module("MetaTrader5")
+        return self._module
+
+    def __getattr__(self, attr):
+        # Constantes y funciones no cubiertas por DealSource (order_send, ORDER_TYPE_BUY...)
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.module, attr)
+
+    def initialize(self, *args, **kwargs) -> bool:
+        return self.module.initialize(*args, **kwargs)
+
+    def shutdown(self):
+        self.module.shutdown()
+
+    def last_error(self):
+        return self.module.last_error()
+
+    def terminal_info(self):
+        return self.module.terminal_info()
+
+    def account_info(self):
+        return self.module.account_info()
+
+    def positions_get(self, **kwargs):
+        return self.module.positions_get(**kwargs)
+
+    def history_deals_get(self, date_from: datetime, date_to: datetime):
+        return self.module.history_deals_get(date_from, date_to)
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from: datetime, date_to: datetime):
+        return self.module.copy_rates_range(symbol, timeframe, date_from, date_to)
+
+    def deals_frame(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        deals = self.module.history_deals_get(date_from, date_to)
+        if deals is None:
+            raise RuntimeError(f"Error obteniendo deals de MT5: {self.module.last_error()}")
+        return pd.DataFrame([d._asdict() for d in deals], columns=DEAL_COLUMNS)
+
+
+class _FrameDealSource(DealSource):
+    """Base de las fuentes locales: deals y posiciones ya cargados en DataFrames"""
+
+    def __init__(self, deals: pd.DataFrame, positions: pd.DataFrame = None, login: int = 0,
+                 balance: float = None, server: str = "local"):
+        self._deals = deals.sort_values("time", kind="stable").reset_index(drop=True)
+        self._times = self._deals["time"].to_numpy()
+        self._positions = positions if positions is not None else pd.DataFrame(columns=POSITION_COLUMNS)
+        self.login = login
+        self.server = server
+        # Sin balance explícito: resultado neto de todos los deals (incluye depósitos)
+        self.balance = float(balance) if balance is not None else float(
+            self._deals[["profit", "commission", "swap", "fee"]].to_numpy().sum()
+        )
+
+    def account_info(self):
+        floating = float(self._positions["profit"].sum()) if len(self._positions) else 0.0
+        return AccountInfo(login=self.login, balance=self.balance, equity=self.balance + floating,
+                           profit=floating, server=self.server, name=self.name, currency="USD")
+
+    def positions_get(self, **kwargs):
+        positions = self._positions
+        if kwargs.get("symbol"):
+            positions = positions[positions["symbol"] == kwargs["symbol"]]
+        return tuple(TradePosition._make(row) for row in positions[POSITION_COLUMNS].itertuples(index=False))
+
+    def deals_frame(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        # Deals ordenados por tiempo: la ventana es un corte por búsqueda binaria
+        start = np.searchsorted(self._times, int(date_from.timestamp()), side="left")
+        end = np.searchsorted(self._times, int(date_to.timestamp()), side="right")
+        return self._deals.iloc[start:end].copy()
+
+    def describe(self) -> Dict:
+        return {
+            "source": self.name,
+            "login": self.login,
+            "deals": len(self._deals),
+            "positions": len(self._positions),
+            "from": datetime.fromtimestamp(int(self._times[0])).isoformat() if len(self._times) else None,
+            "to": datetime.fromtimestamp(int(self._times[-1])).isoformat() if len(self._times) else None
+        }
+
+
+def _stable_login(key: str) -> int:
+    """Login sintético estable (negativo para no chocar con cuentas reales)"""
+    return -(zlib.crc32(key.encode("utf-8")) or 1)
+
+
+def normalize_deals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adapta un export de deals a DEAL_COLUMNS: `time` en segundos (acepta epoch
+    en s/ms o fechas), tipos numéricos y columnas opcionales rellenadas
+    """
+    missing = [c for c in ("time", "type", "entry", "profit", "symbol") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias en los deals: {missing}")
+
+    df = df.copy()
+    if pd.api.types.is_numeric_dtype(df["time"]):
+        times = df["time"].astype("int64")
+        # Epoch en milisegundos
+        df["time"] = times // 1000 if len(times) and times.max() > 10**11 else times
+    else:
+        df["time"] = pd.to_datetime(df["time"]).astype("int64") // 10**9
+
+    if "ticket" not in df.columns:
+        df["ticket"] = np.arange(1, len(df) + 1)
+    if "time_msc" not in df.columns:
+        df["time_msc"] = df["time"] * 1000
+    for col in DEAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = "" if col in ("comment", "external_id") else 0
+    df["comment"] = df["comment"].fillna("").astype(str)
+    df["external_id"] = df["external_id"].fillna("").astype(str)
+    df["symbol"] = df["symbol"].fillna("").astype(str)
+    return df[DEAL_COLUMNS]
+
+
+def _read_table(path: str) -> pd.DataFrame:
+    if path.lower().endswith((".parquet", ".pq")):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class FileDealSource(_FrameDealSource):
+    """Replay de un export de deals (CSV o Parquet, columnas de DEAL_COLUMNS)"""
+
+    name = "file"
+
+    def __init__(self, path: str, positions_path: str = None, login: int = None,
+                 balance: float = None, align_to_now: bool = True):
+        """
+        Args:
+            path: export de deals (.csv o .parquet)
+            positions_path: export opcional de posiciones abiertas (POSITION_COLUMNS)
+            login: login de la cuenta; por defecto uno sintético estable por archivo
+            balance: balance de la cuenta; por defecto la suma de resultados de los deals
+            align_to_now: desplaza los tiempos para que el último deal sea "ahora",
+                          ya que las ventanas days_back se cuentan desde ahora
+        """
+        self.path = path
+        deals = normalize_deals(_read_table(path))
+        positions = _read_table(positions_path) if positions_path else None
+
+        if align_to_now and len(deals):
+            shift = int(datetime.now().timestamp()) - int(deals["time"].max())
+            deals["time"] += shift
+            deals["time_msc"] += shift * 1000
+            if positions is not None and len(positions):
+                positions["time"] += shift
+                positions["time_update"] += shift
+
+        super().__init__(deals, positions,
+                         login=login if login is not None else _stable_login(os.path.abspath(path)),
+                         balance=balance, server=os.path.basename(path))
+
+    def describe(self) -> Dict:
+        return {**super().describe(), "path": self.path}
+
+
+# Sesiones (hora GMT, como analyze_trading_sessions) y peso por defecto de cada una
+SESSION_HOURS = {"Asian": (0, 8), "London": (8, 16), "New York": (16, 24)}
+DEFAULT_SESSIONS = {"Asian": 0.2, "London": 0.45, "New York": 0.35}
+BEHAVIORS = ("random", "grid", "martingale", "hedge")
+
+
+def _session_times(rng, n: int, start_ts: int, end_ts: int, sessions: Dict[str, float]) -> np.ndarray:
+    """n instantes ordenados entre start_ts (medianoche) y end_ts, con la hora repartida por sesión"""
+    names = list(sessions)
+    weights = np.array([sessions[s] for s in names], dtype=float)
+    session = rng.choice(len(names), n, p=weights / weights.sum())
+    first = np.array([SESSION_HOURS[s][0] for s in names], dtype=np.int64) * 3600
+    length = np.array([SESSION_HOURS[s][1] - SESSION_HOURS[s][0] for s in names], dtype=np.int64) * 3600
+    days = max(1, (end_ts - start_ts) // 86400)
+    offset = rng.integers(0, days, n) * 86400 + first[session] + (rng.random(n) * length[session]).astype(np.int64)
+    return np.sort(np.minimum(start_ts + offset, end_ts))
+
+
+def generate_deals(n_deals: int = 10_000, symbols: Sequence[str] = ("EURUSD", "GBPUSD", "XAUUSD"),
+                   days: int = 90, seed: int = 42, win_rate: float = 0.55,
+                   end: datetime = None, behavior: str = "random",
+                   sessions: Dict[str, float] = None, grid_levels: int = 5,
+                   grid_step: float = 0.001, martingale_steps: int = 5) -> pd.DataFrame:
+    """
+    Historial sintético de n_deals deals (un deal de entrada y uno de salida
+    por posición) en los últimos `days` días hasta `end`.
+
+    behavior:
+        random: posiciones independientes
+        grid: ciclos de hasta grid_levels posiciones del mismo lado y lote,
+              separadas grid_step (relativo al precio), que cierran a la vez
+        martingale: el lote se duplica tras cada pérdida (hasta
+                    2**martingale_steps) y vuelve al base tras una ganancia
+        hedge: pares BUY/SELL del mismo símbolo y lote abiertos a la vez
+    sessions: peso de cada sesión (Asian, London, New York) en la hora de apertura
+    """
+    if behavior not in BEHAVIORS:
+        raise ValueError(f"behavior debe ser uno de {BEHAVIORS}")
+
+    rng = np.random.default_rng(seed)
+    n = max(1, n_deals // 2)
+    end_ts = int((end or datetime.now()).timestamp())
+    start_ts = (end_ts - days * 86400) // 86400 * 86400
+    sessions = sessions or DEFAULT_SESSIONS
+    symbol_prices = np.array([SYMBOL_PRICES.get(s, 1.0) for s in symbols])
+
+    if behavior == "grid":
+        # Ciclos de 1..grid_levels niveles, recortados al número de posiciones pedido
+        levels = rng.integers(1, grid_levels + 1, int(n / ((grid_levels + 1) / 2) * 1.2) + 2)
+        levels = levels[:np.searchsorted(np.cumsum(levels), n) + 1]
+        cycles = len(levels)
+        cycle = np.repeat(np.arange(cycles), levels)[:n]
+        level = np.arange(n) - np.repeat(np.cumsum(levels) - levels, levels)[:n]
+
+        cycle_open = _session_times(rng, cycles, start_ts, end_ts, sessions)
+        spacing = rng.integers(60, 900, cycles)
+        cycle_close = cycle_open + levels * spacing + 300 + rng.exponential(90 * 60, cycles).astype(np.int64)
+        open_time = cycle_open[cycle] + level * spacing[cycle]
+        close_time = cycle_close[cycle]
+        symbol_idx = rng.integers(0, len(symbols), cycles)[cycle]
+        side = rng.integers(0, 2, cycles)[cycle]
+        volume = rng.choice([0.01, 0.02, 0.05, 0.1], cycles)[cycle]
+        direction = np.where(side == 0, 1, -1)
+        open_price = symbol_prices[symbol_idx] * (1 + rng.normal(0, 0.01, cycles)[cycle]) \
+            * (1 - direction * level * grid_step)
+        # TP común: ganan más los niveles más profundos; en el stop pierden más los primeros
+        unit = rng.exponential(4.0, cycles)[cycle] * volume / 0.01
+        cycle_win = (rng.random(cycles) < win_rate)[cycle]
+        profit = np.where(cycle_win, unit * (level + 1), -unit * (levels[cycle] - level) * 1.2)
+
+    elif behavior == "hedge":
+        pairs = (n + 1) // 2
+        pair_open = _session_times(rng, pairs, start_ts, end_ts, sessions)
+        pair_symbol = rng.integers(0, len(symbols), pairs)
+        pair_volume = rng.choice([0.01, 0.02, 0.05, 0.1], pairs)
+        move = rng.normal(0, 8.0, pairs) * pair_volume / 0.01
+        # Cada par: BUY y SELL; el movimiento favorece a una pata y perjudica a la otra
+        open_time = np.repeat(pair_open, 2)[:n]
+        symbol_idx = np.repeat(pair_symbol, 2)[:n]
+        volume = np.repeat(pair_volume, 2)[:n]
+        side = np.tile([0, 1], pairs)[:n]
+        open_price = symbol_prices[symbol_idx] * (1 + np.repeat(rng.normal(0, 0.01, pairs), 2)[:n])
+        profit = np.where(side == 0, 1, -1) * np.repeat(move, 2)[:n] - rng.exponential(0.5, n) * volume / 0.01
+        close_time = open_time + 60 + rng.exponential(60 * 60, n).astype(np.int64)
+
+    else:
+        open_time = _session_times(rng, n, start_ts, end_ts, sessions)
+        symbol_idx = rng.integers(0, len(symbols), n)
+        side = rng.integers(0, 2, n)
+        wins = rng.random(n) < win_rate
+        if behavior == "martingale":
+            # Pérdidas seguidas justo antes de cada posición (en orden de apertura)
+            index = np.arange(n)
+            last_win = np.maximum.accumulate(np.where(wins, index, -1))
+            losses_before = index - np.concatenate(([-1], last_win[:-1])) - 1
+            volume = 0.01 * 2.0 ** np.minimum(losses_before, martingale_steps)
+        else:
+            volume = rng.choice([0.01, 0.02, 0.05, 0.1], n)
+        open_price = symbol_prices[symbol_idx] * (1 + rng.normal(0, 0.01, n))
+        profit = np.where(wins, rng.exponential(8.0, n), -rng.exponential(9.0, n)) * volume / 0.01
+        close_time = open_time + 60 + rng.exponential(45 * 60, n).astype(np.int64)
+
+    # Posiciones en orden de apertura; ninguna cierra después de `end`
+    order = np.argsort(open_time, kind="stable")
+    open_time, symbol_idx, side, volume, open_price, profit = (
+        open_time[order], symbol_idx[order], side[order], volume[order], open_price[order], profit[order]
+    )
+    close_time = np.clip(close_time[order], open_time, end_ts)
+    symbol = np.asarray(symbols, dtype=object)[symbol_idx]
+
+    # Precio de cierre coherente con el signo del resultado y el lado
+    direction = np.where(side == 0, 1, -1)
+    close_price = open_price * (1 + direction * np.sign(profit) * rng.uniform(0.0002, 0.003, n))
+    commission = -np.round(volume * 3.5, 2)
+    position_id = np.arange(1, n + 1)
+
+    def leg(times, deal_type, entry, price, leg_profit):
+        return pd.DataFrame({
+            "time": times, "type": deal_type, "entry": entry, "position_id": position_id,
+            "volume": volume, "price": np.round(price, 5), "commission": commission,
+            "swap": 0.0, "profit": np.round(leg_profit, 2), "fee": 0.0, "symbol": symbol
+        })
+
+    deals = pd.concat([
+        leg(open_time, side, 0, open_price, np.zeros(n)),
+        leg(close_time, 1 - side, 1, close_price, profit)
+    ], ignore_index=True).sort_values(["time", "entry"], kind="stable").reset_index(drop=True)
+
+    deals["ticket"] = np.arange(1, len(deals) + 1)
+    deals["order"] = deals["ticket"]
+    deals["time_msc"] = deals["time"] * 1000
+    deals["magic"] = 0
+    deals["reason"] = 0
+    deals["comment"] = ""
+    deals["external_id"] = ""
+    return deals[DEAL_COLUMNS]
+
+
+def generate_positions(n_positions: int = 5, symbols: Sequence[str] = ("EURUSD", "GBPUSD", "XAUUSD"),
+                       seed: int = 42, end: datetime = None) -> pd.DataFrame:
+    """Posiciones abiertas sintéticas abiertas en las últimas horas"""
+    rng = np.random.default_rng(seed + 1)
+    end_ts = int((end or datetime.now()).timestamp())
+    times = end_ts - rng.integers(60, 6 * 3600, n_positions)
+    symbol = np.asarray(symbols)[rng.integers(0, len(symbols), n_positions)]
+    price = np.array([SYMBOL_PRICES.get(s, 1.0) for s in symbol]) * (1 + rng.normal(0, 0.002, n_positions))
+    tickets = 10**9 + np.arange(n_positions)
+    return pd.DataFrame({
+        "ticket": tickets, "time": times, "time_msc": times * 1000, "time_update": times,
+        "time_update_msc": times * 1000, "type": rng.integers(0, 2, n_positions), "magic": 0,
+        "identifier": tickets, "reason": 0, "volume": rng.choice([0.01, 0.02, 0.05], n_positions),
+        "price_open": np.round(price, 5), "sl": 0.0, "tp": 0.0, "price_current": np.round(price, 5),
+        "swap": 0.0, "profit": np.round(rng.normal(0, 5, n_positions), 2), "symbol": symbol,
+        "comment": "", "external_id": ""
+    })[POSITION_COLUMNS]
+
+
+def generate_rates(symbol: str, date_from: datetime, date_to: datetime, timeframe: int = 1,
+                   seed: int = 42) -> np.ndarray:
+    """
+    Barras OHLC sintéticas (RATE_DTYPE) de `symbol` entre date_from y date_to,
+    sin fines de semana: paseo aleatorio log-normal con la volatilidad anual
+    de SYMBOL_SPECS. Reproducible para el mismo símbolo, ventana y seed.
+    """
+    spec = SYMBOL_SPECS.get(symbol, DEFAULT_SYMBOL_SPEC)
+    minutes = TIMEFRAME_MINUTES.get(timeframe)
+    if minutes is None:
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+
+    step = minutes * 60
+    start_ts = int(date_from.timestamp()) // step * step
+    times = np.arange(start_ts, int(date_to.timestamp()) + 1, step, dtype=np.int64)
+    # 1970-01-01 fue jueves: día de la semana 0 = lunes
+    times = times[((times // 86400 + 3) % 7) < 5]
+    n = len(times)
+
+    rng = np.random.default_rng([seed, zlib.crc32(symbol.encode("utf-8")), start_ts])
+    sigma = spec["volatility"] * np.sqrt(minutes / (365 * 24 * 60))
+    close = SYMBOL_PRICES.get(symbol, 1.0) * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+    open_ = np.concatenate(([close[0]], close[:-1])) if n else close
+    wick = np.abs(rng.normal(0, sigma / 2, (2, n)))
+
+    rates = np.empty(n, dtype=RATE_DTYPE)
+    decimals = max(0, int(round(-np.log10(spec["point"]))))
+    rates["time"] = times
+    rates["open"] = np.round(open_, decimals)
+    rates["close"] = np.round(close, decimals)
+    rates["high"] = np.round(np.maximum(open_, close) * (1 + wick[0]), decimals)
+    rates["low"] = np.round(np.minimum(open_, close) * (1 - wick[1]), decimals)
+    rates["tick_volume"] = rng.integers(10, 500, n)
+    rates["spread"] = spec["spread"]
+    rates["real_volume"] = 0
+    return rates
+
+
+class SyntheticDealSource(_FrameDealSource):
+    """Historial generado en memoria (reproducible con `seed`)"""
+
+    name = "synthetic"
+
+    def __init__(self, n_deals: int = 10_000, symbols: Sequence[str] = ("EURUSD", "GBPUSD", "XAUUSD"),
+                 days: int = 90, open_positions: int = 5, seed: int = 42, balance: float = 10_000.0,
+                 login: int = None, deals: pd.DataFrame = None, **generator_options):
+        """
+        Args:
+            deals: historial ya generado; si se pasa, se ignoran n_deals/symbols/days
+            generator_options: resto de opciones de generate_deals (behavior, sessions...)
+        """
+        self.seed = seed
+        if deals is None:
+            deals = generate_deals(n_deals, symbols, days, seed, **generator_options)
+        positions = generate_positions(open_positions, symbols, seed) if open_positions else None
+        super().__init__(deals, positions,
+                         login=login if login is not None else _stable_login(f"synthetic:{seed}:{len(deals)}"),
+                         balance=balance, server="synthetic")
+
+    def copy_rates_range(self, symbol: str, timeframe: int, date_from: datetime, date_to: datetime):
+        return generate_rates(symbol, date_from, date_to, timeframe, self.seed)
+
+
+def source_from_env(spec: str = None) -> DealSource:
+    """Fuente según DEAL_SOURCE: mt5 | file:<ruta> | <ruta.csv|.parquet> | synthetic[:<n_deals>]"""
+    spec = (spec or os.getenv("DEAL_SOURCE", "mt5")).strip()
+    kind, _, arg = spec.partition(":")
+    kind = kind.lower()
+
+    if kind == "mt5":
+        return MT5DealSource()
+    if kind == "synthetic":
+        return SyntheticDealSource(n_deals=int(arg) if arg else 10_000)
+    if kind == "file":
+        return FileDealSource(arg)
+    if spec.lower().endswith((".csv", ".parquet", ".pq")):
+        return FileDealSource(spec)
+    raise ValueError(f"DEAL_SOURCE no válido: {spec}")
+
+
+def export_deals(path: str, days_back: int = 365, source: DealSource = None) -> int:
+    """Guarda los deals de `source` (por defecto MT5) en CSV o Parquet para replay"""
+    source = source or MT5DealSource()
+    if not source.initialize():
+        raise RuntimeError(f"No se pudo iniciar MT5: {source.last_error()}")
+    try:
+        deals = source.deals_frame(datetime.now() - timedelta(days=days_back), datetime.now())
+    finally:
+        source.shutdown()
+
+    if path.lower().endswith((".parquet", ".pq")):
+        deals.to_parquet(path, index=False)
+    else:
+        deals.to_csv(path, index=False)
+    return len(deals)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "analyze"):
+        print(__doc__)
+        sys.exit(1)
+
+    command, target = sys.argv[1], sys.argv[2]
+    days_back = int(sys.argv[3]) if len(sys.argv) > 3 else (365 if command == "export" else 90)
+
+    if command == "export":
+        from dotenv import load_dotenv
+        load_dotenv()
+        print(f"✅ {export_deals(target, days_back)} deals exportados a {target}")
+        return
+
+    from strategy_engine import build_analysis_snapshot, public_metrics
+
+    source = source_from_env(target)
+    print(f"📂 Fuente: {source.describe()}")
+    snapshot = build_analysis_snapshot(days_back, source=source)
+    metrics = public_metrics(snapshot["historical_metrics"])
+    print("=" * 60)
+    for key in ("total_trades", "win_rate", "total_profit", "best_trade", "worst_trade",
+                "longest_win_streak", "longest_loss_streak", "max_drawdown"):
+        print(f"{key:<22}{metrics.get(key, 0)}")
+    print(f"{'best_session':<22}{snapshot['session_analysis'].get('best_session')}")
+    print(f"{'best_symbol':<22}{snapshot['symbol_analysis'].get('best_symbol')}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Deal Store - Historial local de deals de MT5
+Persiste los deals en SQLite (clave: login + ticket) y sincroniza de forma
+incremental usando una marca de agua (high-water mark), de modo que las
+peticiones repetidas solo piden a MT5 los deals nuevos.
+Los deals de cierre nuevos alimentan además un acumulador de métricas por día
+(metric_accumulators), así que las métricas de una ventana se obtienen
+combinando particiones diarias sin recorrer todo el historial.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from database import get_connection_pool
+from deal_sources import DEAL_COLUMNS
+from metric_accumulators import TradeStatsAccumulator, merge_all
+from position_lifecycle import ENTRY_INOUT, ENTRY_OUT, ENTRY_OUT_BY
+
+# Solape al re-sincronizar para capturar deals que llegan con retraso
+SYNC_OVERLAP_SECONDS = 60
+
+# Máximo de parámetros por consulta IN (límite de SQLite: 999)
+SQL_IN_CHUNK = 900
+
+# Partición de los acumuladores: días desde epoch (UTC)
+DAY_SECONDS = 86400
+
+# Deals de cierre que alimentan los acumuladores: OUT, INOUT (reversión) y OUT_BY
+CLOSING_ENTRIES = (ENTRY_OUT, ENTRY_INOUT, ENTRY_OUT_BY)
+
+
+class DealStore:
+    def __init__(self, db_path: str = "strategy_data.db"):
+        self.db_path = db_path
+        self.pool = get_connection_pool(db_path)
+        self._lock = threading.Lock()
+        self.init_tables()
+
+    def init_tables(self):
+        """Crea las tablas del historial de deals y del estado de sincronización"""
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mt5_deals (
+                    login INTEGER NOT NULL,
+                    ticket INTEGER NOT NULL,
+                    "order" INTEGER,
+                    time INTEGER,
+                    time_msc INTEGER,
+                    type INTEGER,
+                    entry INTEGER,
+                    magic INTEGER,
+                    position_id INTEGER,
+                    reason INTEGER,
+                    volume REAL,
+                    price REAL,
+                    commission REAL,
+                    swap REAL,
+                    profit REAL,
+                    fee REAL,
+                    symbol TEXT,
+                    comment TEXT,
+                    external_id TEXT,
+                    PRIMARY KEY (login, ticket)
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_mt5_deals_login_time
+                ON mt5_deals (login, time)
+            ''')
+
+            # synced_from / synced_to: rango (en fechas de consulta) ya descargado
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mt5_deals_sync (
+                    login INTEGER PRIMARY KEY,
+                    synced_from TIMESTAMP,
+                    synced_to TIMESTAMP,
+                    last_deal_time INTEGER,
+                    total_deals INTEGER DEFAULT 0,
+                    updated_at TIMESTAMP
+                )
+            ''')
+
+            # Acumulador de métricas de los deals de cierre de cada día
+            # (TradeStatsAccumulator en JSON) y último deal incluido
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mt5_deal_metrics (
+                    login INTEGER NOT NULL,
+                    day INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    last_time INTEGER,
+                    last_ticket INTEGER,
+                    PRIMARY KEY (login, day)
+                ) WITHOUT ROWID
+            ''')
+
+    def _get_sync_state(self, cursor, login: int) -> Optional[Dict]:
+        cursor.execute('''
+            SELECT synced_from, synced_to, last_deal_time, total_deals
+            FROM mt5_deals_sync WHERE login = ?
+        ''', (login,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            "synced_from": datetime.fromisoformat(row[0]) if row[0] else None,
+            "synced_to": datetime.fromisoformat(row[1]) if row[1] else None,
+            "last_deal_time": row[2],
+            "total_deals": row[3] or 0
+        }
+
+    def _insert_deals(self, cursor, login: int, deals) -> list:
+        """Inserta deals ignorando los tickets ya almacenados; devuelve los insertados"""
+        if not deals:
+            return []
+
+        tickets = [d.ticket for d in deals]
+        existing = set()
+        for i in range(0, len(tickets), SQL_IN_CHUNK):
+            chunk = tickets[i:i + SQL_IN_CHUNK]
+            cursor.execute(
+                f"SELECT ticket FROM mt5_deals WHERE login = ? AND ticket IN ({', '.join('?' * len(chunk))})",
+                [login] + chunk
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+
+        new_deals = []
+        rows = []
+        for d in deals:
+            if d.ticket in existing:
+                continue
+            # Un mismo ticket puede repetirse en rangos solapados de la misma sincronización
+            existing.add(d.ticket)
+            deal = d._asdict()
+            new_deals.append(deal)
+            rows.append((login,) + tuple(deal.get(col) for col in DEAL_COLUMNS))
+
+        columns = ", ".join(["login"] + [f'"{c}"' for c in DEAL_COLUMNS])
+        placeholders = ", ".join(["?"] * (len(DEAL_COLUMNS) + 1))
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO mt5_deals ({columns}) VALUES ({placeholders})",
+            rows
+        )
+        return new_deals
+
+    def sync(self, mt5, login: int, from_date: datetime, to_date: datetime = None) -> Dict:
+        """
+        Sincroniza el historial de deals de la cuenta con MT5.
+
+        Solo se consultan los tramos que aún no están en la base:
+        - hacia adelante: desde la marca de agua (synced_to) hasta ahora
+        - hacia atrás: si se pide una ventana más antigua que synced_from
+        """
+        to_date = to_date or datetime.now()
+
+        with self._lock:
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                state = self._get_sync_state(cursor, login)
+
+                ranges = []
+                if state is None or state["synced_from"] is None:
+                    ranges.append((from_date, to_date))
+                    synced_from, synced_to = from_date, to_date
+                else:
+                    synced_from, synced_to = state["synced_from"], state["synced_to"]
+                    if from_date < synced_from:
+                        ranges.append((from_date, synced_from))
+                        synced_from = from_date
+                    if to_date > synced_to:
+                        ranges.append((synced_to - timedelta(seconds=SYNC_OVERLAP_SECONDS), to_date))
+                        synced_to = to_date
+
+                fetched = 0
+                new_deals = []
+                for range_from, range_to in ranges:
+                    deals = mt5.history_deals_get(range_from, range_to)
+                    if deals is None:
+                        # Error de MT5: no avanzar la marca de agua (ni las métricas)
+                        self._update_metrics(cursor, login, new_deals)
+                        return {"fetched": fetched, "inserted": len(new_deals), "error": str(mt5.last_error())}
+                    fetched += len(deals)
+                    new_deals += self._insert_deals(cursor, login, deals)
+
+                self._update_metrics(cursor, login, new_deals)
+                inserted = len(new_deals)
+
+                cursor.execute('''
+                    SELECT MAX(time), COUNT(*) FROM mt5_deals WHERE login = ?
+                ''', (login,))
+                last_deal_time, total_deals = cursor.fetchone()
+
+                cursor.execute('''
+                    INSERT OR REPLACE INTO mt5_deals_sync (
+                        login, synced_from, synced_to, last_deal_time, total_deals, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    login,
+                    synced_from.isoformat(),
+                    synced_to.isoformat(),
+                    last_deal_time,
+                    total_deals,
+                    datetime.now().isoformat()
+                ))
+
+        return {"fetched": fetched, "inserted": inserted, "total_deals": total_deals}
+
+    def _update_metrics(self, cursor, login: int, new_deals: list):
+        """
+        Suma los deals de cierre recién insertados a los acumuladores diarios.
+        Si un deal llega con retraso (anterior al último acumulado de su día)
+        se recalcula solo ese día. Una cuenta con deals y sin acumuladores
+        (historial anterior a esta tabla) se recalcula entera una vez.
+        """
+        cursor.execute("SELECT 1 FROM mt5_deal_metrics WHERE login = ? LIMIT 1", (login,))
+        if cursor.fetchone() is None:
+            self._rebuild_metrics(cursor, login)
+            return
+
+        closing = sorted((d["time"], d["ticket"], d["profit"]) for d in new_deals if d["entry"] in CLOSING_ENTRIES)
+        by_day: Dict[int, list] = {}
+        for deal in closing:
+            by_day.setdefault(deal[0] // DAY_SECONDS, []).append(deal)
+
+        for day, deals in by_day.items():
+            cursor.execute(
+                "SELECT state, last_time, last_ticket FROM mt5_deal_metrics WHERE login = ? AND day = ?",
+                (login, day)
+            )
+            row = cursor.fetchone()
+            if row is not None and (deals[0][0], deals[0][1]) > (row[1], row[2]):
+                acc = TradeStatsAccumulator.from_dict(json.loads(row[0]))
+                acc.update_batch([d[2] for d in deals])
+                self._save_metrics(cursor, login, day, acc, deals[-1][0], deals[-1][1])
+            else:
+                self._rebuild_metrics(cursor, login, day)
+
+    def _rebuild_metrics(self, cursor, login: int, day: int = None):
+        """Recalcula los acumuladores de un día (o de todos) desde mt5_deals"""
+        query = "SELECT time, ticket, profit FROM mt5_deals WHERE login = ? AND entry IN (1, 2, 3)"
+        params = [login]
+        if day is not None:
+            query += " AND time >= ? AND time < ?"
+            params += [day * DAY_SECONDS, (day + 1) * DAY_SECONDS]
+            cursor.execute("DELETE FROM mt5_deal_metrics WHERE login = ? AND day = ?", (login, day))
+        else:
+            cursor.execute("DELETE FROM mt5_deal_metrics WHERE login = ?", (login,))
+        cursor.execute(query + " ORDER BY time, ticket", params)
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        times = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        profits = np.fromiter((r[2] or 0.0 for r in rows), dtype=float, count=len(rows))
+        days = times // DAY_SECONDS
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+            acc = TradeStatsAccumulator.from_profits(profits[start:end])
+            self._save_metrics(cursor, login, int(days[start]), acc, rows[end - 1][0], rows[end - 1][1])
+
+    def _save_metrics(self, cursor, login: int, day: int, acc: TradeStatsAccumulator,
+                      last_time: int, last_ticket: int):
+        cursor.execute('''
+            INSERT OR REPLACE INTO mt5_deal_metrics (login, day, state, last_time, last_ticket)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (login, day, json.dumps(acc.to_dict()), last_time, last_ticket))
+
+    def window_accumulator(self, login: int, from_date: datetime) -> TradeStatsAccumulator:
+        """
+        Acumulador de los deals de cierre desde `from_date`: el día parcial del
+        inicio de la ventana se calcula desde los deals y el resto de días se
+        combina desde los acumuladores diarios (O(días), no O(deals))
+        """
+        from_ts = int(from_date.timestamp())
+        first_day = from_ts // DAY_SECONDS
+        conn = self.pool.get()
+
+        rows = conn.execute('''
+            SELECT profit FROM mt5_deals
+            WHERE login = ? AND entry IN (1, 2, 3) AND time >= ? AND time < ?
+            ORDER BY time, ticket
+        ''', (login, from_ts, (first_day + 1) * DAY_SECONDS)).fetchall()
+        parts = [TradeStatsAccumulator.from_profits([r[0] or 0.0 for r in rows])]
+
+        states = conn.execute(
+            "SELECT state FROM mt5_deal_metrics WHERE login = ? AND day > ? ORDER BY day",
+            (login, first_day)
+        ).fetchall()
+        parts += [TradeStatsAccumulator.from_dict(json.loads(state)) for (state,) in states]
+        return merge_all(parts)
+
+    @staticmethod
+    def _account_login(mt5) -> int:
+        """Login de la cuenta conectada; sin él los deals de varias cuentas acabarían mezclados"""
+        account_info = mt5.account_info()
+        if account_info is None or not getattr(account_info, "login", 0):
+            last_error = mt5.last_error() if hasattr(mt5, "last_error") else None
+            raise RuntimeError(f"No se pudo obtener la cuenta de MT5: {last_error}")
+        return int(account_info.login)
+
+    def get_metrics(self, mt5, days_back: int = 90) -> Dict:
+        """
+        Métricas de los trades cerrados de los últimos `days_back` días tras
+        sincronizar solo lo que falta; no carga el historial de la ventana.
+        Cada deal de cierre (OUT, INOUT u OUT_BY) cuenta como un trade: el
+        profit total coincide con las posiciones de historical_metrics_from_deals;
+        una posición cerrada en varias salidas parciales cuenta aquí como varios
+        trades (y sus salidas ya hechas suman aunque siga abierta)
+        """
+        login = self._account_login(mt5)
+
+        from_date = datetime.now() - timedelta(days=days_back)
+        sync_result = self.sync(mt5, login, from_date)
+        if sync_result.get("error"):
+            print(f"⚠️ Error sincronizando deals de MT5: {sync_result['error']}")
+
+        metrics = self.window_accumulator(login, from_date).metrics()
+        metrics.update(login=login, days_back=days_back, new_deals=sync_result.get("inserted", 0))
+        return metrics
+
+    def load_deals(self, login: int, from_date: datetime, to_date: datetime = None) -> pd.DataFrame:
+        """Carga los deals almacenados de una cuenta dentro de la ventana indicada"""
+        query = f'''
+            SELECT {", ".join(f'"{c}"' for c in DEAL_COLUMNS)}
+            FROM mt5_deals
+            WHERE login = ? AND time >= ?
+        '''
+        params = [login, int(from_date.timestamp())]
+        if to_date is not None:
+            query += " AND time <= ?"
+            params.append(int(to_date.timestamp()))
+        query += " ORDER BY time, ticket"
+
+        return pd.read_sql_query(query, self.pool.get(), params=params)
+
+    def get_deals(self, mt5, days_back: int = 90) -> pd.DataFrame:
+        """
+        Devuelve los deals de los últimos `days_back` días, sincronizando antes
+        solo lo que falta. Formato idéntico al DataFrame construido a partir de
+        mt5.history_deals_get() (con la columna time convertida a datetime).
+        """
+        login = self._account_login(mt5)
+
+        from_date = datetime.now() - timedelta(days=days_back)
+        sync_result = self.sync(mt5, login, from_date)
+        if sync_result.get("error"):
+            print(f"⚠️ Error sincronizando deals de MT5: {sync_result['error']}")
+
+        deals_df = self.load_deals(login, from_date)
+        deals_df["time"] = pd.to_datetime(deals_df["time"], unit="s")
+        return deals_df
+
+    def get_sync_status(self, login: int) -> Dict:
+        """Devuelve el estado de sincronización de una cuenta"""
+        state = self._get_sync_state(self.pool.get().cursor(), login)
+
+        if state is None:
+            return {"login": login, "synced": False}
+
+        return {
+            "login": login,
+            "synced": True,
+            "synced_from": state["synced_from"].isoformat() if state["synced_from"] else None,
+            "synced_to": state["synced_to"].isoformat() if state["synced_to"] else None,
+            "last_deal_time": state["last_deal_time"],
+            "total_deals": state["total_deals"]
+        }
+
+
+# Instancia global
+deal_store = DealStore()
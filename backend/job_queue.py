@@ -0,0 +1,194 @@
+"""
+Job Queue
+Cola de trabajos en proceso para tareas lentas (enriquecimiento con IA).
+Los workers son tareas asyncio del event loop de la API (se arrancan en el
+lifespan); submit() es seguro desde cualquier hilo, incluidos los endpoints
+síncronos que FastAPI ejecuta en su threadpool.
+Cada trabajo tiene un id consultable (/jobs/{id}) y un flujo de eventos
+(/jobs/{id}/events, SSE) que notifica cuando termina.
+"""
+
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+JobFunction = Callable[[], Awaitable[Dict]]
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobQueue:
+    def __init__(self, workers: int = None, max_jobs: int = 200):
+        """
+        Args:
+            workers: tareas worker concurrentes (AI_JOB_WORKERS, por defecto 2)
+            max_jobs: trabajos terminados que se conservan para consulta
+        """
+        self.workers = workers if workers is not None \
+            else int(os.getenv("AI_JOB_WORKERS", "2"))
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._functions: Dict[str, JobFunction] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and not self._loop.is_closed()
+
+    async def start(self):
+        """Arranca los workers en el event loop actual (hook de arranque de la API)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        """Cancela los workers; los trabajos pendientes quedan como cancelled"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                if job["status"] not in FINISHED_STATES:
+                    self._finish(job_id, "cancelled", error="API detenida")
+        self._loop = None
+        self._queue = None
+
+    def submit(self, kind: str, function: JobFunction, meta: Dict = None) -> str:
+        """Encola un trabajo (seguro entre hilos) y devuelve su id"""
+        if not self.running:
+            raise RuntimeError("La cola de trabajos no está iniciada")
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": "pending",
+            "meta": meta or {},
+            "result": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._functions[job_id] = function
+            self._trim()
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._queue.put_nowait(job_id)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+        return job_id
+
+    def _trim(self):
+        # Descarta los trabajos terminados más antiguos
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in FINISHED_STATES]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+            self._done_events.pop(job_id, None)
+
+    def _done_event(self, job_id: str) -> asyncio.Event:
+        # Solo desde el event loop de la cola
+        if job_id not in self._done_events:
+            self._done_events[job_id] = asyncio.Event()
+        return self._done_events[job_id]
+
+    def _finish(self, job_id: str, status: str, result: Dict = None, error: str = None):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = status
+        job["result"] = result
+        job["error"] = error
+        job["finished_at"] = datetime.now().isoformat()
+        self._functions.pop(job_id, None)
+        event = self._done_events.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            function = self._functions.get(job_id)
+            if job is None or function is None:
+                continue
+
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat()
+            try:
+                result = await function()
+                self._finish(job_id, "completed", result=result)
+            except asyncio.CancelledError:
+                self._finish(job_id, "cancelled", error="API detenida")
+                raise
+            except Exception as e:
+                print(f"❌ Error en trabajo {job['kind']} {job_id}: {e}")
+                self._finish(job_id, "failed", error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list_jobs(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+        return [dict(job) for job in reversed(jobs)]
+
+    async def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Espera a que el trabajo termine (desde el event loop de la cola)"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in FINISHED_STATES:
+            await asyncio.wait_for(self._done_event(job_id).wait(), timeout)
+        return self.get(job_id)
+
+    async def events(self, job_id: str, keepalive: float = 15) -> AsyncIterator[tuple]:
+        """
+        Eventos del trabajo: ("status", job) al conectar, ("keepalive", None)
+        mientras espera y ("status", job) final cuando termina
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        yield "status", job
+        while job is not None and job["status"] not in FINISHED_STATES:
+            try:
+                job = await self.wait(job_id, timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield "keepalive", None
+                continue
+            if job is not None:
+                yield "status", job
+
+    def stats(self) -> Dict:
+        counts: Dict[str, int] = {}
+        for job in list(self._jobs.values()):
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": counts
+        }
+
+
+# Instancia global
+job_queue = JobQueue()
@@ -0,0 +1,155 @@
+"""
+JSON Field Stream
+Parser incremental de un objeto JSON que llega por trozos (tokens de una
+respuesta en streaming). Emite eventos en cuanto cada parte es utilizable, sin
+esperar al cierre del objeto:
+- ("delta", campo, texto): texto nuevo de un campo de primer nivel de tipo string
+- ("item", campo, clave_o_índice, valor): elemento completo de un campo objeto/array
+- ("field", campo, valor): campo de primer nivel completo
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+Event = Tuple
+
+
+class JSONFieldStream:
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        # Pila de contenedores abiertos: {"type": "object"|"array", "expect_key": bool, "index": int}
+        self._stack: List[dict] = []
+        self._in_string = False
+        self._escape = 0            # caracteres pendientes de la secuencia de escape actual
+        self._string_start = 0
+        self._string_is_key = False
+        self._string_level = 0
+        # Por nivel (1 = campos del objeto raíz, 2 = sus elementos): inicio, tipo y clave del valor actual
+        self._value_start = {1: None, 2: None}
+        self._value_kind = {1: None, 2: None}
+        self._keys = {1: None, 2: None}
+        # Texto ya emitido (posición en buffer) del string de primer nivel en curso
+        self._delta_from = 0
+        self._delta_safe = 0
+        self._pending_surrogate = False
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Añade un trozo de texto y devuelve los eventos que completa"""
+        self.buffer += chunk
+        events: List[Event] = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                self._scan_string(char, i, events)
+                continue
+
+            level = len(self._stack)
+            if char in " \t\r\n":
+                self._end_scalar(level, i, events)
+            elif char == '"':
+                self._start_value(level, i, "string")
+                self._in_string = True
+                self._string_start = i
+                self._string_level = level
+                self._string_is_key = bool(self._stack) and self._stack[-1]["expect_key"]
+                self._delta_from = self._delta_safe = i + 1
+                self._pending_surrogate = False
+            elif char in "{[":
+                self._start_value(level, i, "container")
+                self._stack.append({"type": "object" if char == "{" else "array",
+                                    "expect_key": char == "{", "index": 0})
+            elif char in "}]":
+                self._end_scalar(level, i, events)
+                self._stack.pop()
+                self._end_value(len(self._stack), i + 1, "container", events)
+            elif char == ":":
+                self._stack[-1]["expect_key"] = False
+            elif char == ",":
+                self._end_scalar(level, i, events)
+                top = self._stack[-1]
+                if top["type"] == "object":
+                    top["expect_key"] = True
+                else:
+                    top["index"] += 1
+            else:
+                self._start_value(level, i, "scalar")
+
+        self._pos = len(buffer)
+        if self._in_string:
+            self._emit_delta(len(buffer), events, final=False)
+        return events
+
+    def result(self) -> Any:
+        """Objeto completo (json.loads del texto acumulado)"""
+        return json.loads(self.buffer)
+
+    # ------------------------------------------------------------------
+
+    def _scan_string(self, char: str, i: int, events: List[Event]):
+        if self._escape:
+            self._escape -= 1
+            if char == "u" and self._escape == 0 and self.buffer[i - 1] == "\\":
+                self._escape = 4
+            if self._escape == 0:
+                # Un surrogate alto (\uD800-\uDBFF) solo se decodifica junto al bajo
+                escape = self.buffer[self.buffer.rfind("\\", 0, i):i + 1]
+                high = escape.startswith("\\u") and "d800" <= escape[2:].lower() <= "dbff"
+                if not high:
+                    self._delta_safe = i + 1
+                self._pending_surrogate = high
+            return
+
+        if char == "\\":
+            self._escape = 1
+        elif char == '"':
+            self._in_string = False
+            level = self._string_level
+            if self._string_is_key:
+                if level in self._keys:
+                    self._keys[level] = json.loads(self.buffer[self._string_start:i + 1])
+            else:
+                if level == 1:
+                    self._emit_delta(i, events, final=True)
+                self._end_value(level, i + 1, "string", events)
+        elif not self._pending_surrogate:
+            self._delta_safe = i + 1
+
+    def _emit_delta(self, end: int, events: List[Event], final: bool):
+        # Solo para strings de primer nivel que no son claves
+        if self._string_level != 1 or self._string_is_key:
+            return
+        safe = end if final else self._delta_safe
+        if safe > self._delta_from:
+            text = json.loads('"' + self.buffer[self._delta_from:safe] + '"')
+            events.append(("delta", self._keys[1], text))
+            self._delta_from = safe
+
+    def _start_value(self, level: int, i: int, kind: str):
+        if level in self._value_start and self._value_start[level] is None:
+            top = self._stack[-1] if self._stack else None
+            if top is not None and top["type"] == "object" and top["expect_key"]:
+                return
+            self._value_start[level] = i
+            self._value_kind[level] = kind
+
+    def _end_scalar(self, level: int, i: int, events: List[Event]):
+        if self._value_kind.get(level) == "scalar":
+            self._end_value(level, i, "scalar", events)
+
+    def _end_value(self, level: int, end: int, kind: str, events: List[Event]):
+        start = self._value_start.get(level)
+        if start is None or self._value_kind[level] != kind:
+            return
+        self._value_start[level] = None
+        self._value_kind[level] = None
+        value = json.loads(self.buffer[start:end])
+
+        if level == 1:
+            events.append(("field", self._keys[1], value))
+        elif level == 2:
+            parent = self._stack[1]
+            key: Optional[Any] = self._keys[2] if parent["type"] == "object" else parent["index"]
+            events.append(("item", self._keys[1], key, value))
@@ -0,0 +1,194 @@
+"""
+Metric Accumulators
+Estadísticos de una serie de resultados (profit por trade, en orden temporal)
+que se actualizan trade a trade o por lotes y se combinan entre particiones
+(p. ej. un acumulador por día): win rate, profit factor, media y varianza
+(Welford), mejor/peor trade, drawdown y rachas.
+
+merge() es asociativa pero no conmutativa: `a.merge(b)` supone que los trades
+de `b` van después de los de `a`. Las convenciones son las de run_length:
+racha ganadora = profit > 0 (el resto cuenta como pérdida) y drawdown sobre la
+curva de profit acumulado partiendo de 0.
+"""
+
+import math
+from typing import Dict, Iterable
+
+import numpy as np
+
+from run_length import encode_runs
+
+
+class TradeStatsAccumulator:
+    # Campos del estado serializado (to_dict / from_dict)
+    FIELDS = (
+        "count", "wins", "gross_profit", "gross_loss", "mean", "m2", "best", "worst",
+        "total", "peak", "trough", "max_drawdown",
+        "longest_win", "longest_loss", "first_win", "first_length", "last_win", "last_length"
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        # Welford: media y suma de cuadrados de las desviaciones
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.best = None
+        self.worst = None
+        # Curva acumulada relativa al inicio de la partición: total, máximo
+        # (incluye el 0 inicial), mínimo y mayor caída desde un máximo
+        self.total = 0.0
+        self.peak = 0.0
+        self.trough = None
+        self.max_drawdown = 0.0
+        # Rachas: más largas y las abiertas al principio y al final
+        self.longest_win = 0
+        self.longest_loss = 0
+        self.first_win = None
+        self.first_length = 0
+        self.last_win = None
+        self.last_length = 0
+
+    @classmethod
+    def from_profits(cls, profits) -> "TradeStatsAccumulator":
+        """Acumulador de un lote de resultados (vectorizado)"""
+        acc = cls()
+        profits = np.asarray(profits, dtype=float)
+        n = len(profits)
+        if n == 0:
+            return acc
+
+        acc.count = n
+        acc.wins = int((profits > 0).sum())
+        acc.gross_profit = float(profits[profits > 0].sum())
+        acc.gross_loss = float(-profits[profits < 0].sum())
+        acc.mean = float(profits.mean())
+        acc.m2 = float(((profits - acc.mean) ** 2).sum())
+        acc.best = float(profits.max())
+        acc.worst = float(profits.min())
+
+        equity = np.cumsum(profits)
+        running_peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+        acc.total = float(equity[-1])
+        acc.peak = float(running_peak[-1])
+        acc.trough = float(equity.min())
+        acc.max_drawdown = float((running_peak - equity).max())
+
+        run_values, run_lengths, _ = encode_runs(profits > 0)
+        win_lengths = run_lengths[run_values]
+        loss_lengths = run_lengths[~run_values]
+        acc.longest_win = int(win_lengths.max()) if len(win_lengths) else 0
+        acc.longest_loss = int(loss_lengths.max()) if len(loss_lengths) else 0
+        acc.first_win, acc.first_length = bool(run_values[0]), int(run_lengths[0])
+        acc.last_win, acc.last_length = bool(run_values[-1]), int(run_lengths[-1])
+        return acc
+
+    def update(self, profit: float) -> "TradeStatsAccumulator":
+        """Añade un trade (O(1))"""
+        return self.update_batch([profit])
+
+    def update_batch(self, profits) -> "TradeStatsAccumulator":
+        """Añade un lote de trades posteriores a los ya acumulados"""
+        merged = self.merge(TradeStatsAccumulator.from_profits(profits))
+        self.__dict__.update(merged.__dict__)
+        return self
+
+    def merge(self, other: "TradeStatsAccumulator") -> "TradeStatsAccumulator":
+        """Combina con los trades de `other`, que van a continuación de los de self"""
+        if other.count == 0:
+            return self.copy()
+        if self.count == 0:
+            return other.copy()
+
+        a, b = self, other
+        acc = TradeStatsAccumulator()
+        acc.count = a.count + b.count
+        acc.wins = a.wins + b.wins
+        acc.gross_profit = a.gross_profit + b.gross_profit
+        acc.gross_loss = a.gross_loss + b.gross_loss
+
+        # Welford en paralelo (Chan et al.)
+        delta = b.mean - a.mean
+        acc.mean = a.mean + delta * b.count / acc.count
+        acc.m2 = a.m2 + b.m2 + delta ** 2 * a.count * b.count / acc.count
+        acc.best = max(a.best, b.best)
+        acc.worst = min(a.worst, b.worst)
+
+        # La curva de b continúa desde a.total; la peor caída que cruza la
+        # frontera va del máximo de a al mínimo de b
+        acc.total = a.total + b.total
+        acc.peak = max(a.peak, a.total + b.peak)
+        acc.trough = min(a.trough, a.total + b.trough)
+        acc.max_drawdown = max(a.max_drawdown, b.max_drawdown, a.peak - (a.total + b.trough))
+
+        # Rachas: la última de a se une con la primera de b si son del mismo tipo
+        acc.longest_win, acc.longest_loss = max(a.longest_win, b.longest_win), max(a.longest_loss, b.longest_loss)
+        if a.last_win == b.first_win:
+            joined = a.last_length + b.first_length
+            if a.last_win:
+                acc.longest_win = max(acc.longest_win, joined)
+            else:
+                acc.longest_loss = max(acc.longest_loss, joined)
+
+        acc.first_win, acc.first_length = a.first_win, a.first_length
+        if a.first_length == a.count and a.first_win == b.first_win:
+            acc.first_length = a.count + b.first_length
+        acc.last_win, acc.last_length = b.last_win, b.last_length
+        if b.last_length == b.count and b.last_win == a.last_win:
+            acc.last_length = b.count + a.last_length
+        return acc
+
+    def copy(self) -> "TradeStatsAccumulator":
+        acc = TradeStatsAccumulator()
+        acc.__dict__.update(self.__dict__)
+        return acc
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "TradeStatsAccumulator":
+        acc = cls()
+        for field in cls.FIELDS:
+            if field in state:
+                setattr(acc, field, state[field])
+        return acc
+
+    def metrics(self) -> Dict:
+        """Métricas con los nombres de analyze_historical_data / calculate_advanced_metrics"""
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        if self.count:
+            streak_type = "win" if self.last_win else "loss"
+        else:
+            streak_type = "none"
+        return {
+            "total_trades": self.count,
+            "wins": self.wins,
+            "losses": self.count - self.wins,
+            "win_rate": self.wins / self.count * 100 if self.count else 0.0,
+            "total_profit": self.total,
+            "gross_profit": self.gross_profit,
+            "gross_loss": self.gross_loss,
+            "profit_factor": self.gross_profit / self.gross_loss if self.gross_loss > 0 else 0.0,
+            "avg_profit": self.mean,
+            "profit_std": std,
+            "sharpe_ratio": self.mean / std if std > 0 else 0.0,
+            "best_trade": self.best if self.best is not None else 0.0,
+            "worst_trade": self.worst if self.worst is not None else 0.0,
+            "max_drawdown": self.max_drawdown,
+            "current_drawdown": self.peak - self.total,
+            "longest_win_streak": self.longest_win,
+            "longest_loss_streak": self.longest_loss,
+            "current_streak_type": streak_type,
+            "current_streak_length": self.last_length
+        }
+
+
+def merge_all(accumulators: Iterable[TradeStatsAccumulator]) -> TradeStatsAccumulator:
+    """Combina particiones consecutivas en orden"""
+    result = TradeStatsAccumulator()
+    for acc in accumulators:
+        result = result.merge(acc)
+    return result
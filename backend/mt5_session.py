@@ -0,0 +1,135 @@
+"""
+MT5 Session Manager
+Conexión única y compartida con el terminal MetaTrader 5 para todo el proceso.
+Sustituye el patrón initialize()/shutdown() por petición: la conexión se abre
+al arrancar la API, se revalida periódicamente y el acceso se serializa, ya que
+la librería MetaTrader5 no es segura entre hilos.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class MT5ConnectionError(Exception):
+    """No se pudo establecer o recuperar la conexión con MT5"""
+
+
+class MT5SessionManager:
+    def __init__(self, mt5_module=None, health_check_interval: float = None, acquire_timeout: float = None):
+        """
+        Args:
+            mt5_module: módulo compatible con MetaTrader5 (un fake o una DealSource).
+                        Si es None, en el primer uso se crea la fuente de
+                        DEAL_SOURCE (por defecto el terminal MetaTrader5).
+            health_check_interval: segundos entre revalidaciones de la conexión
+            acquire_timeout: segundos máximos de espera por el turno de acceso
+        """
+        self._mt5 = mt5_module
+        self.health_check_interval = health_check_interval if health_check_interval is not None \
+            else float(os.getenv("MT5_HEALTH_CHECK_INTERVAL", "30"))
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None \
+            else float(os.getenv("MT5_ACQUIRE_TIMEOUT", "60"))
+
+        self._lock = threading.RLock()
+        self._connected = False
+        self._last_check = 0.0
+        self._last_error = None
+        self._reconnects = 0
+
+    @property
+    def mt5(self):
+        if self._mt5 is None:
+            from deal_sources import source_from_env
+            self._mt5 = source_from_env()
+        return self._mt5
+
+    def _connect(self) -> bool:
+        if self.mt5.initialize():
+            self._connected = True
+            self._last_check = time.monotonic()
+            self._last_error = None
+            return True
+
+        self._connected = False
+        self._last_error = str(self.mt5.last_error())
+        return False
+
+    def _is_healthy(self) -> bool:
+        try:
+            info = self.mt5.terminal_info()
+        except Exception:
+            return False
+        return info is not None and bool(getattr(info, "connected", True))
+
+    def start(self) -> bool:
+        """Abre la conexión (hook de arranque de la API)"""
+        with self._lock:
+            if self._connected:
+                return True
+            if self._connect():
+                print("✅ Sesión MT5 iniciada")
+                return True
+            print(f"⚠️ No se pudo iniciar MT5: {self._last_error}")
+            return False
+
+    def stop(self):
+        """Cierra la conexión (hook de apagado de la API)"""
+        with self._lock:
+            if self._connected:
+                self.mt5.shutdown()
+                self._connected = False
+                print("✅ Sesión MT5 cerrada")
+
+    def ensure_connected(self) -> bool:
+        """Conecta si hace falta y revalida la conexión cada health_check_interval"""
+        with self._lock:
+            if not self._connected:
+                return self._connect()
+
+            if time.monotonic() - self._last_check < self.health_check_interval:
+                return True
+
+            if self._is_healthy():
+                self._last_check = time.monotonic()
+                return True
+
+            # Conexión caída: reiniciar
+            print("⚠️ Conexión MT5 perdida, reconectando...")
+            try:
+                self.mt5.shutdown()
+            except Exception:
+                pass
+            self._connected = False
+            self._reconnects += 1
+            return self._connect()
+
+    @contextmanager
+    def session(self):
+        """
+        Acceso exclusivo a MT5. Las llamadas se atienden de una en una; el
+        bloqueo es reentrante, así que las funciones que ya están dentro de una
+        sesión pueden abrir otra anidada sin bloquearse.
+        """
+        if not self._lock.acquire(timeout=self.acquire_timeout):
+            raise MT5ConnectionError("Timeout esperando acceso a MT5")
+        try:
+            if not self.ensure_connected():
+                raise MT5ConnectionError("MT5 no inicializado")
+            yield self.mt5
+        finally:
+            self._lock.release()
+
+    def status(self) -> Dict:
+        return {
+            "connected": self._connected,
+            "last_error": self._last_error,
+            "reconnects": self._reconnects,
+            "seconds_since_check": round(time.monotonic() - self._last_check, 1) if self._connected else None
+        }
+
+
+# Instancia global
+mt5_session = MT5SessionManager()
@@ -0,0 +1,412 @@
+"""
+Multi-Account Runner
+Análisis de varias cuentas MT5 en paralelo con un pool de procesos. La librería
+MetaTrader5 se conecta a un único terminal por proceso, así que cada worker
+tiene asignado su propio terminal (MT5_TERMINAL_PATHS) y va iniciando sesión
+en las cuentas que le tocan. El tamaño del pool (MT5_MAX_TERMINALS) limita
+cuántos terminales hay vivos a la vez.
+Por cuenta se sincroniza el historial de deals (deal_store) y se calcula el
+análisis; al terminar, los informes por cuenta se agregan en un informe de
+cartera.
+
+Perfiles (MT5_ACCOUNTS_FILE, JSON, ver accounts.example.json):
+    [{"login": 12345678, "server": "Broker-Demo", "name": "Grid EURUSD", "password": "..."}]
+La contraseña puede omitirse y tomarse de MT5_PASSWORD_<login>.
+
+Uso (desde backend/):
+    python multi_account.py [accounts.json] [days_back] [terminales]
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Estado del proceso worker: módulo MetaTrader5 y terminal asignado
+_worker: Dict = {}
+
+
+# ---------------------------------------------------------------------------
+#  Perfiles de cuenta
+# ---------------------------------------------------------------------------
+
+def load_profiles(path: str = None) -> List[Dict]:
+    """Perfiles de MT5_ACCOUNTS_FILE (lista o {"accounts": [...]})"""
+    path = path or os.getenv("MT5_ACCOUNTS_FILE", "accounts.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    profiles = data.get("accounts", []) if isinstance(data, dict) else data
+    return validate_profiles(profiles)
+
+
+def validate_profiles(profiles: List[Dict]) -> List[Dict]:
+    validated = []
+    for profile in profiles or []:
+        if not profile.get("login") or not profile.get("server"):
+            raise ValueError(f"Perfil sin login o server: {public_profile(profile)}")
+        validated.append(dict(profile, login=int(profile["login"])))
+    return validated
+
+
+def account_password(profile: Dict) -> str:
+    return profile.get("password") or os.getenv(f"MT5_PASSWORD_{profile['login']}", "")
+
+
+def public_profile(profile: Dict) -> Dict:
+    """Perfil sin la contraseña (para informes y respuestas de la API)"""
+    return {k: v for k, v in profile.items() if k != "password"}
+
+
+# ---------------------------------------------------------------------------
+#  Worker (proceso hijo)
+# ---------------------------------------------------------------------------
+
+def _init_worker(terminal_paths):
+    """Inicializador del pool: toma un terminal libre de la cola"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    _worker["terminal_path"] = terminal_paths.get() if terminal_paths is not None else None
+    _worker["mt5"] = importlib.import_module("MetaTrader5")
+
+
+def analyze_account(profile: Dict, days_back: int = 90) -> Dict:
+    """
+    Tarea del worker: inicia sesión en la cuenta con el terminal del proceso,
+    sincroniza el historial de deals y calcula el análisis. Devuelve un
+    informe serializable (sin DataFrames ni contraseña).
+    """
+    from deal_store import deal_store
+    from strategy_engine import (
+        _analyze_trades, historical_metrics_from_deals, public_metrics, snapshot_from_historical
+    )
+
+    mt5 = _worker.get("mt5") or importlib.import_module("MetaTrader5")
+    terminal_path = _worker.get("terminal_path")
+    started = time.perf_counter()
+    report = {
+        **public_profile(profile),
+        "name": profile.get("name") or str(profile["login"]),
+        "status": "completed",
+        "error": None,
+        "terminal": terminal_path,
+        "worker_pid": os.getpid()
+    }
+
+    kwargs = {
+        "login": int(profile["login"]),
+        "server": profile["server"],
+        "password": account_password(profile),
+        "timeout": int(os.getenv("MT5_LOGIN_TIMEOUT_MS", "60000"))
+    }
+    if terminal_path:
+        kwargs["path"] = terminal_path
+
+    if not mt5.initialize(**kwargs):
+        report.update(status="failed", error=f"No se pudo iniciar sesión: {mt5.last_error()}",
+                      duration_seconds=round(time.perf_counter() - started, 3))
+        return report
+
+    try:
+        account_info = mt5.account_info()
+        if account_info is None or int(account_info.login) != int(profile["login"]):
+            raise RuntimeError(f"El terminal no quedó conectado a la cuenta {profile['login']}")
+
+        deals_df = deal_store.get_deals(mt5, days_back)
+        historical = historical_metrics_from_deals(deals_df)
+        snapshot = snapshot_from_historical(historical, days_back)
+        result, _ = _analyze_trades(mt5, snapshot)
+
+        report.update({
+            "balance": float(account_info.balance),
+            "equity": float(account_info.equity),
+            "summary": result["summary"],
+            "open_positions": len(result["trades"]),
+            "exposure": _exposure(result["trades"]),
+            "historical": public_metrics(historical),
+            "symbols": snapshot["symbol_analysis"].get("symbols", {}),
+            "sync": deal_store.get_sync_status(int(profile["login"]))
+        })
+    except Exception as e:
+        report.update(status="failed", error=str(e))
+    finally:
+        mt5.shutdown()
+
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def _exposure(trades: List[Dict]) -> Dict:
+    """Volumen comprado/vendido y profit flotante por símbolo"""
+    exposure: Dict[str, Dict] = {}
+    for trade in trades:
+        stats = exposure.setdefault(trade["symbol"], {"buy_volume": 0.0, "sell_volume": 0.0,
+                                                      "net_volume": 0.0, "floating_profit": 0.0})
+        volume = float(trade["volume"])
+        side = "buy_volume" if trade["type"] == "BUY" else "sell_volume"
+        stats[side] += volume
+        stats["net_volume"] += volume if trade["type"] == "BUY" else -volume
+        stats["floating_profit"] += float(trade["profit"])
+    return {symbol: {k: round(v, 2) for k, v in stats.items()} for symbol, stats in exposure.items()}
+
+
+# ---------------------------------------------------------------------------
+#  Informe de cartera
+# ---------------------------------------------------------------------------
+
+def build_portfolio_report(accounts: List[Dict]) -> Dict:
+    """Agrega los informes por cuenta (solo las completadas)"""
+    completed = [a for a in accounts if a["status"] == "completed"]
+    totals = {"balance": 0.0, "equity": 0.0, "floating_profit": 0.0, "open_positions": 0,
+              "historical_trades": 0, "historical_wins": 0, "historical_profit": 0.0}
+    symbols: Dict[str, Dict] = {}
+    exposure: Dict[str, Dict] = {}
+
+    for account in completed:
+        historical = account.get("historical", {})
+        totals["balance"] += account.get("balance", 0.0)
+        totals["equity"] += account.get("equity", 0.0)
+        totals["open_positions"] += account.get("open_positions", 0)
+        totals["floating_profit"] += sum(e["floating_profit"] for e in account.get("exposure", {}).values())
+        totals["historical_trades"] += int(historical.get("total_trades", 0))
+        totals["historical_wins"] += int(historical.get("wins", 0))
+        totals["historical_profit"] += float(historical.get("total_profit", 0.0))
+
+        for symbol, stats in account.get("symbols", {}).items():
+            merged = symbols.setdefault(symbol, {"total_profit": 0.0, "trade_count": 0, "accounts": 0})
+            merged["total_profit"] += stats["total_profit"]
+            merged["trade_count"] += stats["trade_count"]
+            merged["accounts"] += 1
+        for symbol, stats in account.get("exposure", {}).items():
+            merged = exposure.setdefault(symbol, {k: 0.0 for k in stats})
+            for key, value in stats.items():
+                merged[key] += value
+
+    trades = totals["historical_trades"]
+    totals["historical_win_rate"] = totals["historical_wins"] / trades * 100 if trades else 0.0
+
+    ranking = sorted(
+        ({"login": a["login"], "name": a["name"],
+          "historical_profit": float(a.get("historical", {}).get("total_profit", 0.0)),
+          "win_rate": float(a.get("historical", {}).get("win_rate", 0.0)),
+          "max_drawdown": float(a.get("historical", {}).get("max_drawdown", 0.0)),
+          "strategy": a.get("summary", {}).get("strategy")} for a in completed),
+        key=lambda item: item["historical_profit"], reverse=True
+    )
+
+    return {
+        "accounts_total": len(accounts),
+        "accounts_completed": len(completed),
+        "accounts_failed": [{"login": a["login"], "name": a["name"], "error": a["error"]}
+                            for a in accounts if a["status"] != "completed"],
+        "totals": totals,
+        "ranking": ranking,
+        "symbols": dict(sorted(symbols.items(), key=lambda item: item[1]["total_profit"], reverse=True)),
+        "exposure": exposure
+    }
+
+
+# ---------------------------------------------------------------------------
+#  Runner
+# ---------------------------------------------------------------------------
+
+class MultiAccountRunner:
+    def __init__(self, max_terminals: int = None, terminal_paths: List[str] = None,
+                 days_back: int = 90, max_runs: int = 20, allow_shared_terminal: bool = None):
+        """
+        Args:
+            max_terminals: terminales MT5 vivos a la vez (MT5_MAX_TERMINALS, por defecto 2)
+            terminal_paths: terminal64.exe de cada instalación portable
+                            (MT5_TERMINAL_PATHS, separados por ';')
+            days_back: ventana de historial por defecto
+            max_runs: ejecuciones que se conservan en memoria
+            allow_shared_terminal: sin rutas, usar el terminal instalado de uno
+                                   en uno (MT5_ALLOW_SHARED_TERMINAL). Es el
+                                   mismo terminal que usa mt5_session: al
+                                   terminar queda conectado a la última cuenta
+                                   analizada, así que por defecto se rechaza
+        """
+        self.max_terminals = max_terminals if max_terminals is not None \
+            else int(os.getenv("MT5_MAX_TERMINALS", "2"))
+        if terminal_paths is None:
+            terminal_paths = [p.strip() for p in os.getenv("MT5_TERMINAL_PATHS", "").split(";") if p.strip()]
+        self.terminal_paths = terminal_paths
+        self.allow_shared_terminal = allow_shared_terminal if allow_shared_terminal is not None \
+            else os.getenv("MT5_ALLOW_SHARED_TERMINAL", "0").lower() in ("1", "true", "yes")
+        self.days_back = days_back
+        self.max_runs = max_runs
+        # Una ejecución a la vez: cada una abre su propio pool de terminales
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="multi-account")
+        self._runs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        """Procesos (= terminales vivos) del pool"""
+        if not self.terminal_paths:
+            return 1
+        return max(1, min(self.max_terminals, len(self.terminal_paths)))
+
+    def _check_terminals(self):
+        """Sin terminales propios los workers iniciarían sesión en el de la API"""
+        if not self.terminal_paths and not self.allow_shared_terminal:
+            raise ValueError("No hay terminales dedicados (MT5_TERMINAL_PATHS); el terminal instalado es el "
+                             "de la sesión de la API. Para usarlo igualmente: MT5_ALLOW_SHARED_TERMINAL=1")
+
+    def _new_run(self, profiles: List[Dict], days_back: int) -> Dict:
+        run = {
+            "run_id": uuid.uuid4().hex[:12],
+            "status": "pending",
+            "days_back": days_back,
+            "workers": self.workers,
+            "accounts_total": len(profiles),
+            "accounts_done": 0,
+            "profiles": [public_profile(p) for p in profiles],
+            "accounts": [],
+            "portfolio": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_seconds": None,
+            "error": None
+        }
+        with self._lock:
+            self._runs[run["run_id"]] = run
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return run
+
+    def run(self, profiles: List[Dict], days_back: int = None) -> Dict:
+        """Analiza todas las cuentas y devuelve el informe (bloqueante)"""
+        self._check_terminals()
+        profiles = validate_profiles(profiles)
+        run = self._new_run(profiles, days_back or self.days_back)
+        self._execute(run, profiles)
+        return self.get_run(run["run_id"])
+
+    def submit(self, profiles: List[Dict], days_back: int = None) -> Dict:
+        """Encola una ejecución en segundo plano y devuelve su estado inicial"""
+        self._check_terminals()
+        profiles = validate_profiles(profiles)
+        run = self._new_run(profiles, days_back or self.days_back)
+        self._executor.submit(self._execute, run, profiles)
+        return self.get_run(run["run_id"])
+
+    def _execute(self, run: Dict, profiles: List[Dict]):
+        run["status"] = "running"
+        run["started_at"] = datetime.now().isoformat()
+        started = time.perf_counter()
+        reports: Dict[int, Dict] = {}
+
+        try:
+            # spawn: igual en Windows (donde corre MT5) que en el resto
+            ctx = multiprocessing.get_context("spawn")
+            paths = None
+            if self.terminal_paths:
+                paths = ctx.Queue()
+                for path in self.terminal_paths[:self.workers]:
+                    paths.put(path)
+
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx,
+                                     initializer=_init_worker, initargs=(paths,)) as pool:
+                futures = {pool.submit(analyze_account, profile, run["days_back"]): index
+                           for index, profile in enumerate(profiles)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        reports[index] = future.result()
+                    except Exception as e:
+                        # p. ej. un worker que murió dentro de la librería MT5
+                        reports[index] = {**public_profile(profiles[index]),
+                                          "name": profiles[index].get("name") or str(profiles[index]["login"]),
+                                          "status": "failed", "error": str(e)}
+                    run["accounts_done"] = len(reports)
+
+            run["accounts"] = [reports[i] for i in range(len(profiles))]
+            run["portfolio"] = build_portfolio_report(run["accounts"])
+            run["status"] = "completed"
+        except Exception as e:
+            print(f"❌ Error en análisis multi-cuenta {run['run_id']}: {e}")
+            run["status"] = "failed"
+            run["error"] = str(e)
+        finally:
+            run["finished_at"] = datetime.now().isoformat()
+            run["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        run = self._runs.get(run_id)
+        return dict(run) if run else None
+
+    def list_runs(self, limit: int = 20) -> List[Dict]:
+        """Ejecuciones recientes, sin el detalle por cuenta"""
+        with self._lock:
+            runs = list(self._runs.values())[-limit:]
+        return [{k: v for k, v in run.items() if k not in ("accounts", "portfolio")} for run in reversed(runs)]
+
+    def status(self) -> Dict:
+        return {
+            "max_terminals": self.max_terminals,
+            "terminal_paths": len(self.terminal_paths),
+            "shared_terminal_allowed": self.allow_shared_terminal,
+            "workers": self.workers,
+            "runs": len(self._runs)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instancia global
+multi_account_runner = MultiAccountRunner()
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    days_back = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    runner = MultiAccountRunner(max_terminals=int(sys.argv[3])) if len(sys.argv) > 3 else MultiAccountRunner()
+
+    profiles = load_profiles(path)
+    if not profiles:
+        print(f"❌ No hay perfiles de cuenta en {path or os.getenv('MT5_ACCOUNTS_FILE', 'accounts.json')}")
+        sys.exit(1)
+
+    print(f"🔄 Analizando {len(profiles)} cuentas con {runner.workers} terminal(es) en paralelo...")
+    report = runner.run(profiles, days_back)
+    portfolio = report["portfolio"] or {}
+    totals = portfolio.get("totals", {})
+
+    print("=" * 78)
+    print(f"{'cuenta':<24}{'estado':<11}{'profit hist.':>14}{'win rate':>10}{'posiciones':>12}{'tiempo':>8}")
+    for account in report["accounts"]:
+        historical = account.get("historical", {})
+        print(f"{account['name'][:23]:<24}{account['status']:<11}"
+              f"{historical.get('total_profit', 0):>14.2f}{historical.get('win_rate', 0):>9.1f}%"
+              f"{account.get('open_positions', 0):>12}{account.get('duration_seconds', 0):>7.1f}s")
+        if account["error"]:
+            print(f"   ⚠️ {account['error']}")
+    print("-" * 78)
+    print(f"Cartera: balance {totals.get('balance', 0):.2f} | equity {totals.get('equity', 0):.2f} | "
+          f"profit hist. {totals.get('historical_profit', 0):.2f} | "
+          f"win rate {totals.get('historical_win_rate', 0):.1f}% | {report['duration_seconds']}s")
+    print("=" * 78)
+
+    output = f"multi_account_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"✅ Informe guardado en {output}")
+
+
+if __name__ == "__main__":
+    main()
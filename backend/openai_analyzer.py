@@ -4,127 +4,394 @@ Provides AI-enhanced analysis, strategy naming, and parameter optimization
 """
 
 import os
-from openai import OpenAI
-from typing import Dict, List, Optional
+import asyncio
+import threading
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 import json
 from datetime import datetime
+from ai_cache import ai_cache, cache_key
+from json_stream import JSONFieldStream
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+STRATEGY_ANALYSIS_SYSTEM_PROMPT = "Eres un experto analista de trading cuantitativo con más de 15 años de experiencia en Forex, CFDs y análisis de estrategias algorítmicas. Tu tarea es analizar datos de trading y proporcionar insights profesionales y accionables."
+
+OPTIMIZATION_SYSTEM_PROMPT = "Eres un experto en optimización de estrategias de trading. Tu objetivo es mejorar el rendimiento ajustando parámetros basándote en datos históricos y mejores prácticas de gestión de riesgo."
+
+TEMPERATURE = 0.7
+
 
 class OpenAIAnalyzer:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
         self.max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+        # OPENAI_BASE_URL permite apuntar a un servidor compatible (p. ej. benchmarks/openai_stub.py)
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "30"))
+        self.max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+        
+        # Estado del camino asíncrono (semáforo, cliente y peticiones en vuelo) por event loop
+        self._async_loop = None
+        self._async_client = None
+        self._semaphore = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.metrics = {"requests": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "streams": 0,
+                        "last_prompt_tokens": 0, "last_prompt_level": None}
+        
+        # El SDK de openai se importa y el cliente se crea en el primer uso
+        self._client = None
+        self._client_lock = threading.Lock()
         
         if not self.api_key:
             print("⚠️ WARNING: OPENAI_API_KEY no encontrada en .env")
-            self.client = None
-        else:
-            self.client = OpenAI(api_key=self.api_key)
-            print("✅ OpenAI client inicializado correctamente")
     
-    def analyze_strategy_with_ai(self, trading_data: Dict) -> Dict:
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+    
+    @property
+    def client(self) -> Optional["OpenAI"]:
+        """Cliente síncrono, creado (e importado openai) en el primer acceso"""
+        if not self.enabled:
+            return None
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+                    print("✅ OpenAI client inicializado correctamente")
+        return self._client
+    
+    # ------------------------------------------------------------------
+    #  Camino síncrono
+    # ------------------------------------------------------------------
+    
+    def _cached(self, key: str, use_cache: bool) -> Optional[str]:
+        """Respuesta de ai_cache, salvo que la caché esté desactivada o se omita"""
+        if not use_cache or not ai_cache.enabled:
+            ai_cache.record_bypass()
+            return None
+        return ai_cache.get(key)
+    
+    def _store(self, key: str, content: str):
+        # Solo se cachean respuestas JSON válidas
+        json.loads(content)
+        if ai_cache.enabled:
+            ai_cache.put(key, self.model, content)
+    
+    def _complete(self, messages: List[Dict], use_cache: bool = True) -> Tuple[str, bool]:
+        """Devuelve (contenido, cacheado)"""
+        key = cache_key(self.model, messages, TEMPERATURE)
+        cached = self._cached(key, use_cache)
+        if cached is not None:
+            return cached, True
+        
+        self.metrics["requests"] += 1
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+            temperature=TEMPERATURE,
+            response_format={"type": "json_object"}
+        )
+        content = response.choices[0].message.content
+        self._store(key, content)
+        return content, False
+    
+    def analyze_strategy_with_ai(self, trading_data: Dict, use_cache: bool = True) -> Dict:
         """
         Analiza datos de trading con IA para identificar:
         - Nombre de la estrategia
         - Descripción detallada
         - Indicadores realmente usados
         - Análisis profundo de patrones
+        
+        use_cache=False omite la caché de respuestas (la respuesta nueva sí se guarda)
         """
-        if not self.client:
+        if not self.enabled:
             return self._fallback_analysis(trading_data)
         
         try:
-            # Preparar datos para el prompt
-            summary = trading_data.get("summary", {})
-            trades = trading_data.get("trades", [])
-            historical_metrics = trading_data.get("historical_metrics", {})
-            
-            prompt = self._build_strategy_analysis_prompt(summary, trades, historical_metrics)
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un experto analista de trading cuantitativo con más de 15 años de experiencia en Forex, CFDs y análisis de estrategias algorítmicas. Tu tarea es analizar datos de trading y proporcionar insights profesionales y accionables."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=self.max_tokens,
-                temperature=0.7,
-                response_format={"type": "json_object"}
-            )
-            
-            ai_analysis = json.loads(response.choices[0].message.content)
-            
-            return {
-                "strategy_name": ai_analysis.get("strategy_name", "Unknown Strategy"),
-                "strategy_description": ai_analysis.get("strategy_description", ""),
-                "confidence_score": ai_analysis.get("confidence_score", 0),
-                "indicators_detected": ai_analysis.get("indicators_detected", []),
-                "trading_style": ai_analysis.get("trading_style", ""),
-                "risk_profile": ai_analysis.get("risk_profile", ""),
-                "detailed_analysis": ai_analysis.get("detailed_analysis", ""),
-                "strengths": ai_analysis.get("strengths", []),
-                "weaknesses": ai_analysis.get("weaknesses", []),
-                "market_conditions": ai_analysis.get("market_conditions", ""),
-                "ai_powered": True,
-                "analysis_timestamp": datetime.utcnow().isoformat()
-            }
-            
+            content, cached = self._complete(self._strategy_analysis_messages(trading_data), use_cache)
+            return self._parse_strategy_analysis(content, cached)
         except Exception as e:
             print(f"⚠️ Error en análisis con OpenAI: {e}")
             return self._fallback_analysis(trading_data)
     
-    def optimize_parameters_with_ai(self, strategy_data: Dict, current_performance: Dict) -> Dict:
+    def optimize_parameters_with_ai(self, strategy_data: Dict, current_performance: Dict,
+                                    use_cache: bool = True) -> Dict:
         """
         Usa IA para optimizar parámetros de la estrategia
         """
-        if not self.client:
+        if not self.enabled:
             return self._fallback_optimization()
         
         try:
-            prompt = self._build_optimization_prompt(strategy_data, current_performance)
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un experto en optimización de estrategias de trading. Tu objetivo es mejorar el rendimiento ajustando parámetros basándote en datos históricos y mejores prácticas de gestión de riesgo."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=self.max_tokens,
-                temperature=0.7,
-                response_format={"type": "json_object"}
+            content, cached = self._complete(self._optimization_messages(strategy_data, current_performance), use_cache)
+            return self._parse_optimization(content, cached)
+        except Exception as e:
+            print(f"⚠️ Error en optimización con OpenAI: {e}")
+            return self._fallback_optimization()
+    
+    # ------------------------------------------------------------------
+    #  Camino asíncrono: concurrencia acotada, timeout y coalescencia
+    # ------------------------------------------------------------------
+    
+    def _async_state(self):
+        """Cliente y semáforo del event loop actual (se recrean si cambia el loop)"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+        return self._async_client, self._semaphore
+    
+    async def _call_async(self, client: "AsyncOpenAI", semaphore: asyncio.Semaphore,
+                          key: str, messages: List[Dict]) -> str:
+        async with semaphore:
+            self.metrics["requests"] += 1
+            try:
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=self.max_tokens,
+                        temperature=TEMPERATURE,
+                        response_format={"type": "json_object"}
+                    ),
+                    timeout=self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.metrics["timeouts"] += 1
+                raise TimeoutError(f"OpenAI no respondió en {self.timeout:.0f}s")
+            except Exception:
+                self.metrics["errors"] += 1
+                raise
+        content = response.choices[0].message.content
+        await asyncio.to_thread(self._store, key, content)
+        return content
+    
+    async def _complete_async(self, messages: List[Dict], use_cache: bool = True) -> Tuple[str, bool]:
+        """
+        Primero ai_cache; si no hay entrada, una única petición por prompt
+        idéntico en vuelo: las llamadas concurrentes con la misma clave
+        esperan el mismo resultado. Devuelve (contenido, cacheado).
+        """
+        client, semaphore = self._async_state()
+        key = cache_key(self.model, messages, TEMPERATURE)
+        # ai_cache es SQLite síncrono: fuera del event loop
+        cached = await asyncio.to_thread(self._cached, key, use_cache)
+        if cached is not None:
+            return cached, True
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_async(client, semaphore, key, messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.metrics["coalesced"] += 1
+        
+        # shield: si un cliente se desconecta no se cancela la petición compartida
+        return await asyncio.shield(task), False
+    
+    async def analyze_strategy_with_ai_async(self, trading_data: Dict, use_cache: bool = True) -> Dict:
+        """Versión asíncrona de analyze_strategy_with_ai"""
+        if not self.enabled:
+            return self._fallback_analysis(trading_data)
+        
+        try:
+            content, cached = await self._complete_async(self._strategy_analysis_messages(trading_data), use_cache)
+            return self._parse_strategy_analysis(content, cached)
+        except Exception as e:
+            print(f"⚠️ Error en análisis con OpenAI: {e}")
+            return self._fallback_analysis(trading_data)
+    
+    async def optimize_parameters_with_ai_async(self, strategy_data: Dict, current_performance: Dict,
+                                                use_cache: bool = True) -> Dict:
+        """Versión asíncrona de optimize_parameters_with_ai"""
+        if not self.enabled:
+            return self._fallback_optimization()
+        
+        try:
+            content, cached = await self._complete_async(
+                self._optimization_messages(strategy_data, current_performance), use_cache
             )
-            
-            optimization = json.loads(response.choices[0].message.content)
-            
-            return {
-                "optimized_parameters": optimization.get("optimized_parameters", {}),
-                "expected_improvement": optimization.get("expected_improvement", ""),
-                "reasoning": optimization.get("reasoning", ""),
-                "risk_assessment": optimization.get("risk_assessment", ""),
-                "implementation_steps": optimization.get("implementation_steps", []),
-                "warnings": optimization.get("warnings", []),
-                "ai_powered": True,
-                "optimization_timestamp": datetime.utcnow().isoformat()
-            }
-            
+            return self._parse_optimization(content, cached)
         except Exception as e:
             print(f"⚠️ Error en optimización con OpenAI: {e}")
             return self._fallback_optimization()
     
-    def _build_strategy_analysis_prompt(self, summary: Dict, trades: List, historical_metrics: Dict) -> str:
-        """Construye el prompt para análisis de estrategia"""
+    async def optimize_parameters_stream(self, strategy_data: Dict, current_performance: Dict,
+                                         use_cache: bool = True) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Versión en streaming de optimize_parameters_with_ai: consume los tokens
+        de la respuesta y emite cada campo en cuanto se completa.
+        Eventos: ("delta", {field, text}) con el texto nuevo de un campo string,
+        ("item", {field, key, value}) por cada parámetro o advertencia completa,
+        ("field", {field, value}) por campo completo, ("error", {error}) si la
+        llamada falla y siempre un ("result", optimización) final.
+        Una respuesta cacheada se reproduce con los mismos eventos.
+        """
+        if not self.enabled:
+            yield "result", self._fallback_optimization()
+            return
+        
+        messages = self._optimization_messages(strategy_data, current_performance)
+        key = cache_key(self.model, messages, TEMPERATURE)
+        parser = JSONFieldStream()
+        try:
+            cached = await asyncio.to_thread(self._cached, key, use_cache)
+            if cached is not None:
+                for event in parser.feed(cached):
+                    yield self._stream_event(event)
+                yield "result", self._parse_optimization(cached, True)
+                return
+            
+            client, semaphore = self._async_state()
+            async with semaphore:
+                self.metrics["requests"] += 1
+                self.metrics["streams"] += 1
+                async for text in self._stream_completion(client, messages):
+                    for event in parser.feed(text):
+                        yield self._stream_event(event)
+            
+            await asyncio.to_thread(self._store, key, parser.buffer)
+            yield "result", self._parse_optimization(parser.buffer, False)
+        except Exception as e:
+            print(f"⚠️ Error en optimización (streaming) con OpenAI: {e}")
+            yield "error", {"error": str(e)}
+            yield "result", self._fallback_optimization()
+    
+    async def _stream_completion(self, client: "AsyncOpenAI", messages: List[Dict]) -> AsyncIterator[str]:
+        """Trozos de texto de la respuesta; OPENAI_TIMEOUT aplica a cada espera"""
+        try:
+            stream = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=self.max_tokens,
+                    temperature=TEMPERATURE,
+                    response_format={"type": "json_object"},
+                    stream=True
+                ),
+                timeout=self.timeout
+            )
+            chunks = stream.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise TimeoutError(f"OpenAI dejó de responder durante {self.timeout:.0f}s")
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+    
+    @staticmethod
+    def _stream_event(event: Tuple) -> Tuple[str, Dict]:
+        if event[0] == "delta":
+            return "delta", {"field": event[1], "text": event[2]}
+        if event[0] == "item":
+            return "item", {"field": event[1], "key": event[2], "value": event[3]}
+        return "field", {"field": event[1], "value": event[2]}
+    
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "client_ready": self._client is not None or self._async_client is not None,
+            "model": self.model,
+            "base_url": self.base_url,
+            "timeout_seconds": self.timeout,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            **self.metrics
+        }
+    
+    # ------------------------------------------------------------------
+    #  Prompts y respuestas
+    # ------------------------------------------------------------------
+    
+    def _strategy_analysis_messages(self, trading_data: Dict) -> List[Dict]:
+        prompt = self._build_strategy_analysis_prompt(trading_data)
+        return [
+            {"role": "system", "content": STRATEGY_ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _optimization_messages(self, strategy_data: Dict, current_performance: Dict) -> List[Dict]:
+        prompt = self._build_optimization_prompt(strategy_data, current_performance)
+        return [
+            {"role": "system", "content": OPTIMIZATION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parse_strategy_analysis(self, content: str, cached: bool = False) -> Dict:
+        ai_analysis = json.loads(content)
+        
+        return {
+            "strategy_name": ai_analysis.get("strategy_name", "Unknown Strategy"),
+            "strategy_description": ai_analysis.get("strategy_description", ""),
+            "confidence_score": ai_analysis.get("confidence_score", 0),
+            "indicators_detected": ai_analysis.get("indicators_detected", []),
+            "trading_style": ai_analysis.get("trading_style", ""),
+            "risk_profile": ai_analysis.get("risk_profile", ""),
+            "detailed_analysis": ai_analysis.get("detailed_analysis", ""),
+            "strengths": ai_analysis.get("strengths", []),
+            "weaknesses": ai_analysis.get("weaknesses", []),
+            "market_conditions": ai_analysis.get("market_conditions", ""),
+            "ai_powered": True,
+            "cached": cached,
+            "analysis_timestamp": datetime.utcnow().isoformat()
+        }
+    
+    def _parse_optimization(self, content: str, cached: bool = False) -> Dict:
+        optimization = json.loads(content)
+        
+        return {
+            "optimized_parameters": optimization.get("optimized_parameters", {}),
+            "expected_improvement": optimization.get("expected_improvement", ""),
+            "reasoning": optimization.get("reasoning", ""),
+            "risk_assessment": optimization.get("risk_assessment", ""),
+            "implementation_steps": optimization.get("implementation_steps", []),
+            "warnings": optimization.get("warnings", []),
+            "ai_powered": True,
+            "cached": cached,
+            "optimization_timestamp": datetime.utcnow().isoformat()
+        }
+    
+    def _build_strategy_analysis_prompt(self, trading_data: Dict) -> str:
+        """
+        Construye el prompt para análisis de estrategia. Las métricas se envían
+        como sketches de tamaño fijo (prompt_compactor) ajustados al
+        presupuesto de tokens del prompt
+        """
+        from prompt_compactor import compact_prompt, count_tokens, prompt_token_budget
+        
+        summary = trading_data.get("summary", {})
+        budget = prompt_token_budget(self.max_tokens) - count_tokens(STRATEGY_ANALYSIS_SYSTEM_PROMPT, self.model)
+        
+        def render(sketches: Dict) -> str:
+            return self._strategy_analysis_template(summary, sketches)
+        
+        prompt, info = compact_prompt(trading_data, render, budget, self.model)
+        self.metrics["last_prompt_tokens"] = info["tokens"]
+        self.metrics["last_prompt_level"] = info["level"]
+        return prompt
+    
+    def _strategy_analysis_template(self, summary: Dict, sketches: Dict) -> str:
+        from prompt_compactor import render_section
         
         prompt = f"""Analiza esta estrategia de trading basándote en los siguientes datos:
 
@@ -137,13 +404,14 @@ class OpenAIAnalyzer:
 - Sharpe Ratio: {summary.get('sharpe_ratio', 0):.2f}
 - Timeframe detectado: {summary.get('timeframe', 'N/A')}
 
-**MÉTRICAS HISTÓRICAS:**
-{json.dumps(historical_metrics, indent=2) if historical_metrics else "No disponibles"}
+**MÉTRICAS HISTÓRICAS (resumen estadístico):**
+{render_section(sketches["historical"])}
 
-**PATRONES DE TRADING DETECTADOS:**
-- Ratio BUY/SELL: {self._calculate_buy_sell_ratio(trades)}
-- Símbolos operados: {self._get_unique_symbols(trades)}
-- Distribución de profits: {self._get_profit_distribution(trades)}
+**POSICIONES ABIERTAS (lado, cuantiles de profit, top-k por símbolo):**
+{render_section(sketches["open_positions"])}
+
+**RENDIMIENTO POR SÍMBOLO (mejores/peores):**
+{render_section(sketches["symbols"])}
 
 **INSTRUCCIONES:**
 Proporciona un análisis profesional en formato JSON con esta estructura:
@@ -205,35 +473,6 @@ Enfócate en mejoras realistas y seguras, priorizando la gestión de riesgo."""
 
         return prompt
     
-    def _calculate_buy_sell_ratio(self, trades: List) -> str:
-        """Calcula ratio de órdenes BUY vs SELL"""
-        if not trades:
-            return "N/A"
-        
-        buy_count = sum(1 for t in trades if t.get('type') == 'BUY')
-        sell_count = len(trades) - buy_count
-        return f"{buy_count} BUY / {sell_count} SELL"
-    
-    def _get_unique_symbols(self, trades: List) -> List[str]:
-        """Obtiene lista de símbolos únicos"""
-        if not trades:
-            return []
-        
-        symbols = list(set(t.get('symbol', '') for t in trades))
-        return symbols[:5]  # Primeros 5 símbolos
-    
-    def _get_profit_distribution(self, trades: List) -> str:
-        """Calcula distribución de profits"""
-        if not trades:
-            return "N/A"
-        
-        profits = [t.get('profit', 0) for t in trades]
-        positive = sum(1 for p in profits if p > 0)
-        negative = sum(1 for p in profits if p < 0)
-        neutral = sum(1 for p in profits if p == 0)
-        
-        return f"{positive} wins / {negative} losses / {neutral} neutral"
-    
     def _fallback_analysis(self, trading_data: Dict) -> Dict:
         """Análisis básico cuando OpenAI no está disponible"""
         summary = trading_data.get("summary", {})
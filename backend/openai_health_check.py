@@ -1,10 +1,15 @@
 """
 OpenAI Health Check Module
-Valida la conectividad y disponibilidad del API de OpenAI antes de arrancar el backend
+Valida la conectividad y disponibilidad del API de OpenAI. La API no bloquea su
+arranque con el ping: OpenAIHealthProbe lo lanza en segundo plano y guarda el
+último estado, que /health devuelve sin llamar a la red.
 """
 
 import os
-from openai import OpenAI
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
 from dotenv import load_dotenv
 import sys
 
@@ -38,7 +43,9 @@ def test_openai_connection() -> dict:
     
     # Caso 2: Validar conexión
     try:
-        client = OpenAI(api_key=api_key)
+        from openai import OpenAI
+        
+        client = OpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
         model = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
         
         # Hacer una petición mínima para validar
@@ -96,12 +103,18 @@ def validate_openai_or_exit(allow_continue: bool = True) -> dict:
         dict: Resultado del health check
     """
     
+    result = test_openai_connection()
+    print_openai_status(result, allow_continue)
+    
+    return result
+
+
+def print_openai_status(result: dict, allow_continue: bool = True):
+    """Imprime el resultado del health check (y sale si allow_continue=False)"""
     print("\n" + "="*60)
     print("🔍 VALIDANDO OPENAI API...")
     print("="*60)
     
-    result = test_openai_connection()
-    
     print(result["message"])
     
     if result["available"]:
@@ -123,8 +136,78 @@ def validate_openai_or_exit(allow_continue: bool = True) -> dict:
             print("✅ Análisis básico: HABILITADO")
     
     print("="*60 + "\n")
+
+
+class OpenAIHealthProbe:
+    """
+    Health check de OpenAI en un hilo de fondo con el resultado cacheado.
+    status() nunca bloquea: devuelve "pending" hasta que termina el primer
+    ping y relanza el ping en segundo plano cuando el resultado supera ttl.
+    """
     
-    return result
+    def __init__(self, ttl_seconds: float = None, enabled: bool = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None \
+            else float(os.getenv("OPENAI_HEALTH_TTL", "600"))
+        self.enabled = enabled if enabled is not None \
+            else os.getenv("OPENAI_HEALTH_PROBE", "true").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Dict] = None
+        self._checked_at = 0.0
+    
+    def start(self) -> bool:
+        """Lanza el ping en segundo plano (no hace nada si ya hay uno en curso)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, name="openai-health", daemon=True)
+            self._thread.start()
+            return True
+    
+    def _run(self):
+        if not self.enabled:
+            result = {
+                "available": bool(os.getenv("OPENAI_API_KEY")),
+                "status": "skipped",
+                "message": "ℹ️ Health check de OpenAI desactivado (OPENAI_HEALTH_PROBE=false)",
+                "model": os.getenv("OPENAI_MODEL", "gpt-4-turbo"),
+                "api_key_prefix": "N/A"
+            }
+        else:
+            result = test_openai_connection()
+            print_openai_status(result)
+        with self._lock:
+            self._result = result
+            self._checked_at = time.time()
+    
+    def wait(self, timeout: float = None) -> Optional[Dict]:
+        """Espera al ping en curso (útil en scripts) y devuelve el estado"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.status(refresh=False)
+    
+    def status(self, refresh: bool = True) -> Dict:
+        with self._lock:
+            result = dict(self._result) if self._result else None
+            checked_at = self._checked_at
+        
+        if result is None:
+            if refresh and self._thread is None:
+                self.start()
+            return {"available": False, "status": "pending",
+                    "message": "⏳ Comprobando OpenAI en segundo plano", "checked_at": None}
+        
+        age = time.time() - checked_at
+        if refresh and self.enabled and age > self.ttl_seconds:
+            self.start()
+        result["checked_at"] = datetime.fromtimestamp(checked_at).isoformat()
+        result["age_seconds"] = round(age, 1)
+        return result
+
+
+# Instancia global
+openai_health = OpenAIHealthProbe()
 
 
 # Para testing directo
@@ -0,0 +1,474 @@
+"""
+Parameter Optimizer
+Optimización local y determinista de los parámetros de las plantillas
+(grid_step, lot_size, take_profit, stop_loss...) sobre el backtester, como
+alternativa a pedirle a OpenAI que los adivine (/strategy/optimize).
+
+Métodos de búsqueda:
+- grid: todas las combinaciones del espacio
+- random: `samples` combinaciones distintas al azar (semilla fija)
+- halving: successive halving; las combinaciones distintas sin contar el lote
+  de `samples` se evalúan sobre las barras más recientes y en cada ronda solo
+  el mejor 1/eta pasa a una ventana eta veces mayor, hasta la ventana completa.
+  Las rondas parciales comparan todas con el mismo lote; la última evalúa cada
+  superviviente con todos los lotes
+
+Las evaluaciones se reparten en un pool de procesos (spawn, como
+multi_account). Las barras se copian una sola vez a memoria compartida
+(multiprocessing.shared_memory) y cada worker las lee sin copiarlas; a los
+workers solo viajan los parámetros y vuelven las métricas.
+
+lot_size solo escala el resultado (profit, equity, drawdown), así que cada
+combinación del resto de parámetros se simula una vez y se reescala para
+cada lote: añadir lotes al espacio no multiplica el número de backtests.
+"""
+
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backtester import STRATEGIES, backtest_metrics, run_backtest
+
+SEARCH_METHODS = ("grid", "random", "halving")
+OBJECTIVES = ("profit_factor", "net_profit", "recovery_factor")
+
+# Espacios de búsqueda por defecto (distancias en puntos)
+DEFAULT_SPACES = {
+    "grid": {
+        "grid_step": [20, 30, 50, 75, 100, 150, 200],
+        "take_profit": [10, 20, 30, 50, 75, 100, 150],
+        "stop_loss": [30, 50, 100, 150, 200, 300],
+        "lot_size": [0.01, 0.02, 0.05, 0.1]
+    },
+    "ma_cross": {
+        "ma_fast": [10, 20, 50, 100],
+        "ma_slow": [100, 200, 300],
+        "take_profit": [50, 100, 200, 300, 500],
+        "stop_loss": [50, 100, 200, 300],
+        "lot_size": [0.01, 0.02, 0.05, 0.1]
+    }
+}
+
+# Métricas de cada evaluación que se devuelven en el ranking
+RESULT_METRICS = ("total_trades", "win_rate", "profit_factor", "total_profit", "max_drawdown",
+                  "max_drawdown_pct", "return_pct", "avg_duration_minutes")
+
+# Filas del bloque de memoria compartida (float64; time en epoch s es exacto)
+RATE_ROWS = ("time", "high", "low", "close")
+
+# Estado del proceso worker: barras compartidas y contexto del backtest
+_worker: Dict = {}
+
+
+# ---------------------------------------------------------------------------
+#  Espacio de búsqueda
+# ---------------------------------------------------------------------------
+
+def _axis_values(name: str, spec) -> List:
+    """Valores de un parámetro: lista explícita o {"min", "max", "step"}"""
+    if isinstance(spec, dict):
+        if not all(k in spec for k in ("min", "max", "step")) or spec["step"] <= 0:
+            raise ValueError(f"Rango inválido para {name}: se espera {{min, max, step > 0}}")
+        values = np.round(np.arange(spec["min"], spec["max"] + spec["step"] / 2, spec["step"]), 10).tolist()
+    else:
+        values = list(spec) if isinstance(spec, (list, tuple)) else [spec]
+    values = [int(v) if float(v).is_integer() and name != "lot_size" else float(v) for v in values]
+    if not values:
+        raise ValueError(f"Sin valores para {name}")
+    return sorted(set(values))
+
+
+def build_space(kind: str, space: Dict = None) -> Dict[str, List]:
+    """Espacio de búsqueda validado: los ejes de `space` sustituyen a los de DEFAULT_SPACES"""
+    defaults = STRATEGIES[kind][1]
+    unknown = [name for name in (space or {}) if name not in defaults]
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos para {kind}: {unknown} (disponibles: {list(defaults)})")
+    merged = {**DEFAULT_SPACES[kind], **(space or {})}
+    return {name: _axis_values(name, values) for name, values in merged.items()}
+
+
+def _valid(kind: str, params: Dict) -> bool:
+    if any(params.get(name, 1) <= 0 for name in ("grid_step", "take_profit", "stop_loss", "lot_size")):
+        return False
+    if kind == "ma_cross" and params.get("ma_fast", 0) >= params.get("ma_slow", math.inf):
+        return False
+    return True
+
+
+def grid_configs(kind: str, space: Dict[str, List]) -> List[Dict]:
+    names = list(space)
+    configs = (dict(zip(names, values)) for values in itertools.product(*space.values()))
+    return [config for config in configs if _valid(kind, config)]
+
+
+def random_configs(kind: str, space: Dict[str, List], samples: int, seed: int = 42) -> List[Dict]:
+    """`samples` combinaciones válidas distintas (todas si el espacio es menor)"""
+    total = math.prod(len(values) for values in space.values())
+    if samples >= total:
+        return grid_configs(kind, space)
+
+    rng = np.random.default_rng(seed)
+    names = list(space)
+    seen, configs = set(), []
+    # Límite de intentos para espacios con muchas combinaciones inválidas
+    for _ in range(samples * 50):
+        indexes = tuple(int(rng.integers(len(space[name]))) for name in names)
+        if indexes in seen:
+            continue
+        seen.add(indexes)
+        config = {name: space[name][i] for name, i in zip(names, indexes)}
+        if _valid(kind, config):
+            configs.append(config)
+            if len(configs) == samples:
+                break
+    return configs
+
+
+def halving_schedule(n_configs: int, bars: int, eta: int = 3, min_bars: int = 2000) -> List[Tuple[int, int]]:
+    """
+    Rondas de successive halving: [(configuraciones, barras)]. La última ronda
+    usa todas las barras y cada ronda anterior eta veces menos combinaciones
+    más y eta veces menos barras, sin bajar de min_bars
+    """
+    rounds = max(0, math.ceil(math.log(max(n_configs, 1), eta)) - 1)
+    while rounds > 0 and bars // eta ** rounds < min_bars:
+        rounds -= 1
+    schedule = []
+    configs = n_configs
+    for rung in range(rounds, -1, -1):
+        schedule.append((configs, max(bars // eta ** rung, min(min_bars, bars))))
+        configs = max(1, math.ceil(configs / eta))
+    return schedule
+
+
+# ---------------------------------------------------------------------------
+#  Ranking
+# ---------------------------------------------------------------------------
+
+def score(metrics: Dict, objective: str) -> float:
+    if objective == "net_profit":
+        return metrics["total_profit"]
+    if objective == "recovery_factor":
+        drawdown = metrics["max_drawdown"]
+        return metrics["total_profit"] / drawdown if drawdown > 0 else metrics["total_profit"]
+    return metrics["profit_factor"]
+
+
+def rank_results(results: List[Dict], objective: str = "profit_factor", min_trades: int = 30,
+                 max_drawdown_pct: float = None) -> List[Dict]:
+    """
+    Ordena por el objetivo (desempate: menor drawdown y después los
+    parámetros, para que el orden no dependa de qué worker terminó antes).
+    Las combinaciones con menos de `min_trades` trades o más drawdown del
+    permitido quedan al final, marcadas eligible = False
+    """
+    for result in results:
+        metrics = result["metrics"]
+        result["score"] = round(float(score(metrics, objective)), 6)
+        result["eligible"] = metrics["total_trades"] >= min_trades and (
+            max_drawdown_pct is None or metrics["max_drawdown_pct"] <= max_drawdown_pct)
+    return sorted(results, key=lambda r: (not r["eligible"], -r["score"], r["metrics"]["max_drawdown"],
+                                          sorted(r["params"].items())))
+
+
+# ---------------------------------------------------------------------------
+#  Worker (proceso hijo)
+# ---------------------------------------------------------------------------
+
+def _share_rates(rates) -> shared_memory.SharedMemory:
+    """Copia time/high/low/close a un bloque de memoria compartida (4 x n float64)"""
+    n = len(rates["close"])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(RATE_ROWS) * n * 8))
+    block = np.ndarray((len(RATE_ROWS), n), dtype=np.float64, buffer=shm.buf)
+    for row, column in enumerate(RATE_ROWS):
+        block[row] = rates[column]
+    return shm
+
+
+def _init_worker(shm_name: str, n: int, kind: str, spec: Dict, initial_balance: float):
+    """Inicializador del pool: vista de las barras compartidas (sin copia, salvo time)"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(RATE_ROWS), n), dtype=np.float64, buffer=shm.buf)
+    _worker.update(
+        shm=shm,
+        rates={"time": block[0].astype(np.int64), "high": block[1], "low": block[2], "close": block[3]},
+        kind=kind,
+        spec=spec,
+        initial_balance=initial_balance
+    )
+
+
+def evaluate(base: Dict, lot_sizes: List[float], bars: int = None) -> List[Dict]:
+    """
+    Tarea del worker: un backtest de `base` sobre las últimas `bars` barras y
+    sus métricas para cada lote de `lot_sizes` (reescalando el resultado)
+    """
+    rates = _worker["rates"]
+    if bars is not None and bars < len(rates["close"]):
+        rates = {column: values[-bars:] for column, values in rates.items()}
+    spec, balance = _worker["spec"], _worker["initial_balance"]
+    result = run_backtest(_worker["kind"], rates, {**base, "lot_size": lot_sizes[0]}, spec["point"],
+                          spec["contract_size"], spec["spread"], balance)
+
+    evaluations = []
+    for lot_size in lot_sizes:
+        if lot_size == lot_sizes[0]:
+            metrics = result["metrics"]
+        else:
+            factor = lot_size / lot_sizes[0]
+            trades = result["trades"].assign(profit=result["trades"]["profit"] * factor,
+                                             volume=result["trades"]["volume"] * factor)
+            equity = balance + (result["equity"] - balance) * factor
+            metrics = backtest_metrics(trades, equity, balance)
+        evaluations.append({
+            "params": {**result["params"], "lot_size": lot_size},
+            "metrics": {name: metrics[name] for name in RESULT_METRICS}
+        })
+    return evaluations
+
+
+def _base(params: Dict) -> Dict:
+    return {k: v for k, v in params.items() if k != "lot_size"}
+
+
+def _tasks(configs: List[Dict]) -> List[Tuple[Dict, List[float]]]:
+    """Agrupa las combinaciones que solo difieren en lot_size en una única tarea"""
+    groups: "OrderedDict[tuple, Tuple[Dict, List[float]]]" = OrderedDict()
+    for config in configs:
+        base = _base(config)
+        key = tuple(sorted(base.items()))
+        groups.setdefault(key, (base, []))[1].append(config.get("lot_size"))
+    return [(base, sorted(set(lots))) for base, lots in groups.values()]
+
+
+# ---------------------------------------------------------------------------
+#  Runner
+# ---------------------------------------------------------------------------
+
+class ParameterOptimizer:
+    def __init__(self, workers: int = None, max_evaluations: int = None, max_runs: int = 20):
+        """
+        Args:
+            workers: procesos del pool (OPTIMIZER_WORKERS, por defecto núcleos - 1)
+            max_evaluations: tope de combinaciones por ejecución (OPTIMIZER_MAX_EVALUATIONS,
+                             por defecto 5000); una búsqueda grid mayor se rechaza
+            max_runs: ejecuciones que se conservan en memoria
+        """
+        self.workers = workers if workers is not None \
+            else int(os.getenv("OPTIMIZER_WORKERS") or max(1, (os.cpu_count() or 2) - 1))
+        self.max_evaluations = max_evaluations if max_evaluations is not None \
+            else int(os.getenv("OPTIMIZER_MAX_EVALUATIONS", "5000"))
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cancel: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        # Una ejecución a la vez: cada una abre su propio pool de procesos
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="optimizer")
+
+    def _plan(self, kind: str, method: str, space: Dict, samples: int, seed: int) -> List[Dict]:
+        if kind not in STRATEGIES:
+            raise ValueError(f"Estrategia sin backtest: {kind} (disponibles: {list(STRATEGIES)})")
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Método no soportado: {method} (disponibles: {list(SEARCH_METHODS)})")
+        space = build_space(kind, space)
+        if method == "grid":
+            configs = grid_configs(kind, space)
+            if len(configs) > self.max_evaluations:
+                raise ValueError(f"El grid tiene {len(configs)} combinaciones (máximo {self.max_evaluations}): "
+                                 "reduce el espacio o usa method=random / halving")
+        else:
+            configs = random_configs(kind, space, min(samples, self.max_evaluations), seed)
+        if not configs:
+            raise ValueError("El espacio de búsqueda no tiene combinaciones válidas")
+        return configs
+
+    def _new_run(self, kind: str, method: str, configs: List[Dict], bars: int, options: Dict) -> Dict:
+        if method == "halving":
+            # Rondas sobre combinaciones sin lote; la última, con todos los lotes
+            lots = len({config.get("lot_size") for config in configs})
+            schedule = halving_schedule(len(_tasks(configs)), bars, options["eta"])
+            rungs = [{"configs": n, "evaluations": n * lots if i == len(schedule) - 1 else n, "bars": b}
+                     for i, (n, b) in enumerate(schedule)]
+        else:
+            rungs = [{"configs": len(configs), "evaluations": len(configs), "bars": bars}]
+        run = {
+            "run_id": uuid.uuid4().hex[:12],
+            "status": "pending",
+            "strategy": kind,
+            "method": method,
+            **{k: v for k, v in options.items() if k != "top"},
+            "workers": self.workers,
+            "bars": bars,
+            "configs": len(configs),
+            "evaluations_total": sum(rung["evaluations"] for rung in rungs),
+            "evaluations_done": 0,
+            "backtests": 0,
+            "rungs": [{"rung": i, **rung, "done": 0} for i, rung in enumerate(rungs)],
+            "best": None,
+            "ranking": [],
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_seconds": None,
+            "error": None
+        }
+        with self._lock:
+            self._runs[run["run_id"]] = run
+            self._cancel[run["run_id"]] = threading.Event()
+            while len(self._runs) > self.max_runs:
+                old_id, _ = self._runs.popitem(last=False)
+                self._cancel.pop(old_id, None)
+        return run
+
+    def _prepare(self, kind, rates, method, space, samples, seed, objective, min_trades,
+                 max_drawdown_pct, eta, top, initial_balance):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Objetivo no soportado: {objective} (disponibles: {list(OBJECTIVES)})")
+        if len(rates["close"]) < 2:
+            raise ValueError("No hay barras suficientes para el backtest")
+        configs = self._plan(kind, method, space, samples, seed)
+        options = {"objective": objective, "min_trades": min_trades, "max_drawdown_pct": max_drawdown_pct,
+                   "eta": max(2, int(eta)), "seed": seed, "top": top, "initial_balance": initial_balance}
+        return configs, options
+
+    def run(self, kind: str, rates, spec: Dict, method: str = "random", space: Dict = None,
+            samples: int = 100, seed: int = 42, objective: str = "profit_factor", min_trades: int = 30,
+            max_drawdown_pct: float = None, eta: int = 3, top: int = 20,
+            initial_balance: float = 10_000.0) -> Dict:
+        """Ejecuta la búsqueda y devuelve el resultado (bloqueante)"""
+        configs, options = self._prepare(kind, rates, method, space, samples, seed, objective, min_trades,
+                                         max_drawdown_pct, eta, top, initial_balance)
+        run = self._new_run(kind, method, configs, len(rates["close"]), options)
+        self._execute(run, rates, spec, configs, top)
+        return self.get_run(run["run_id"])
+
+    def submit(self, kind: str, rates, spec: Dict, method: str = "random", space: Dict = None,
+               samples: int = 100, seed: int = 42, objective: str = "profit_factor", min_trades: int = 30,
+               max_drawdown_pct: float = None, eta: int = 3, top: int = 20,
+               initial_balance: float = 10_000.0) -> Dict:
+        """Encola la búsqueda en segundo plano y devuelve su estado inicial"""
+        configs, options = self._prepare(kind, rates, method, space, samples, seed, objective, min_trades,
+                                         max_drawdown_pct, eta, top, initial_balance)
+        run = self._new_run(kind, method, configs, len(rates["close"]), options)
+        self._executor.submit(self._execute, run, rates, spec, configs, top)
+        return self.get_run(run["run_id"])
+
+    def _execute(self, run: Dict, rates, spec: Dict, configs: List[Dict], top: int):
+        cancel = self._cancel[run["run_id"]]
+        if cancel.is_set():
+            # Cancelada mientras esperaba en la cola
+            run["status"] = "cancelled"
+            run["finished_at"] = datetime.now().isoformat()
+            return
+
+        run["status"] = "running"
+        run["started_at"] = datetime.now().isoformat()
+        started = time.perf_counter()
+        shm = None
+        try:
+            shm = _share_rates(rates)
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(shm.name, len(rates["close"]), run["strategy"], spec,
+                                               run["initial_balance"])) as pool:
+                tasks = _tasks(configs)
+                lots = sorted({lot for _, task_lots in tasks for lot in task_lots})
+                for rung in run["rungs"]:
+                    last = rung is run["rungs"][-1]
+                    if run["method"] == "halving":
+                        # Rondas parciales con un lote común para comparar; la última con todos
+                        tasks = [(base, lots if last else lots[:1]) for base, _ in tasks[:rung["configs"]]]
+                    results = self._evaluate_rung(pool, run, rung, tasks, cancel)
+                    # En rondas parciales el mínimo de trades es proporcional a la ventana
+                    min_trades = run["min_trades"] if last \
+                        else math.ceil(run["min_trades"] * rung["bars"] / run["bars"])
+                    ranked = rank_results(results, run["objective"], min_trades, run["max_drawdown_pct"])
+                    if ranked:
+                        run["best"] = {**ranked[0], "rung": rung["rung"]}
+                    if cancel.is_set() or last:
+                        run["ranking"] = ranked[:top]
+                        break
+                    # Un resultado por combinación: pasan combinaciones distintas
+                    tasks = [(_base(result["params"]), lots) for result in ranked]
+
+            run["status"] = "cancelled" if cancel.is_set() else "completed"
+        except Exception as e:
+            print(f"❌ Error en la optimización {run['run_id']}: {e}")
+            run["status"] = "failed"
+            run["error"] = str(e)
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            run["finished_at"] = datetime.now().isoformat()
+            run["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+    def _evaluate_rung(self, pool, run: Dict, rung: Dict, tasks: List[Tuple[Dict, List[float]]],
+                       cancel: threading.Event) -> List[Dict]:
+        bars = rung["bars"] if rung["bars"] < run["bars"] else None
+        futures = [pool.submit(evaluate, base, lots, bars) for base, lots in tasks]
+        results = []
+        for future in as_completed(futures):
+            if cancel.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+            try:
+                evaluations = future.result()
+            except Exception as e:
+                # p. ej. un worker que murió: el resto de la ronda sigue
+                print(f"⚠️ Evaluación fallida en la optimización {run['run_id']}: {e}")
+                continue
+            results.extend(evaluations)
+            rung["done"] += len(evaluations)
+            run["evaluations_done"] += len(evaluations)
+            run["backtests"] += 1
+        return results
+
+    def cancel(self, run_id: str) -> Optional[Dict]:
+        """Detiene la ejecución; conserva el ranking de lo ya evaluado"""
+        event = self._cancel.get(run_id)
+        if event is None:
+            return None
+        event.set()
+        return self.get_run(run_id)
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        run = self._runs.get(run_id)
+        return dict(run) if run else None
+
+    def list_runs(self, limit: int = 20) -> List[Dict]:
+        """Ejecuciones recientes, sin el ranking completo"""
+        with self._lock:
+            runs = list(self._runs.values())[-limit:]
+        return [{k: v for k, v in run.items() if k != "ranking"} for run in reversed(runs)]
+
+    def status(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "max_evaluations": self.max_evaluations,
+            "runs": len(self._runs),
+            "running": sum(1 for run in self._runs.values() if run["status"] == "running")
+        }
+
+    def shutdown(self):
+        """Cancela las ejecuciones en curso y en cola (hook de apagado de la API)"""
+        for event in list(self._cancel.values()):
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instancia global
+parameter_optimizer = ParameterOptimizer()
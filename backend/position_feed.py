@@ -0,0 +1,192 @@
+"""
+Position Feed
+Hub de posiciones abiertas en tiempo real para /ws/positions. Un único bucle
+sondea mt5.positions_get() mientras haya clientes conectados, compara una
+huella del conjunto de posiciones con la anterior y solo si cambia reparte a
+todos los clientes las posiciones añadidas, cerradas y modificadas, junto con
+el P&L agregado. Así N pestañas del dashboard cuestan un sondeo, no N
+ejecuciones de /analyze.
+
+Mensajes (JSON):
+    {"type": "snapshot", "seq", "positions": [...], "summary": {...}}   al conectar
+    {"type": "diff", "seq", "added": [...], "removed": [tickets], "changed": [...], "summary": {...}}
+    {"type": "error", "error"}                                          si falla MT5
+"""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from mt5_session import mt5_session
+
+# Campos de cada posición que se envían (y cuyo cambio genera un diff)
+POSITION_FIELDS = ("ticket", "symbol", "type", "volume", "price_open", "price_current",
+                   "sl", "tp", "swap", "profit", "time")
+
+
+def _position_record(position) -> Dict:
+    return {
+        "ticket": int(position.ticket),
+        "symbol": position.symbol,
+        "type": "BUY" if position.type == 0 else "SELL",
+        "volume": float(position.volume),
+        "price_open": float(position.price_open),
+        "price_current": float(position.price_current),
+        "sl": float(position.sl),
+        "tp": float(position.tp),
+        "swap": float(position.swap),
+        "profit": float(position.profit),
+        "time": datetime.fromtimestamp(int(position.time), timezone.utc).replace(tzinfo=None).isoformat()
+    }
+
+
+def _summary(positions: Dict[int, Dict]) -> Dict:
+    by_symbol: Dict[str, float] = {}
+    for position in positions.values():
+        by_symbol[position["symbol"]] = by_symbol.get(position["symbol"], 0.0) + position["profit"]
+    return {
+        "positions": len(positions),
+        "floating_profit": round(sum(p["profit"] for p in positions.values()), 2),
+        "volume": round(sum(p["volume"] for p in positions.values()), 2),
+        "by_symbol": {symbol: round(profit, 2) for symbol, profit in by_symbol.items()}
+    }
+
+
+class PositionFeed:
+    def __init__(self, interval: float = None, queue_size: int = 100):
+        """
+        Args:
+            interval: segundos entre sondeos de MT5 (POSITIONS_POLL_INTERVAL, por defecto 1)
+            queue_size: mensajes pendientes por cliente; si un cliente lento la
+                        llena, su cola se vacía y recibe un snapshot nuevo
+        """
+        self.interval = interval if interval is not None \
+            else float(os.getenv("POSITIONS_POLL_INTERVAL", "1"))
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._positions: Dict[int, Dict] = {}
+        self._fingerprint = None
+        self._polled = False
+        self._error: Optional[str] = None
+        self._seq = 0
+        self.polls = 0
+        self.diffs = 0
+
+    def _read_positions(self) -> Dict[int, Dict]:
+        """Lectura síncrona (en el threadpool) a través de la sesión MT5 compartida"""
+        with mt5_session.session() as mt5:
+            positions = mt5.positions_get() or ()
+        return {int(p.ticket): _position_record(p) for p in positions}
+
+    def _snapshot(self) -> Dict:
+        return {
+            "type": "snapshot",
+            "seq": self._seq,
+            "time": datetime.utcnow().isoformat(),
+            "positions": list(self._positions.values()),
+            "summary": _summary(self._positions)
+        }
+
+    def _diff(self, positions: Dict[int, Dict]) -> Optional[Dict]:
+        """Diff con el estado anterior, o None si la huella no cambió"""
+        fingerprint = hash(tuple(tuple(p[f] for f in POSITION_FIELDS) for p in positions.values()))
+        if fingerprint == self._fingerprint:
+            return None
+
+        previous = self._positions
+        added = [p for ticket, p in positions.items() if ticket not in previous]
+        removed = [ticket for ticket in previous if ticket not in positions]
+        changed = [p for ticket, p in positions.items() if ticket in previous and previous[ticket] != p]
+
+        self._fingerprint = fingerprint
+        self._positions = positions
+        if not (added or removed or changed):
+            return None
+
+        self._seq += 1
+        summary = _summary(positions)
+        summary["profit_delta"] = round(summary["floating_profit"] - _summary(previous)["floating_profit"], 2)
+        return {
+            "type": "diff",
+            "seq": self._seq,
+            "time": datetime.utcnow().isoformat(),
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "summary": summary
+        }
+
+    def _broadcast(self, message: Dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Cliente lento: descartar lo pendiente y resincronizar
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._snapshot())
+
+    async def _poll_once(self):
+        try:
+            positions = await asyncio.to_thread(self._read_positions)
+        except Exception as e:
+            if self._error != str(e):
+                self._error = str(e)
+                self._broadcast({"type": "error", "error": self._error})
+            return
+
+        self.polls += 1
+        self._polled = True
+        self._error = None
+        message = self._diff(positions)
+        if message is not None:
+            self.diffs += 1
+            self._broadcast(message)
+
+    async def _poll_loop(self):
+        while self._subscribers:
+            await self._poll_once()
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self) -> asyncio.Queue:
+        """Registra un cliente; su cola empieza con un snapshot del estado actual"""
+        if not self._polled:
+            await self._poll_once()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait({"type": "error", "error": self._error} if self._error else self._snapshot())
+        self._subscribers.add(queue)
+
+        # El sondeo solo corre mientras haya clientes
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers:
+            # Sin clientes el estado puede quedar obsoleto: el próximo cliente vuelve a sondear
+            self._polled = False
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+    async def stop(self):
+        """Desconecta a todos los clientes (hook de apagado de la API)"""
+        for queue in list(self._subscribers):
+            self.unsubscribe(queue)
+
+    def stats(self) -> Dict:
+        return {
+            "clients": len(self._subscribers),
+            "interval": self.interval,
+            "polls": self.polls,
+            "diffs": self.diffs,
+            "positions": len(self._positions),
+            "last_error": self._error
+        }
+
+
+# Instancia global
+position_feed = PositionFeed()
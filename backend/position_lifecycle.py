@@ -0,0 +1,218 @@
+"""
+Position Lifecycle
+Reconstrucción vectorizada (NumPy/pandas) del ciclo de vida de cada posición a
+partir de sus deals, agrupando por position_id: entrada(s), salidas parciales
+y reversiones (entry = DEAL_ENTRY_INOUT). El resultado es una tabla compacta
+con una fila por posición (o por tramo, si la posición se revirtió) con
+apertura y cierre, precios medios ponderados por volumen, tiempo de
+permanencia y P&L neto. Es la unidad de "trade" del resto de análisis.
+
+Convenciones de MT5:
+    type:  0 = BUY, 1 = SELL (el resto son balance, créditos... y se ignoran)
+    entry: 0 = IN, 1 = OUT, 2 = INOUT (reversión), 3 = OUT_BY (cierre por opuesta)
+
+Una reversión cierra el volumen abierto (su profit pertenece al tramo que
+cierra) y abre el sobrante en sentido contrario como un tramo nuevo (leg + 1)
+de la misma position_id.
+"""
+
+import numpy as np
+import pandas as pd
+
+ENTRY_IN, ENTRY_OUT, ENTRY_INOUT, ENTRY_OUT_BY = 0, 1, 2, 3
+
+POSITION_LIFECYCLE_COLUMNS = [
+    "position_id", "leg", "symbol", "type", "open_time", "close_time", "volume", "closed_volume",
+    "price_open", "price_close", "profit", "commission", "swap", "fee", "net_profit",
+    "entries", "exits", "status", "duration_minutes"
+]
+
+# Tolerancia para comparar volúmenes (lotes con decimales)
+VOLUME_EPS = 1e-8
+
+# Centinelas (ns) para "sin entrada" / "sin salida" en las reducciones min / max
+NAT = np.datetime64("NaT").astype(np.int64)
+NO_OPEN = np.iinfo(np.int64).max
+NO_CLOSE = NAT
+
+
+def _group_cumsum(values: np.ndarray, starts: np.ndarray, n: int) -> np.ndarray:
+    """Suma acumulada que se reinicia al comienzo de cada grupo (filas ya ordenadas por grupo)"""
+    cumulative = np.cumsum(values)
+    lengths = np.diff(np.append(starts, n))
+    base = np.repeat(cumulative[starts] - values[starts], lengths)
+    return cumulative - base
+
+
+def build_positions(deals_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabla de posiciones (POSITION_LIFECYCLE_COLUMNS) a partir de un DataFrame
+    de deals (formato de deal_store.get_deals / DealSource.get_deals).
+
+    - volume / price_open: volumen de entrada y su precio medio ponderado
+    - closed_volume / price_close: ídem para las salidas (parciales incluidas)
+    - profit: suma del profit de los deals; net_profit añade comisión, swap y fee
+    - status: "closed" si las salidas cubren el volumen de entrada, si no "open".
+      Una posición cuya entrada quedó fuera de la ventana aparece cerrada con
+      volume = 0, open_time = NaT y duración desconocida (NaN)
+    """
+    if deals_df is None or len(deals_df) == 0:
+        return pd.DataFrame(columns=POSITION_LIFECYCLE_COLUMNS)
+
+    deals = deals_df[(deals_df["type"] <= 1) & (deals_df["position_id"] > 0)]
+    if len(deals) == 0:
+        return pd.DataFrame(columns=POSITION_LIFECYCLE_COLUMNS)
+
+    position_id = deals["position_id"].to_numpy(dtype=np.int64)
+    times = deals["time"].to_numpy(dtype="datetime64[ns]")
+    tickets = deals["ticket"].to_numpy(dtype=np.int64)
+    if len(times) > 1 and ((times[1:] > times[:-1]) | ((times[1:] == times[:-1]) & (tickets[1:] > tickets[:-1]))).all():
+        # Ya en orden cronológico (deal_store, fuentes): basta un orden estable por posición
+        order = np.argsort(position_id, kind="stable")
+    else:
+        order = np.lexsort((tickets, times, position_id))
+
+    position_id = position_id[order]
+    times = times[order]
+    deal_type = deals["type"].to_numpy(dtype=np.int64)[order]
+    entry = deals["entry"].to_numpy(dtype=np.int64)[order]
+    volume = deals["volume"].to_numpy(dtype=float)[order]
+    price = deals["price"].to_numpy(dtype=float)[order]
+    symbol = deals["symbol"].to_numpy()[order]
+    money = {
+        column: (deals[column].to_numpy(dtype=float)[order] if column in deals
+                 else np.zeros(len(order)))
+        for column in ("profit", "commission", "swap", "fee")
+    }
+
+    n = len(order)
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    np.not_equal(position_id[1:], position_id[:-1], out=change[1:])
+    starts = np.flatnonzero(change)
+
+    # Volumen neto (con signo) de la posición tras cada deal y número de tramo
+    direction = np.where(deal_type == 0, 1.0, -1.0)
+    net_after = np.round(_group_cumsum(direction * volume, starts, n), 8)
+    net_before = np.round(net_after - direction * volume, 8)
+    is_inout = entry == ENTRY_INOUT
+    leg = _group_cumsum(is_inout.astype(np.int64), starts, n)
+
+    is_in = entry == ENTRY_IN
+    is_out = (entry == ENTRY_OUT) | (entry == ENTRY_OUT_BY) | is_inout
+    in_volume = np.where(is_in, volume, 0.0)
+    out_volume = np.where(is_inout, np.abs(net_before), np.where(is_out, volume, 0.0))
+    # Lado de la posición: el del deal en las entradas, el contrario en las salidas
+    side = np.where(is_in, direction, -direction)
+
+    # Cada deal aporta a su tramo; la reversión cierra el tramo anterior...
+    deal_leg = np.where(is_inout, leg - 1, leg)
+    time_ns = times.astype(np.int64)
+    rows = {
+        "position_id": position_id,
+        "leg": deal_leg,
+        "row": np.arange(n),
+        "side": side,
+        "open_time": np.where(is_in, time_ns, NO_OPEN),
+        "close_time": np.where(is_out, time_ns, NO_CLOSE),
+        "volume": in_volume,
+        "open_value": in_volume * price,
+        "closed_volume": out_volume,
+        "close_value": out_volume * price,
+        "entries": is_in.astype(np.int64),
+        "exits": is_out.astype(np.int64),
+        **money
+    }
+    # ...y abre el sobrante como entrada del tramo nuevo (filas añadidas y
+    # reordenadas para que cada tramo quede contiguo)
+    if is_inout.any():
+        reopened = np.abs(net_after[is_inout])
+        zeros = np.zeros(len(reopened))
+        extra = {
+            "position_id": position_id[is_inout],
+            "leg": leg[is_inout],
+            "row": np.flatnonzero(is_inout),
+            "side": np.sign(net_after[is_inout]),
+            "open_time": time_ns[is_inout],
+            "close_time": np.full(len(zeros), NO_CLOSE),
+            "volume": reopened,
+            "open_value": reopened * price[is_inout],
+            "closed_volume": zeros,
+            "close_value": zeros,
+            "entries": (reopened > VOLUME_EPS).astype(np.int64),
+            "exits": zeros.astype(np.int64),
+            **{column: zeros for column in money}
+        }
+        rows = {key: np.concatenate([rows[key], extra[key]]) for key in rows}
+        regroup = np.lexsort((rows["row"], rows["leg"], rows["position_id"]))
+        rows = {key: values[regroup] for key, values in rows.items()}
+
+    # Reducción por segmentos contiguos (position_id, leg)
+    key_change = np.empty(len(rows["leg"]), dtype=bool)
+    key_change[0] = True
+    key_change[1:] = (rows["position_id"][1:] != rows["position_id"][:-1]) | (rows["leg"][1:] != rows["leg"][:-1])
+    bounds = np.flatnonzero(key_change)
+
+    def total(column):
+        return np.add.reduceat(rows[column], bounds)
+
+    volume_in, volume_out = total("volume"), total("closed_volume")
+    entries, exits = total("entries"), total("exits")
+    open_time = np.minimum.reduceat(rows["open_time"], bounds)
+    close_time = np.maximum.reduceat(rows["close_time"], bounds)
+    closed = (exits > 0) & (volume_out >= volume_in - VOLUME_EPS)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        price_open = np.where(volume_in > 0, total("open_value") / volume_in, np.nan)
+        price_close = np.where(volume_out > 0, total("close_value") / volume_out, np.nan)
+
+    open_time = np.where(open_time == NO_OPEN, NAT, open_time).astype("datetime64[ns]")
+    close_time = np.where(closed & (close_time != NO_CLOSE), close_time, NAT).astype("datetime64[ns]")
+    profit, commission, swap, fee = (total(column) for column in ("profit", "commission", "swap", "fee"))
+
+    return pd.DataFrame({
+        "position_id": rows["position_id"][bounds],
+        "leg": rows["leg"][bounds],
+        "symbol": symbol[rows["row"][bounds]],
+        "type": np.where(rows["side"][bounds] > 0, "BUY", "SELL"),
+        "open_time": open_time,
+        "close_time": close_time,
+        "volume": volume_in,
+        "closed_volume": volume_out,
+        "price_open": price_open,
+        "price_close": price_close,
+        "profit": profit,
+        "commission": commission,
+        "swap": swap,
+        "fee": fee,
+        "net_profit": profit + commission + swap + fee,
+        "entries": entries,
+        "exits": exits,
+        "status": np.where(closed, "closed", "open"),
+        "duration_minutes": (close_time - open_time) / np.timedelta64(1, "m")
+    }, columns=POSITION_LIFECYCLE_COLUMNS)
+
+
+def closed_positions(positions: pd.DataFrame) -> pd.DataFrame:
+    """Posiciones cerradas en orden de cierre (la serie de trades para métricas y rachas)"""
+    closed = positions[positions["status"] == "closed"]
+    return closed.sort_values(["close_time", "position_id", "leg"], kind="stable")
+
+
+def max_concurrent_volume(positions: pd.DataFrame) -> float:
+    """
+    Mayor volumen abierto simultáneamente: barrido de aperturas (+volumen) y
+    cierres (-volumen) en orden temporal; a igual tiempo se cierra antes de abrir
+    """
+    known = positions[positions["open_time"].notna()]
+    if len(known) == 0:
+        return 0.0
+    volume = known["volume"].to_numpy(dtype=float)
+    closes = known["close_time"].notna().to_numpy()
+    times = np.concatenate([
+        known["open_time"].to_numpy(dtype="datetime64[ns]").astype(np.int64),
+        known["close_time"].to_numpy(dtype="datetime64[ns]")[closes].astype(np.int64)
+    ])
+    deltas = np.concatenate([volume, -volume[closes]])
+    order = np.lexsort((deltas, times))
+    return float(max(np.cumsum(deltas[order]).max(), 0.0))
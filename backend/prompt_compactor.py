@@ -0,0 +1,217 @@
+"""
+Prompt Compactor
+Resume los datos de trading en "sketches" estadísticos de tamaño fijo
+(cuantiles, histogramas de bins fijos y top-k por símbolo) en lugar de volcar
+las métricas completas en JSON, y ajusta el nivel de detalle hasta que el
+prompt cabe en el presupuesto de tokens.
+
+El conteo usa tiktoken si está instalado; si no, una aproximación de
+4 caracteres por token.
+"""
+
+import json
+import math
+import os
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Niveles de detalle, del más rico al más compacto
+COMPACTION_LEVELS = [
+    {"top_k": 5, "bins": 10, "histogram_keys": 8, "quantiles": QUANTILES},
+    {"top_k": 3, "bins": 6, "histogram_keys": 5, "quantiles": QUANTILES},
+    {"top_k": 2, "bins": 0, "histogram_keys": 3, "quantiles": (0.1, 0.5, 0.9)},
+    {"top_k": 1, "bins": 0, "histogram_keys": 0, "quantiles": ()},
+]
+
+_encoders: Dict[str, object] = {}
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Tokens del texto para el modelo (tiktoken) o aproximación chars/4"""
+    if tiktoken is None:
+        return math.ceil(len(text) / 4)
+
+    key = model or "default"
+    if key not in _encoders:
+        try:
+            _encoders[key] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            _encoders[key] = tiktoken.get_encoding("cl100k_base")
+    return len(_encoders[key].encode(text))
+
+
+def prompt_token_budget(max_tokens: int = None) -> int:
+    """
+    Tokens disponibles para el prompt: OPENAI_PROMPT_MAX_TOKENS o, por defecto,
+    el doble de OPENAI_MAX_TOKENS, sin exceder OPENAI_CONTEXT_WINDOW menos la
+    respuesta
+    """
+    if max_tokens is None:
+        max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+    context_window = int(os.getenv("OPENAI_CONTEXT_WINDOW", "128000"))
+    budget = int(os.getenv("OPENAI_PROMPT_MAX_TOKENS", str(2 * max_tokens)))
+    return max(256, min(budget, context_window - max_tokens))
+
+
+# ---------------------------------------------------------------------------
+#  Sketches
+# ---------------------------------------------------------------------------
+
+def _round(value: float, digits: int = 2) -> float:
+    return round(float(value), digits)
+
+
+def quantile_sketch(values: Sequence[float], quantiles: Sequence[float] = QUANTILES) -> Dict:
+    """Cuantiles, media y extremos (tamaño fijo, independiente de len(values))"""
+    data = np.asarray(values, dtype=float)
+    data = data[~np.isnan(data)]
+    if data.size == 0:
+        return {"n": 0}
+
+    sketch = {"n": int(data.size), "mean": _round(data.mean()), "min": _round(data.min()), "max": _round(data.max())}
+    if quantiles:
+        for q, value in zip(quantiles, np.quantile(data, quantiles)):
+            sketch[f"p{int(round(q * 100))}"] = _round(value)
+    return sketch
+
+
+def histogram_sketch(values: Sequence[float], bins: int = 10) -> Dict:
+    """Histograma de `bins` intervalos iguales: bordes y conteos"""
+    data = np.asarray(values, dtype=float)
+    data = data[~np.isnan(data)]
+    if data.size == 0 or bins <= 0:
+        return {}
+
+    counts, edges = np.histogram(data, bins=bins)
+    return {"edges": [_round(e) for e in edges], "counts": counts.tolist()}
+
+
+def profit_distribution(profits: Sequence[float], bins: int = 10) -> Dict:
+    """Sketch de la distribución de profits (cuantiles + histograma)"""
+    return {"quantiles": quantile_sketch(profits), "histogram": histogram_sketch(profits, bins)}
+
+
+def top_k_symbols(symbols: Dict[str, Dict], k: int, key: str = "total_profit") -> Dict:
+    """Los k mejores y k peores símbolos según `key`"""
+    if not symbols or k <= 0:
+        return {}
+
+    ranked = sorted(symbols.items(), key=lambda item: item[1].get(key, 0), reverse=True)
+
+    def compact(stats: Dict) -> Dict:
+        return {name: _round(value) if isinstance(value, float) else value for name, value in stats.items()}
+
+    best = ranked[:k]
+    worst = [item for item in ranked[::-1][:k] if item not in best]
+    return {
+        "symbols_total": len(symbols),
+        "best": {name: compact(stats) for name, stats in best},
+        "worst": {name: compact(stats) for name, stats in worst}
+    }
+
+
+def _truncate_histogram(histogram: Dict, keys: int) -> Dict:
+    """Conserva las `keys` longitudes más frecuentes de un histograma de rachas"""
+    if not histogram or keys <= 0:
+        return {}
+    top = sorted(histogram.items(), key=lambda item: item[1], reverse=True)[:keys]
+    return {str(length): count for length, count in sorted(top, key=lambda item: int(item[0]))}
+
+
+def open_positions_sketch(trades: List[Dict], level: Dict) -> Dict:
+    """Resumen de las posiciones abiertas: lado, cuantiles y top-k por símbolo"""
+    if not trades:
+        return {"count": 0}
+
+    profits = [t.get("profit", 0) or 0 for t in trades]
+    buys = sum(1 for t in trades if t.get("type") == "BUY")
+    by_symbol: Dict[str, Dict] = {}
+    for trade, profit in zip(trades, profits):
+        stats = by_symbol.setdefault(trade.get("symbol", ""), {"total_profit": 0.0, "trade_count": 0})
+        stats["total_profit"] += float(profit)
+        stats["trade_count"] += 1
+
+    sketch = {
+        "count": len(trades),
+        "buy": buys,
+        "sell": len(trades) - buys,
+        "wins": sum(1 for p in profits if p > 0),
+        "losses": sum(1 for p in profits if p < 0),
+        "profit": quantile_sketch(profits, level["quantiles"]),
+        "by_symbol": top_k_symbols(by_symbol, level["top_k"])
+    }
+    if level["bins"]:
+        sketch["profit_histogram"] = histogram_sketch(profits, level["bins"])
+    return sketch
+
+
+def historical_sketch(historical_metrics: Dict, level: Dict) -> Dict:
+    """Escalares de las métricas históricas + sketches de tamaño acotado"""
+    sketch = {}
+    for name, value in (historical_metrics or {}).items():
+        if name.endswith("_df") or value is None:
+            continue
+        if isinstance(value, bool) or isinstance(value, (int, str)):
+            sketch[name] = value
+        elif isinstance(value, (float, np.floating)):
+            sketch[name] = _round(value)
+        elif hasattr(value, "item"):
+            sketch[name] = value.item()
+
+    for name in ("win_streak_histogram", "loss_streak_histogram"):
+        histogram = _truncate_histogram((historical_metrics or {}).get(name) or {}, level["histogram_keys"])
+        if histogram:
+            sketch[name] = histogram
+
+    distribution = (historical_metrics or {}).get("profit_distribution")
+    if distribution:
+        compact = {"quantiles": {k: v for k, v in distribution.get("quantiles", {}).items()
+                                 if k in ("n", "mean", "min", "max") or
+                                 k in {f"p{int(round(q * 100))}" for q in level["quantiles"]}}}
+        if level["bins"] and distribution.get("histogram"):
+            compact["histogram"] = distribution["histogram"]
+        sketch["profit_distribution"] = compact
+    return sketch
+
+
+def build_sketches(trading_data: Dict, level: Dict) -> Dict:
+    """Todas las secciones compactadas del prompt de análisis"""
+    symbol_analysis = trading_data.get("symbol_analysis") or {}
+    return {
+        "historical": historical_sketch(trading_data.get("historical_metrics", {}), level),
+        "open_positions": open_positions_sketch(trading_data.get("trades", []), level),
+        "symbols": top_k_symbols(symbol_analysis.get("symbols", {}), level["top_k"])
+    }
+
+
+def render_section(data: Dict) -> str:
+    """JSON en una línea (sin indentación: ~30% menos tokens)"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str) if data else "No disponibles"
+
+
+def compact_prompt(trading_data: Dict, render: Callable[[Dict], str], budget: int,
+                   model: str = None) -> Tuple[str, Dict]:
+    """
+    Renderiza el prompt con el nivel de detalle más rico que cabe en `budget`
+    tokens. Devuelve (prompt, info) con el nivel usado y los tokens contados.
+    """
+    prompt, tokens, level_index = "", 0, 0
+    for level_index, level in enumerate(COMPACTION_LEVELS):
+        prompt = render(build_sketches(trading_data, level))
+        tokens = count_tokens(prompt, model)
+        if tokens <= budget:
+            break
+
+    info = {"level": level_index, "tokens": tokens, "budget": budget, "over_budget": tokens > budget,
+            "tokenizer": "tiktoken" if tiktoken is not None else "chars/4"}
+    if info["over_budget"]:
+        print(f"⚠️ Prompt de {tokens} tokens supera el presupuesto ({budget}) incluso compactado")
+    return prompt, info
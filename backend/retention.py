@@ -0,0 +1,287 @@
+"""
+Retention Engine
+Política de retención para strategy_data.db:
+- conserva los snapshots completos (raw_data) durante RETENTION_RAW_DAYS días
+- los snapshots más antiguos se resumen por día y estrategia en
+  strategy_analysis_daily; de cada día se conserva solo el último snapshot
+  (sin raw_data) y sus posiciones, el resto se elimina
+- elimina las entradas caducadas de ai_cache
+- libera las páginas vacías con VACUUM incremental y trunca el WAL
+
+Los rollups (symbol_rollup / global_rollup) son contadores acumulados de por
+vida y no se modifican al compactar.
+Se ejecuta en un hilo de fondo arrancado por la API y bajo demanda.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import StrategyDatabase, db
+from ai_cache import ai_cache
+
+# auto_vacuum: 0 = NONE, 1 = FULL, 2 = INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+SELECT_CANDIDATES_SQL = '''
+    INSERT INTO retention_candidates (id, day, strategy_name, raw_bytes)
+    SELECT id, date(timestamp), strategy_name, COALESCE(length(raw_data), 0)
+    FROM strategy_analysis
+    WHERE timestamp < ? AND COALESCE(downsampled, 0) = 0
+'''
+
+UPSERT_DAILY_SQL = '''
+    INSERT INTO strategy_analysis_daily (
+        day, strategy_name, analysis_count, total_trades_max, net_profit_sum,
+        net_profit_min, net_profit_max, win_rate_sum, first_timestamp, last_timestamp
+    )
+    SELECT c.day, c.strategy_name, COUNT(*), MAX(a.total_trades), SUM(a.net_profit),
+           MIN(a.net_profit), MAX(a.net_profit), SUM(a.win_rate), MIN(a.timestamp), MAX(a.timestamp)
+    FROM retention_candidates c
+    JOIN strategy_analysis a ON a.id = c.id
+    WHERE true
+    GROUP BY c.day, c.strategy_name
+    ON CONFLICT(strategy_name, day) DO UPDATE SET
+        analysis_count = analysis_count + excluded.analysis_count,
+        total_trades_max = MAX(COALESCE(total_trades_max, excluded.total_trades_max),
+                               COALESCE(excluded.total_trades_max, total_trades_max)),
+        net_profit_sum = COALESCE(net_profit_sum, 0) + COALESCE(excluded.net_profit_sum, 0),
+        net_profit_min = MIN(COALESCE(net_profit_min, excluded.net_profit_min),
+                             COALESCE(excluded.net_profit_min, net_profit_min)),
+        net_profit_max = MAX(COALESCE(net_profit_max, excluded.net_profit_max),
+                             COALESCE(excluded.net_profit_max, net_profit_max)),
+        win_rate_sum = COALESCE(win_rate_sum, 0) + COALESCE(excluded.win_rate_sum, 0),
+        first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+        last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+'''
+
+# Todo candidato que no sea el último snapshot de su día y estrategia
+SELECT_DELETIONS_SQL = '''
+    INSERT INTO retention_deletions (id)
+    SELECT c.id FROM retention_candidates c
+    WHERE c.id <> (
+        SELECT MAX(a.id) FROM strategy_analysis a
+        WHERE a.strategy_name = c.strategy_name
+          AND a.timestamp >= c.day AND a.timestamp < date(c.day, '+1 day')
+    )
+'''
+
+
+class RetentionEngine:
+    def __init__(self, database: StrategyDatabase, raw_days: int = None,
+                 interval_hours: float = None, vacuum_pages: int = None,
+                 initial_delay: float = 60, history_size: int = 20):
+        """
+        Args:
+            database: base de datos a compactar
+            raw_days: días durante los que se conservan los snapshots completos
+            interval_hours: horas entre ejecuciones en segundo plano (0 = desactivado)
+            vacuum_pages: páginas máximas a liberar por ejecución (0 = todas)
+            initial_delay: segundos de espera antes de la primera ejecución
+        """
+        self.db = database
+        self.raw_days = raw_days if raw_days is not None \
+            else int(os.getenv("RETENTION_RAW_DAYS", "30"))
+        self.interval_hours = interval_hours if interval_hours is not None \
+            else float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+        self.vacuum_pages = vacuum_pages if vacuum_pages is not None \
+            else int(os.getenv("RETENTION_VACUUM_PAGES", "0"))
+        self.initial_delay = initial_delay
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reports = deque(maxlen=history_size)
+
+    # ------------------------------------------------------------------
+    #  Medición
+    # ------------------------------------------------------------------
+
+    def _file_bytes(self) -> int:
+        """Tamaño en disco de la base más su WAL"""
+        total = 0
+        for path in (self.db.db_path, self.db.db_path + "-wal"):
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    def _page_stats(self, conn) -> Dict:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_pages": freelist,
+            "freelist_bytes": freelist * page_size
+        }
+
+    # ------------------------------------------------------------------
+    #  Pasos de la política
+    # ------------------------------------------------------------------
+
+    def downsample(self, cutoff: datetime) -> Dict:
+        """Resume por día los snapshots anteriores a cutoff y elimina los redundantes"""
+        with self.db.pool.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS retention_candidates (
+                    id INTEGER PRIMARY KEY, day TEXT, strategy_name TEXT, raw_bytes INTEGER
+                )
+            ''')
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS retention_deletions (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM retention_candidates")
+            cursor.execute("DELETE FROM retention_deletions")
+
+            cursor.execute(SELECT_CANDIDATES_SQL, (cutoff.strftime("%Y-%m-%d %H:%M:%S"),))
+            cursor.execute("SELECT COUNT(*), COUNT(DISTINCT day || '|' || strategy_name), "
+                           "COALESCE(SUM(raw_bytes), 0) FROM retention_candidates")
+            candidates, days, raw_bytes = cursor.fetchone()
+            if candidates == 0:
+                return {"snapshots_downsampled": 0, "days_summarized": 0, "snapshots_deleted": 0,
+                        "trades_deleted": 0, "raw_bytes_dropped": 0}
+
+            cursor.execute(UPSERT_DAILY_SQL)
+            cursor.execute(SELECT_DELETIONS_SQL)
+
+            cursor.execute('''
+                DELETE FROM trades_history
+                WHERE analysis_id IN (SELECT id FROM retention_deletions)
+            ''')
+            trades_deleted = cursor.rowcount
+            for table in ("symbol_metrics", "session_analysis"):
+                cursor.execute(f'''
+                    DELETE FROM {table}
+                    WHERE analysis_id IN (SELECT id FROM retention_deletions)
+                ''')
+            cursor.execute('''
+                DELETE FROM strategy_analysis
+                WHERE id IN (SELECT id FROM retention_deletions)
+            ''')
+            snapshots_deleted = cursor.rowcount
+
+            # El snapshot conservado de cada día queda sin raw_data
+            cursor.execute('''
+                UPDATE strategy_analysis
+                SET raw_data = NULL, raw_format = NULL, downsampled = 1
+                WHERE id IN (SELECT id FROM retention_candidates)
+            ''')
+
+        return {
+            "snapshots_downsampled": candidates,
+            "days_summarized": days,
+            "snapshots_deleted": snapshots_deleted,
+            "trades_deleted": trades_deleted,
+            "raw_bytes_dropped": raw_bytes
+        }
+
+    def vacuum(self) -> Dict:
+        """
+        VACUUM incremental. Las bases creadas antes de activar auto_vacuum
+        necesitan un VACUUM completo (una única vez) para cambiar de modo.
+        """
+        conn = self.db.pool.get()
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        full = mode != AUTO_VACUUM_INCREMENTAL
+        if full:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            pages = f"({self.vacuum_pages})" if self.vacuum_pages > 0 else ""
+            # Cada paso libera una página: hay que consumir todas las filas
+            conn.execute(f"PRAGMA incremental_vacuum{pages}").fetchall()
+        busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {"full_vacuum": full, "wal_checkpoint_busy": bool(busy)}
+
+    # ------------------------------------------------------------------
+    #  Ejecución
+    # ------------------------------------------------------------------
+
+    def run(self) -> Dict:
+        """Ejecuta la política completa y devuelve el informe de la ejecución"""
+        if not self._run_lock.acquire(blocking=False):
+            return {"status": "running", "last_report": self.last_report()}
+        try:
+            started = time.perf_counter()
+            cutoff = datetime.utcnow() - timedelta(days=self.raw_days)
+            conn = self.db.pool.get()
+            bytes_before = self._file_bytes()
+            pages_before = self._page_stats(conn)
+
+            downsample = self.downsample(cutoff)
+            ai_cache_expired = ai_cache.purge_expired()
+            vacuum = self.vacuum()
+
+            bytes_after = self._file_bytes()
+            pages_after = self._page_stats(conn)
+            report = {
+                "status": "ok",
+                "timestamp": datetime.now().isoformat(),
+                "raw_days": self.raw_days,
+                "cutoff": cutoff.isoformat(),
+                **downsample,
+                "ai_cache_expired": ai_cache_expired,
+                **vacuum,
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after,
+                "bytes_reclaimed": max(0, bytes_before - bytes_after),
+                "pages_before": pages_before,
+                "pages_after": pages_after,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+        except Exception as e:
+            report = {"status": "error", "timestamp": datetime.now().isoformat(), "error": str(e)}
+        finally:
+            self._run_lock.release()
+
+        self._reports.append(report)
+        if report["status"] == "ok":
+            print(f"🧹 Retención: {report['snapshots_downsampled']} snapshots compactados, "
+                  f"{report['snapshots_deleted']} eliminados, {report['bytes_reclaimed']} bytes liberados")
+        else:
+            print(f"⚠️ Error en retención: {report['error']}")
+        return report
+
+    def _loop(self):
+        if self._stop.wait(self.initial_delay):
+            return
+        while True:
+            self.run()
+            if self._stop.wait(self.interval_hours * 3600):
+                return
+
+    def start(self) -> bool:
+        """Arranca el hilo de mantenimiento (hook de arranque de la API)"""
+        if self.interval_hours <= 0 or (self._thread and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 5):
+        """Detiene el hilo de mantenimiento (hook de apagado de la API)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def last_report(self) -> Optional[Dict]:
+        return self._reports[-1] if self._reports else None
+
+    def status(self) -> Dict:
+        return {
+            "running": self._run_lock.locked(),
+            "background": bool(self._thread and self._thread.is_alive()),
+            "raw_days": self.raw_days,
+            "interval_hours": self.interval_hours,
+            "vacuum_pages": self.vacuum_pages,
+            "reports": list(self._reports)
+        }
+
+
+# Instancia global
+retention_engine = RetentionEngine(db)
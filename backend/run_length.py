@@ -0,0 +1,117 @@
+"""
+Run-Length Kernels
+Cálculo vectorizado (NumPy) de rachas y drawdowns sobre series de profits:
+rachas de ganancias/pérdidas más largas, racha actual, histograma de
+longitudes de racha y duración de los periodos en drawdown.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def encode_runs(values) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Codificación run-length de un array 1-D.
+
+    Returns:
+        (run_values, run_lengths, run_starts)
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n == 0:
+        empty = np.array([], dtype=np.int64)
+        return values[:0], empty, empty
+
+    # Índices donde empieza una nueva racha
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    np.not_equal(values[1:], values[:-1], out=change[1:])
+    run_starts = np.flatnonzero(change)
+    run_lengths = np.diff(np.append(run_starts, n))
+    return values[run_starts], run_lengths, run_starts
+
+
+def longest_run(mask) -> int:
+    """Longitud de la racha más larga de valores True"""
+    run_values, run_lengths, _ = encode_runs(np.asarray(mask, dtype=bool))
+    true_lengths = run_lengths[run_values]
+    return int(true_lengths.max()) if len(true_lengths) else 0
+
+
+def _histogram(lengths: np.ndarray) -> Dict[int, int]:
+    if len(lengths) == 0:
+        return {}
+    counts = np.bincount(lengths)
+    nonzero = np.flatnonzero(counts)
+    return {int(k): int(counts[k]) for k in nonzero}
+
+
+def streak_stats(profits) -> Dict:
+    """
+    Rachas de trades ganadores (profit > 0) y perdedores (profit <= 0)
+    en el orden en que se reciben.
+    """
+    profits = np.asarray(profits, dtype=float)
+    run_values, run_lengths, _ = encode_runs(profits > 0)
+
+    win_lengths = run_lengths[run_values]
+    loss_lengths = run_lengths[~run_values]
+
+    if len(run_lengths):
+        current_type = "win" if run_values[-1] else "loss"
+        current_length = int(run_lengths[-1])
+    else:
+        current_type, current_length = "none", 0
+
+    return {
+        "longest_win_streak": int(win_lengths.max()) if len(win_lengths) else 0,
+        "longest_loss_streak": int(loss_lengths.max()) if len(loss_lengths) else 0,
+        "current_streak_type": current_type,
+        "current_streak_length": current_length,
+        "win_streak_histogram": _histogram(win_lengths),
+        "loss_streak_histogram": _histogram(loss_lengths)
+    }
+
+
+def drawdown_stats(profits) -> Dict:
+    """
+    Drawdown de la curva de profit acumulado. Las duraciones se miden en
+    número de trades consecutivos por debajo del máximo previo.
+    """
+    profits = np.asarray(profits, dtype=float)
+    if len(profits) == 0:
+        return {
+            "max_drawdown": 0.0,
+            "max_drawdown_duration": 0,
+            "avg_drawdown_duration": 0.0,
+            "current_drawdown": 0.0,
+            "current_drawdown_duration": 0,
+            "drawdown_periods": 0
+        }
+
+    # El capital parte de 0, así que el máximo previo nunca es negativo
+    equity = np.cumsum(profits)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    drawdown = peak - equity
+
+    run_values, run_lengths, _ = encode_runs(drawdown > 0)
+    underwater = run_lengths[run_values]
+    in_drawdown = bool(run_values[-1])
+
+    return {
+        "max_drawdown": float(drawdown.max()),
+        "max_drawdown_duration": int(underwater.max()) if len(underwater) else 0,
+        "avg_drawdown_duration": float(underwater.mean()) if len(underwater) else 0.0,
+        "current_drawdown": float(drawdown[-1]),
+        "current_drawdown_duration": int(run_lengths[-1]) if in_drawdown else 0,
+        "drawdown_periods": int(len(underwater))
+    }
+
+
+def run_stats(profits) -> Dict:
+    """Rachas y drawdown en una sola llamada sobre la misma serie"""
+    profits = np.asarray(profits, dtype=float)
+    stats = streak_stats(profits)
+    stats.update(drawdown_stats(profits))
+    return stats
@@ -1,40 +1,134 @@
-import MetaTrader5 as mt5
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict
+import asyncio
+import copy
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 from strategy_templates import generate_code_and_explanation
 from database import db
+from deal_store import deal_store
+from deal_sources import DealSource
+from position_lifecycle import build_positions, closed_positions, max_concurrent_volume
+from analysis_cache import analysis_cache
+from run_length import run_stats, longest_run
+from prompt_compactor import profit_distribution
+from mt5_session import mt5_session, MT5ConnectionError
 from openai_analyzer import ai_analyzer
+from job_queue import job_queue
 
-def analyze_trades():
-    # Asumir que MT5 ya está inicializado y corriendo
-    if not mt5.initialize():
-        return {"error": "MT5 no está inicializado. Asegúrate de que MT5 esté abierto y conectado."}
+MT5_NOT_INITIALIZED = {"error": "MT5 no está inicializado. Asegúrate de que MT5 esté abierto y conectado."}
 
-    positions = mt5.positions_get()
+def analyze_trades(use_ai_cache: bool = True):
+    """
+    Devuelve al momento las métricas deterministas y encola el análisis IA
+    como trabajo (ai_job_id); al terminar, el resultado fusionado se guarda en
+    DB. Sin cola activa (fuera de la API) la IA se ejecuta en línea.
+    use_ai_cache=False fuerza una respuesta nueva de OpenAI.
+    """
+    try:
+        result, df = compute_trade_analysis()
+    except MT5ConnectionError:
+        return MT5_NOT_INITIALIZED
+    if df is None:
+        return result
+    
+    if not job_queue.running:
+        apply_ai_analysis(result, ai_analyzer.analyze_strategy_with_ai(result, use_ai_cache))
+        persist_analysis(result, df)
+        return result
+    return submit_ai_enrichment(result, df, use_ai_cache)
+
+async def analyze_trades_async(use_ai_cache: bool = True):
+    """
+    Igual que analyze_trades, pero la parte de MT5/pandas corre en el
+    threadpool sin bloquear el event loop
+    """
+    try:
+        result, df = await asyncio.to_thread(compute_trade_analysis)
+    except MT5ConnectionError:
+        return MT5_NOT_INITIALIZED
+    if df is None:
+        return result
+    
+    if not job_queue.running:
+        apply_ai_analysis(result, await ai_analyzer.analyze_strategy_with_ai_async(result, use_ai_cache))
+        await asyncio.to_thread(persist_analysis, result, df)
+        return result
+    return submit_ai_enrichment(result, df, use_ai_cache)
+
+def submit_ai_enrichment(result: Dict, df: pd.DataFrame, use_ai_cache: bool = True) -> Dict:
+    """Encola enrich_with_ai y marca el resultado con ai_job_id / ai_status"""
+    # El trabajo usa su propia copia: `result` se serializa ya en la respuesta
+    job_result = copy.deepcopy(result)
+    result["ai_job_id"] = job_queue.submit(
+        "ai_analysis",
+        lambda: enrich_with_ai(job_result, df, use_ai_cache),
+        meta={"strategy": result["summary"].get("strategy")}
+    )
+    result["ai_status"] = "pending"
+    return result
+
+async def enrich_with_ai(result: Dict, df: pd.DataFrame, use_ai_cache: bool = True) -> Dict:
+    """Trabajo de la cola: análisis IA, fusión con el resultado y guardado en DB"""
+    ai_analysis = await ai_analyzer.analyze_strategy_with_ai_async(result, use_ai_cache)
+    apply_ai_analysis(result, ai_analysis)
+    analysis_id = await asyncio.to_thread(persist_analysis, result, df)
+    return {"ai_analysis": ai_analysis, "summary": result["summary"], "analysis_id": analysis_id}
+
+def compute_trade_analysis(source: DealSource = None) -> Tuple[Dict, Optional[pd.DataFrame]]:
+    """
+    Parte determinista del análisis (sin IA ni escritura en DB).
+    Usa la sesión MT5 compartida del proceso solo para leer posiciones y
+    cuenta; el snapshot y el trabajo con pandas se hacen ya sin ella.
+    Con `source` (archivo, sintética...) no usa la sesión ni la caché de snapshot.
+    Devuelve (result, df); df es None si no hay posiciones abiertas.
+    """
+    if source is not None:
+        return _analyze_trades(source, build_analysis_snapshot(source=source))
+    with mt5_session.session() as mt5:
+        positions, account_info = _read_account(mt5)
+    return _build_trade_analysis(positions, account_info)
+
+def _read_account(mt5) -> Tuple[tuple, object]:
+    """Llamadas a MT5 del análisis: posiciones abiertas e información de la cuenta"""
+    return mt5.positions_get(), mt5.account_info()
+
+def _analyze_trades(mt5, snapshot: Dict = None):
+    """
+    Análisis de las posiciones abiertas de la cuenta conectada en `mt5`
+    (módulo MetaTrader5 o DealSource).
+    snapshot: snapshot de análisis ya calculado; por defecto, el de la cuenta
+    de la sesión compartida (get_analysis_snapshot)
+    """
+    positions, account_info = _read_account(mt5)
+    return _build_trade_analysis(positions, account_info, snapshot)
+
+def _build_trade_analysis(positions, account_info, snapshot: Dict = None):
+    """
+    Resultado del análisis a partir de posiciones y cuenta ya leídas. No
+    llamar con la sesión MT5 tomada si snapshot es None: get_analysis_snapshot
+    toma el bloqueo de la caché y, dentro, la sesión
+    """
     if not positions:
-        mt5.shutdown()
-        return {"summary": {"strategy": "Sin operaciones", "strategy_description": "No hay posiciones abiertas", "timeframe": "N/A", "indicators": [], "explanation": "Sin operaciones activas en la cuenta"}, "trades": []}
+        return {"summary": {"strategy": "Sin operaciones", "strategy_description": "No hay posiciones abiertas", "timeframe": "N/A", "indicators": [], "explanation": "Sin operaciones activas en la cuenta"}, "trades": []}, None
 
     df = pd.DataFrame([p._asdict() for p in positions])
     df["type"] = df["type"].map({0: "BUY", 1: "SELL"})
     df["time"] = pd.to_datetime(df["time"], unit="s")
 
-    # ====== NUEVO: Análisis histórico completo ======
-    historical_metrics = analyze_historical_data()
-    session_analysis = analyze_trading_sessions(historical_metrics.get("deals_df"))
-    schedule_analysis = analyze_trading_schedule(historical_metrics.get("deals_df"))
-    risk_analysis = analyze_risk_management(historical_metrics.get("deals_df"))
-    symbol_analysis = analyze_symbols_performance(historical_metrics.get("deals_df"))
+    # ====== NUEVO: Análisis histórico completo (snapshot compartido) ======
+    if snapshot is None:
+        snapshot = get_analysis_snapshot()
+    historical_metrics = public_metrics(snapshot["historical_metrics"])
+    session_analysis = snapshot["session_analysis"]
+    schedule_analysis = snapshot["schedule_analysis"]
+    risk_analysis = snapshot["risk_analysis"]
+    symbol_analysis = snapshot["symbol_analysis"]
     
     # Métricas avanzadas
     advanced_metrics = calculate_advanced_metrics(df)
     strategy = detect_strategy(df)
     
-    # Información de cuenta
-    account_info = mt5.account_info()
-    
     stats = {
         "total_trades": len(df),
         "net_profit": float(df["profit"].sum()),
@@ -90,11 +184,12 @@ def analyze_trades():
         "symbol_analysis": symbol_analysis
     }
     
-    # ====== NUEVO: Análisis con IA ======
-    ai_analysis = ai_analyzer.analyze_strategy_with_ai(result)
-    
-    # Sobrescribir nombre y descripción con análisis IA
+    return result, df
+
+def apply_ai_analysis(result: Dict, ai_analysis: Dict):
+    """Sobrescribe nombre y descripción con el análisis IA (si lo hubo)"""
     if ai_analysis.get("ai_powered"):
+        stats = result["summary"]
         stats["strategy"] = ai_analysis["strategy_name"]
         stats["strategy_description"] = ai_analysis["strategy_description"]
         stats["indicators"] = ai_analysis["indicators_detected"]
@@ -102,19 +197,19 @@ def analyze_trades():
         stats["risk_profile"] = ai_analysis.get("risk_profile", "")
         
         result["ai_analysis"] = ai_analysis
-    
-    # Guardar en base de datos
+
+def persist_analysis(result: Dict, df: pd.DataFrame) -> Optional[int]:
+    """Guarda el análisis en base de datos y detecta alertas"""
     try:
         analysis_id = db.save_analysis(result)
         print(f"✅ Análisis guardado en DB con ID: {analysis_id}")
         
         # Detectar alertas
-        detect_alerts(stats, df)
+        detect_alerts(result["summary"], df)
+        return analysis_id
     except Exception as e:
         print(f"⚠️ Error guardando en DB: {e}")
-    
-    mt5.shutdown()
-    return result
+        return None
 
 def calculate_advanced_metrics(df: pd.DataFrame) -> dict:
     """Calcula métricas avanzadas de trading"""
@@ -154,42 +249,39 @@ def calculate_advanced_metrics(df: pd.DataFrame) -> dict:
 
 def detect_alerts(stats: dict, df: pd.DataFrame):
     """Detecta condiciones importantes y crea alertas"""
+    alerts = []
     
     # Alerta de pérdidas consecutivas
-    consecutive_losses = 0
-    max_consecutive_losses = 0
-    for profit in df["profit"]:
-        if profit < 0:
-            consecutive_losses += 1
-            max_consecutive_losses = max(max_consecutive_losses, consecutive_losses)
-        else:
-            consecutive_losses = 0
+    max_consecutive_losses = longest_run(df["profit"].to_numpy() < 0)
     
     if max_consecutive_losses >= 3:
-        db.create_alert(
-            "consecutive_losses",
-            "warning",
-            f"Detectadas {max_consecutive_losses} pérdidas consecutivas",
-            {"count": max_consecutive_losses}
-        )
+        alerts.append({
+            "alert_type": "consecutive_losses",
+            "severity": "warning",
+            "message": f"Detectadas {max_consecutive_losses} pérdidas consecutivas",
+            "data": {"count": max_consecutive_losses}
+        })
     
     # Alerta de drawdown alto
     if stats["max_drawdown"] > 1000:
-        db.create_alert(
-            "high_drawdown",
-            "critical",
-            f"Drawdown alto detectado: ${stats['max_drawdown']:.2f}",
-            {"drawdown": stats["max_drawdown"]}
-        )
+        alerts.append({
+            "alert_type": "high_drawdown",
+            "severity": "critical",
+            "message": f"Drawdown alto detectado: ${stats['max_drawdown']:.2f}",
+            "data": {"drawdown": stats["max_drawdown"]}
+        })
     
     # Alerta de profit factor bajo
     if stats["profit_factor"] < 1:
-        db.create_alert(
-            "low_profit_factor",
-            "warning",
-            f"Profit Factor bajo: {stats['profit_factor']:.2f}",
-            {"profit_factor": stats["profit_factor"]}
-        )
+        alerts.append({
+            "alert_type": "low_profit_factor",
+            "severity": "warning",
+            "message": f"Profit Factor bajo: {stats['profit_factor']:.2f}",
+            "data": {"profit_factor": stats["profit_factor"]}
+        })
+    
+    # Todas las alertas en una sola transacción
+    db.create_alerts(alerts)
 
 def detect_strategy(df: pd.DataFrame) -> dict:
     if df.empty:
@@ -274,92 +366,29 @@ def detect_strategy(df: pd.DataFrame) -> dict:
 #  NUEVAS FUNCIONES: Análisis Histórico Completo
 # ===============================================================
 
-def analyze_historical_data(days_back: int = 90) -> Dict:
+def load_deals(source, days_back: int = 90) -> pd.DataFrame:
+    """
+    Deals de los últimos `days_back` días de `source`. Con MT5 se usa el
+    historial local, sincronizando solo los deals posteriores a la última
+    sincronización; las fuentes locales (archivo, sintética) se leen tal cual.
+    """
+    if getattr(source, "persist_deals", True):
+        return deal_store.get_deals(source, days_back)
+    return source.get_deals(days_back)
+
+
+def analyze_historical_data(days_back: int = 90, source: DealSource = None) -> Dict:
     """
     Analiza el historial completo de trades cerrados en MT5
+    (o en `source`, si se indica)
     """
     try:
-        # Obtener deals (ejecuciones) del historial
-        from_date = datetime.now() - timedelta(days=days_back)
-        to_date = datetime.now()
-        
-        deals = mt5.history_deals_get(from_date, to_date)
-        
-        if not deals or len(deals) == 0:
-            return {
-                "total_trades": 0,
-                "win_rate": 0,
-                "total_profit": 0,
-                "best_trade": 0,
-                "worst_trade": 0,
-                "longest_win_streak": 0,
-                "longest_loss_streak": 0,
-                "avg_duration_minutes": 0,
-                "deals_df": None
-            }
-        
-        # Convertir a DataFrame
-        deals_df = pd.DataFrame([d._asdict() for d in deals])
-        deals_df["time"] = pd.to_datetime(deals_df["time"], unit="s")
-        
-        # Filtrar solo deals de cierre (entry = 1 significa salida/cierre)
-        closed_trades = deals_df[deals_df["entry"] == 1].copy()
-        
-        if len(closed_trades) == 0:
-            return {
-                "total_trades": 0,
-                "win_rate": 0,
-                "total_profit": 0,
-                "deals_df": deals_df
-            }
-        
-        # Calcular métricas
-        total_trades = len(closed_trades)
-        wins = (closed_trades["profit"] > 0).sum()
-        win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
-        total_profit = closed_trades["profit"].sum()
-        best_trade = closed_trades["profit"].max()
-        worst_trade = closed_trades["profit"].min()
-        
-        # Calcular rachas
-        closed_trades = closed_trades.sort_values("time")
-        closed_trades["is_win"] = closed_trades["profit"] > 0
-        
-        win_streak = 0
-        loss_streak = 0
-        longest_win_streak = 0
-        longest_loss_streak = 0
-        
-        for is_win in closed_trades["is_win"]:
-            if is_win:
-                win_streak += 1
-                loss_streak = 0
-                longest_win_streak = max(longest_win_streak, win_streak)
-            else:
-                loss_streak += 1
-                win_streak = 0
-                longest_loss_streak = max(longest_loss_streak, loss_streak)
-        
-        # Calcular duración promedio (simplificado)
-        avg_duration = 0
-        if len(deals_df) > 1:
-            time_diffs = deals_df["time"].diff().dt.total_seconds().dropna() / 60
-            avg_duration = time_diffs.mean() if len(time_diffs) > 0 else 0
-        
-        return {
-            "total_trades": int(total_trades),
-            "wins": int(wins),
-            "losses": int(total_trades - wins),
-            "win_rate": float(win_rate),
-            "total_profit": float(total_profit),
-            "best_trade": float(best_trade),
-            "worst_trade": float(worst_trade),
-            "longest_win_streak": int(longest_win_streak),
-            "longest_loss_streak": int(longest_loss_streak),
-            "avg_duration_minutes": float(avg_duration),
-            "deals_df": deals_df,
-            "closed_trades_df": closed_trades
-        }
+        if source is not None:
+            deals_df = load_deals(source, days_back)
+        else:
+            with mt5_session.session() as mt5:
+                deals_df = load_deals(mt5, days_back)
+        return historical_metrics_from_deals(deals_df)
         
     except Exception as e:
         print(f"⚠️ Error en análisis histórico: {e}")
@@ -368,15 +397,112 @@ def analyze_historical_data(days_back: int = 90) -> Dict:
             "win_rate": 0,
             "total_profit": 0,
             "deals_df": None,
+            "positions_df": None,
             "error": str(e)
         }
 
 
-def analyze_trading_sessions(deals_df) -> Dict:
+def historical_metrics_from_deals(deals_df: pd.DataFrame) -> Dict:
     """
-    Analiza performance por sesión de trading (Asian, London, NY)
+    Métricas históricas a partir de un DataFrame de deals ya cargado
+    (formato de deal_store.get_deals). Un trade es una posición cerrada
+    reconstruida con build_positions (entradas, salidas parciales y reversiones
+    agrupadas por position_id), en orden de cierre.
     """
-    if deals_df is None or len(deals_df) == 0:
+    if len(deals_df) == 0:
+        return {
+            "total_trades": 0,
+            "win_rate": 0,
+            "total_profit": 0,
+            "best_trade": 0,
+            "worst_trade": 0,
+            "longest_win_streak": 0,
+            "longest_loss_streak": 0,
+            "avg_duration_minutes": 0,
+            "deals_df": None,
+            "positions_df": None
+        }
+    
+    positions = build_positions(deals_df)
+    closed_trades = closed_positions(positions)
+    
+    if len(closed_trades) == 0:
+        return {
+            "total_trades": 0,
+            "win_rate": 0,
+            "total_profit": 0,
+            "deals_df": deals_df,
+            "positions_df": positions
+        }
+    
+    # Calcular métricas
+    profits = closed_trades["profit"].to_numpy()
+    total_trades = len(closed_trades)
+    wins = (profits > 0).sum()
+    win_rate = (wins / total_trades * 100) if total_trades > 0 else 0
+    total_profit = profits.sum()
+    best_trade = profits.max()
+    worst_trade = profits.min()
+    
+    # Calcular rachas y drawdown (vectorizado, en orden de cierre)
+    runs = run_stats(profits)
+    
+    # Duración media de las posiciones (las que abrieron antes de la ventana no cuentan)
+    durations = closed_trades["duration_minutes"].dropna()
+    avg_duration = durations.mean() if len(durations) > 0 else 0
+    
+    return {
+        "total_trades": int(total_trades),
+        "wins": int(wins),
+        "losses": int(total_trades - wins),
+        "win_rate": float(win_rate),
+        "total_profit": float(total_profit),
+        "total_net_profit": float(closed_trades["net_profit"].sum()),
+        "best_trade": float(best_trade),
+        "worst_trade": float(worst_trade),
+        "longest_win_streak": runs["longest_win_streak"],
+        "longest_loss_streak": runs["longest_loss_streak"],
+        "current_streak_type": runs["current_streak_type"],
+        "current_streak_length": runs["current_streak_length"],
+        "win_streak_histogram": runs["win_streak_histogram"],
+        "loss_streak_histogram": runs["loss_streak_histogram"],
+        "max_drawdown": runs["max_drawdown"],
+        "max_drawdown_duration": runs["max_drawdown_duration"],
+        "current_drawdown_duration": runs["current_drawdown_duration"],
+        "avg_duration_minutes": float(avg_duration),
+        # Sketch de tamaño fijo (cuantiles + histograma) para prompts y UI
+        "profit_distribution": profit_distribution(profits),
+        "deals_df": deals_df,
+        "positions_df": positions,
+        "closed_trades_df": closed_trades
+    }
+
+
+def _as_positions(trades_df) -> pd.DataFrame:
+    """
+    Tabla de posiciones de `trades_df`: la de build_positions o, por
+    compatibilidad, un DataFrame de deals (se reconstruyen las posiciones)
+    """
+    return build_positions(trades_df) if "entry" in trades_df else trades_df
+
+
+def _closed_positions(trades_df) -> pd.DataFrame:
+    """Posiciones cerradas (sin ordenar: para agregados que no dependen del orden)"""
+    positions = _as_positions(trades_df)
+    return positions[positions["status"] == "closed"]
+
+
+def _trade_times(df: pd.DataFrame) -> pd.Series:
+    """Momento de cada trade: su apertura (o el cierre si abrió antes de la ventana)"""
+    return df["open_time"].fillna(df["close_time"])
+
+
+def analyze_trading_sessions(positions_df) -> Dict:
+    """
+    Analiza performance por sesión de trading (Asian, London, NY), según la
+    hora de apertura de cada posición cerrada (positions_df de build_positions)
+    """
+    if positions_df is None or len(positions_df) == 0:
         return {
             "best_session": "N/A",
             "worst_session": "N/A",
@@ -384,20 +510,13 @@ def analyze_trading_sessions(deals_df) -> Dict:
         }
     
     try:
-        df = deals_df.copy()
-        df["hour"] = df["time"].dt.hour
+        df = _closed_positions(positions_df).copy()
+        if len(df) == 0:
+            return {"best_session": "N/A", "worst_session": "N/A", "sessions": {}}
+        hour = _trade_times(df).dt.hour.to_numpy()
         
         # Definir sesiones (hora GMT)
-        def get_session(hour):
-            if 0 <= hour < 8:
-                return "Asian"
-            elif 8 <= hour < 16:
-                return "London"
-            elif 16 <= hour < 24:
-                return "New York"
-            return "Unknown"
-        
-        df["session"] = df["hour"].apply(get_session)
+        df["session"] = np.select([hour < 8, hour < 16], ["Asian", "London"], "New York")
         
         # Agrupar por sesión
         session_stats = df.groupby("session")["profit"].agg([
@@ -425,11 +544,12 @@ def analyze_trading_sessions(deals_df) -> Dict:
         return {"best_session": "N/A", "worst_session": "N/A", "sessions": {}}
 
 
-def analyze_trading_schedule(deals_df) -> Dict:
+def analyze_trading_schedule(positions_df) -> Dict:
     """
-    Analiza performance por día de la semana y hora del día
+    Analiza performance por día de la semana y hora del día de apertura
+    de las posiciones cerradas
     """
-    if deals_df is None or len(deals_df) == 0:
+    if positions_df is None or len(positions_df) == 0:
         return {
             "best_hour": "N/A",
             "best_day": "N/A",
@@ -438,9 +558,12 @@ def analyze_trading_schedule(deals_df) -> Dict:
         }
     
     try:
-        df = deals_df.copy()
-        df["hour"] = df["time"].dt.hour
-        df["day_of_week"] = df["time"].dt.day_name()
+        df = _closed_positions(positions_df).copy()
+        if len(df) == 0:
+            return {"best_hour": "N/A", "best_day": "N/A", "by_hour": {}, "by_day": {}}
+        trade_time = _trade_times(df)
+        df["hour"] = trade_time.dt.hour
+        df["day_of_week"] = trade_time.dt.day_name()
         
         # Por hora
         hour_stats = df.groupby("hour")["profit"].agg([
@@ -476,11 +599,11 @@ def analyze_trading_schedule(deals_df) -> Dict:
         return {"best_hour": "N/A", "best_day": "N/A", "by_hour": {}, "by_day": {}}
 
 
-def analyze_risk_management(deals_df) -> Dict:
+def analyze_risk_management(positions_df) -> Dict:
     """
-    Analiza gestión de riesgo y R:R ratio
+    Analiza gestión de riesgo y R:R ratio sobre las posiciones cerradas
     """
-    if deals_df is None or len(deals_df) == 0:
+    if positions_df is None or len(positions_df) == 0:
         return {
             "avg_rr": 0,
             "avg_risk_percent": 0,
@@ -488,7 +611,8 @@ def analyze_risk_management(deals_df) -> Dict:
         }
     
     try:
-        df = deals_df.copy()
+        positions = _as_positions(positions_df)
+        df = positions[positions["status"] == "closed"]
         
         # Calcular R:R aproximado (wins vs losses promedio)
         wins_df = df[df["profit"] > 0]
@@ -502,8 +626,8 @@ def analyze_risk_management(deals_df) -> Dict:
         # Estimación de riesgo por trade (muy aproximado)
         avg_risk_percent = (abs(df["profit"].std()) / 10000) * 100  # Aproximación
         
-        # Exposición máxima (suma de volúmenes en un momento dado)
-        max_exposure = df["volume"].sum()
+        # Exposición máxima: mayor volumen abierto a la vez
+        max_exposure = max_concurrent_volume(positions)
         
         return {
             "avg_rr": float(avg_rr),
@@ -518,11 +642,11 @@ def analyze_risk_management(deals_df) -> Dict:
         return {"avg_rr": 0, "avg_risk_percent": 0, "max_exposure": 0}
 
 
-def analyze_symbols_performance(deals_df) -> Dict:
+def analyze_symbols_performance(positions_df) -> Dict:
     """
-    Analiza performance por símbolo
+    Analiza performance por símbolo (una entrada por posición cerrada)
     """
-    if deals_df is None or len(deals_df) == 0:
+    if positions_df is None or len(positions_df) == 0:
         return {
             "best_symbol": "N/A",
             "worst_symbol": "N/A",
@@ -530,7 +654,7 @@ def analyze_symbols_performance(deals_df) -> Dict:
         }
     
     try:
-        df = deals_df.copy()
+        df = _closed_positions(positions_df)
         
         # Agrupar por símbolo
         symbol_stats = df.groupby("symbol")["profit"].agg([
@@ -562,4 +686,57 @@ def analyze_symbols_performance(deals_df) -> Dict:
         
     except Exception as e:
         print(f"⚠️ Error en análisis por símbolos: {e}")
-        return {"best_symbol": "N/A", "worst_symbol": "N/A", "symbols": {}}
\ No newline at end of file
+        return {"best_symbol": "N/A", "worst_symbol": "N/A", "symbols": {}}
+
+
+# ===============================================================
+#  SNAPSHOT DE ANÁLISIS: una descarga y una agregación por ventana
+# ===============================================================
+
+def build_analysis_snapshot(days_back: int = 90, source: DealSource = None) -> Dict:
+    """
+    Calcula de una sola vez el historial y todos los análisis derivados
+    (sesiones, horario, riesgo y símbolos) sobre la misma tabla de posiciones
+    """
+    return snapshot_from_historical(analyze_historical_data(days_back, source), days_back)
+
+
+def snapshot_from_historical(historical_metrics: Dict, days_back: int = 90) -> Dict:
+    """Snapshot de análisis a partir de métricas históricas ya calculadas"""
+    positions_df = historical_metrics.get("positions_df")
+
+    snapshot = {
+        "days_back": days_back,
+        "created_at": datetime.utcnow().isoformat(),
+        "historical_metrics": historical_metrics,
+        "session_analysis": analyze_trading_sessions(positions_df),
+        "schedule_analysis": analyze_trading_schedule(positions_df),
+        "risk_analysis": analyze_risk_management(positions_df),
+        "symbol_analysis": analyze_symbols_performance(positions_df)
+    }
+    # Un historial fallido (p. ej. timeout de MT5) no debe quedar en la caché
+    if historical_metrics.get("error"):
+        snapshot["error"] = historical_metrics["error"]
+    return snapshot
+
+
+def get_analysis_snapshot(days_back: int = 90) -> Dict:
+    """
+    Devuelve el snapshot de análisis de la cuenta actual para la ventana
+    `days_back`, reutilizando el cacheado mientras no expire su TTL.
+    Los DataFrames del snapshot son compartidos: no modificarlos.
+    No llamar con la sesión MT5 tomada (ver analysis_cache).
+    """
+    with mt5_session.session() as mt5:
+        account_info = mt5.account_info()
+    login = int(account_info.login) if account_info else 0
+
+    return analysis_cache.get_or_compute(
+        (login, days_back),
+        lambda: build_analysis_snapshot(days_back)
+    )
+
+
+def public_metrics(historical_metrics: Dict) -> Dict:
+    """Quita los DataFrames de las métricas históricas (no son JSON serializables)"""
+    return {k: v for k, v in historical_metrics.items() if not k.endswith("_df")}
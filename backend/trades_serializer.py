@@ -0,0 +1,107 @@
+"""
+Trades Serializer
+Serialización columnar (vectorizada) de los trades cerrados y paginación por
+cursor sobre el tiempo de cierre, para /trades/history. Un trade es una fila
+cerrada de la tabla de posiciones (position_lifecycle.build_positions): las
+salidas parciales, reversiones (INOUT) y cierres por opuesta (OUT_BY) quedan
+dentro de su posición o tramo.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TRADE_FIELDS = ["position_id", "leg", "symbol", "type", "volume", "price_open", "price_close",
+                "open_time", "close_time", "duration_minutes", "profit", "commission", "swap", "net_profit"]
+
+
+def encode_cursor(time_ns: int, position_id: int, leg: int) -> str:
+    """Cursor opaco: posición (tiempo de cierre, position_id, tramo) del último trade entregado"""
+    return f"{int(time_ns)}_{int(position_id)}_{int(leg)}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, int]:
+    try:
+        time_ns, position_id, leg = cursor.split("_", 2)
+        return int(time_ns), int(position_id), int(leg)
+    except (ValueError, AttributeError):
+        raise ValueError(f"Cursor inválido: {cursor}")
+
+
+def paginate_closed_trades(positions_df: pd.DataFrame, limit: int, cursor: Optional[str] = None) -> Dict:
+    """
+    Selecciona una página de posiciones cerradas (positions_df de
+    build_positions) ordenadas por tiempo de cierre descendente (y
+    position_id y tramo descendentes para desempatar).
+
+    Returns:
+        {"page": DataFrame, "next_cursor": str | None, "total_available": int}
+    """
+    closed = positions_df[positions_df["status"] == "closed"]
+    time_ns = closed["close_time"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    position_ids = closed["position_id"].to_numpy(dtype=np.int64)
+    legs = closed["leg"].to_numpy(dtype=np.int64)
+
+    # Orden descendente por (close_time, position_id, leg)
+    order = np.lexsort((legs, position_ids, time_ns))[::-1]
+    time_ns = time_ns[order]
+    position_ids = position_ids[order]
+    legs = legs[order]
+
+    start = 0
+    if cursor:
+        cursor_time, cursor_position, cursor_leg = decode_cursor(cursor)
+        # Primer trade estrictamente posterior al cursor en el orden descendente
+        same_time = time_ns == cursor_time
+        after = (time_ns < cursor_time) | (same_time & (position_ids < cursor_position)) | \
+            (same_time & (position_ids == cursor_position) & (legs < cursor_leg))
+        start = int(np.argmax(after)) if after.any() else len(order)
+
+    end = min(start + max(limit, 0), len(order))
+    page = closed.iloc[order[start:end]]
+
+    next_cursor = None
+    if end < len(order) and end > start:
+        next_cursor = encode_cursor(time_ns[end - 1], position_ids[end - 1], legs[end - 1])
+
+    return {"page": page, "next_cursor": next_cursor, "total_available": int(len(order))}
+
+
+def _times(series: pd.Series) -> List[Optional[str]]:
+    """ISO sin zona; NaT (apertura fuera de la ventana) -> None"""
+    text = series.dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return text.astype(object).where(series.notna(), None).tolist()
+
+
+def _floats(series: pd.Series, decimals: int = None) -> List[Optional[float]]:
+    """Floats JSON nativos; NaN (precio o duración desconocidos) -> None"""
+    values = series.astype(float)
+    if decimals is not None:
+        values = values.round(decimals)
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def trades_to_columns(page: pd.DataFrame) -> Dict[str, List]:
+    """Convierte los trades a un dict de arrays (JSON nativo, sin bucles por fila)"""
+    return {
+        "position_id": page["position_id"].astype(np.int64).tolist(),
+        "leg": page["leg"].astype(np.int64).tolist(),
+        "symbol": page["symbol"].astype(str).tolist(),
+        "type": page["type"].astype(str).tolist(),
+        "volume": _floats(page["closed_volume"]),
+        "price_open": _floats(page["price_open"]),
+        "price_close": _floats(page["price_close"]),
+        "open_time": _times(page["open_time"]),
+        "close_time": _times(page["close_time"]),
+        "duration_minutes": _floats(page["duration_minutes"], 2),
+        "profit": _floats(page["profit"]),
+        "commission": _floats(page["commission"]),
+        "swap": _floats(page["swap"]),
+        "net_profit": _floats(page["net_profit"])
+    }
+
+
+def columns_to_rows(columns: Dict[str, List]) -> List[Dict]:
+    """Formato por filas construido a partir de las columnas ya convertidas"""
+    return [dict(zip(TRADE_FIELDS, values)) for values in zip(*(columns[f] for f in TRADE_FIELDS))]
@@ -36,6 +36,18 @@ interface ApiTrade {
   time: string
 }
 
+// Mensajes de /ws/positions (snapshot al conectar, después diffs)
+interface PositionsMessage {
+  type: 'snapshot' | 'diff' | 'error'
+  seq?: number
+  positions?: ApiTrade[]
+  added?: ApiTrade[]
+  removed?: number[]
+  changed?: ApiTrade[]
+  summary?: { positions: number; floating_profit: number }
+  error?: string
+}
+
 interface AnalysisResult {
   summary: {
     total_trades: number
@@ -134,6 +146,8 @@ interface AnalysisResult {
     trading_style: string
     risk_profile: string
   }
+  ai_job_id?: string
+  ai_status?: 'pending' | 'completed' | 'failed'
 }
 
 interface StrategyCode {
@@ -167,6 +181,7 @@ export default function Home() {
   const [selectedSymbol, setSelectedSymbol] = useState<string>('')
   const [useBasicAnalysis, setUseBasicAnalysis] = useState(false)
   const [exportingStrategy, setExportingStrategy] = useState(false)
+  const [livePositions, setLivePositions] = useState(false)
 
   const analyzeAccount = async () => {
     setLoading(true)
@@ -181,12 +196,16 @@ export default function Home() {
       if (result.error) {
         setConnectionError(result.error)
         setData(null)
+        setLivePositions(false)
       } else {
         console.log(`API Response (${useBasicAnalysis ? 'Basic' : 'Full'} Analysis):`, result)
         setData(result)
+        setLivePositions(true)
         
-        // Log de datos IA si está disponible
-        if (!useBasicAnalysis && result.ai_analysis?.ai_powered) {
+        // El análisis IA llega después por SSE (trabajo en segundo plano)
+        if (result.ai_job_id) {
+          subscribeToAIJob(result.ai_job_id)
+        } else if (!useBasicAnalysis && result.ai_analysis?.ai_powered) {
           console.log('✅ Análisis con IA activado:', result.ai_analysis.strategy_name)
           console.log('📊 Confianza:', result.ai_analysis.confidence_score + '%')
         } else if (useBasicAnalysis) {
@@ -202,6 +221,35 @@ export default function Home() {
     setLoading(false)
   }
 
+  const subscribeToAIJob = (jobId: string) => {
+    const source = new EventSource(`${process.env.NEXT_PUBLIC_API_BASE}/jobs/${jobId}/events`)
+    
+    source.addEventListener('ai_analysis', (event) => {
+      const payload = JSON.parse((event as MessageEvent).data)
+      // Solo los campos que rellena la IA: P&L y posiciones siguen llegando por /ws/positions
+      const { strategy, strategy_description, indicators, trading_style, risk_profile } = payload.summary
+      setData(prev => prev && prev.ai_job_id === jobId
+        ? {
+            ...prev,
+            summary: { ...prev.summary, strategy, strategy_description, indicators, trading_style, risk_profile },
+            ai_analysis: payload.ai_analysis,
+            ai_status: 'completed'
+          }
+        : prev)
+      if (payload.ai_analysis?.ai_powered) {
+        console.log('✅ Análisis con IA activado:', payload.ai_analysis.strategy_name)
+        console.log('📊 Confianza:', payload.ai_analysis.confidence_score + '%')
+      }
+    })
+    source.addEventListener('error', () => {
+      setData(prev => prev && prev.ai_job_id === jobId && prev.ai_status === 'pending'
+        ? { ...prev, ai_status: 'failed' }
+        : prev)
+      source.close()
+    })
+    source.addEventListener('done', () => source.close())
+  }
+
   const exportStrategy = async () => {
     if (!data?.summary?.strategy) {
       alert('No hay estrategia detectada para exportar')
@@ -313,6 +361,7 @@ export default function Home() {
     const totalProfit = demoTrades.reduce((sum, t) => sum + t.profit, 0)
     const wins = demoTrades.filter(t => t.profit > 0).length
 
+    setLivePositions(false)
     setData({
       summary: {
         total_trades: demoTrades.length,
@@ -556,6 +605,51 @@ ${implementationGuide}
     return chart
   }
 
+  // Posiciones abiertas en tiempo real: tras un análisis las operaciones y el
+  // P&L se actualizan con los diffs de /ws/positions en lugar de re-consultar /analyze
+  useEffect(() => {
+    if (!livePositions) return
+    const wsUrl = `${process.env.NEXT_PUBLIC_API_BASE}`.replace(/^http/, 'ws') + '/ws/positions'
+    const socket = new WebSocket(wsUrl)
+
+    socket.onmessage = (event) => {
+      const message: PositionsMessage = JSON.parse(event.data)
+      if (message.type === 'error') {
+        console.warn('⚠️ Feed de posiciones:', message.error)
+        return
+      }
+      setData(prev => {
+        if (!prev) return prev
+        let trades: ApiTrade[]
+        if (message.type === 'snapshot') {
+          trades = message.positions || []
+        } else {
+          const removed = new Set(message.removed || [])
+          const changed = new Map((message.changed || []).map(t => [t.ticket, t]))
+          trades = prev.trades
+            .filter(t => !removed.has(t.ticket))
+            .map(t => changed.get(t.ticket) || t)
+            .concat(message.added || [])
+        }
+        const total = message.summary?.positions ?? trades.length
+        const netProfit = message.summary?.floating_profit ?? trades.reduce((sum, t) => sum + t.profit, 0)
+        return {
+          ...prev,
+          trades,
+          summary: {
+            ...prev.summary,
+            total_trades: total,
+            net_profit: netProfit,
+            avg_profit: total ? netProfit / total : 0
+          }
+        }
+      })
+    }
+    socket.onerror = () => console.warn('⚠️ No se pudo conectar a /ws/positions')
+
+    return () => socket.close()
+  }, [livePositions])
+
   // Cargar datos del backend cuando se cambia a la vista de control
   useEffect(() => {
     if (activeView === 'control') {
@@ -30,19 +30,49 @@ export function StrategyOptimizationModal({
   const [result, setResult] = useState<OptimizationResult | null>(null)
   const [error, setError] = useState<string | null>(null)
 
+  // Aplica un evento SSE de /strategy/optimize/stream al resultado parcial
+  const applyStreamEvent = (partial: OptimizationResult, event: string, data: any): OptimizationResult => {
+    switch (event) {
+      case 'delta':
+        if (data.field === 'reasoning') {
+          return { ...partial, reasoning: partial.reasoning + data.text }
+        }
+        return partial
+      case 'item':
+        if (data.field === 'optimized_parameters') {
+          return { ...partial, optimized_parameters: { ...partial.optimized_parameters, [data.key]: data.value } }
+        }
+        if (data.field === 'warnings') {
+          return { ...partial, warnings: [...partial.warnings, data.value] }
+        }
+        return partial
+      case 'result':
+        return {
+          ...partial,
+          optimized_parameters: data.optimized_parameters || {},
+          reasoning: data.reasoning || '',
+          warnings: data.warnings || [],
+          ai_powered: data.ai_powered
+        }
+      default:
+        return partial
+    }
+  }
+
   const handleOptimize = async () => {
     setLoading(true)
     setError(null)
+    setResult(null)
     
     try {
       const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_BASE}/strategy/optimize-enhanced`,
+        `${process.env.NEXT_PUBLIC_API_BASE}/strategy/optimize/stream`,
         {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
             strategy_name: strategyData.summary.strategy,
-            current_metrics: {
+            current_performance: {
               win_rate: strategyData.summary.win_rate || 0,
               profit_factor: strategyData.summary.profit_factor || 0,
               total_trades: strategyData.summary.total_trades || 0,
@@ -55,13 +85,49 @@ export function StrategyOptimizationModal({
         }
       )
 
-      const data = await response.json()
-      
-      if (data.error) {
-        setError(data.error)
-      } else {
-        setResult(data)
-        onOptimize(data)
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`)
+      }
+
+      // Los campos se muestran según llegan: reasoning token a token,
+      // parámetros y advertencias en cuanto cada uno está completo
+      let partial: OptimizationResult = {
+        strategy_name: strategyData.summary.strategy,
+        original_parameters: {},
+        optimized_parameters: {},
+        reasoning: '',
+        expected_improvements: [],
+        warnings: [],
+        confidence_score: 0,
+        ai_powered: true
+      }
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const messages = buffer.split('\n\n')
+        buffer = messages.pop() || ''
+
+        for (const message of messages) {
+          const event = message.match(/^event: (.*)$/m)?.[1]
+          const payload = message.match(/^data: (.*)$/m)?.[1]
+          if (!event || !payload) continue
+          const data = JSON.parse(payload)
+
+          if (event === 'error') {
+            setError(data.error)
+            continue
+          }
+          partial = applyStreamEvent(partial, event, data)
+          setResult(partial)
+          if (event === 'result') {
+            onOptimize(partial)
+          }
+        }
       }
     } catch (err) {
       setError('Error al conectar con el servidor. Asegúrate de que el backend esté corriendo.')
@@ -144,7 +210,9 @@ export function StrategyOptimizationModal({
                     <h3 className="text-xl font-bold text-white mb-1">
                       {result.strategy_name}
                     </h3>
-                    <p className="text-zinc-400 text-sm">Análisis completado por IA</p>
+                    <p className="text-zinc-400 text-sm">
+                      {loading ? '🔄 Recibiendo respuesta de la IA...' : 'Análisis completado por IA'}
+                    </p>
                   </div>
                   <div className="text-right">
                     <div className="text-sm text-zinc-400 mb-1">Confianza</div>
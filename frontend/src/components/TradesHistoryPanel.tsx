@@ -5,15 +5,27 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 import { Button } from "@/components/ui/button"
 
 interface Trade {
-  ticket: number
+  position_id: number
+  leg: number
   symbol: string
   type: string
   volume: number
-  price: number
+  price_open: number | null
+  price_close: number | null
+  open_time: string | null
+  close_time: string
+  duration_minutes: number | null
   profit: number
-  time: string
   commission: number
   swap: number
+  net_profit: number
+}
+
+function formatDuration(minutes: number | null) {
+  if (minutes === null) return '-'
+  if (minutes < 60) return `${minutes.toFixed(0)}m`
+  const hours = Math.floor(minutes / 60)
+  return hours < 24 ? `${hours}h ${Math.round(minutes % 60)}m` : `${Math.floor(hours / 24)}d ${hours % 24}h`
 }
 
 interface TradesHistoryProps {
@@ -27,13 +39,13 @@ export function TradesHistoryPanel({ data, loading, onRefresh, total }: TradesHi
   const [filter, setFilter] = useState<'all' | 'profit' | 'loss'>('all')
 
   const filteredData = data.filter(trade => {
-    if (filter === 'profit') return trade.profit > 0
-    if (filter === 'loss') return trade.profit < 0
+    if (filter === 'profit') return trade.net_profit > 0
+    if (filter === 'loss') return trade.net_profit < 0
     return true
   })
 
-  const totalProfit = data.reduce((sum, trade) => sum + trade.profit, 0)
-  const winRate = data.length > 0 ? (data.filter(t => t.profit > 0).length / data.length * 100) : 0
+  const totalProfit = data.reduce((sum, trade) => sum + trade.net_profit, 0)
+  const winRate = data.length > 0 ? (data.filter(t => t.net_profit > 0).length / data.length * 100) : 0
 
   return (
     <Card className="bg-zinc-900 border-zinc-800 hover:border-orange-500/50 transition-all duration-300">
@@ -81,13 +93,13 @@ export function TradesHistoryPanel({ data, loading, onRefresh, total }: TradesHi
             onClick={() => setFilter('profit')}
             className={`${filter === 'profit' ? 'bg-green-600' : 'bg-zinc-800 border border-zinc-700'} hover:bg-green-700`}
           >
-            Ganadores ({data.filter(t => t.profit > 0).length})
+            Ganadores ({data.filter(t => t.net_profit > 0).length})
           </Button>
           <Button
             onClick={() => setFilter('loss')}
             className={`${filter === 'loss' ? 'bg-red-600' : 'bg-zinc-800 border border-zinc-700'} hover:bg-red-700`}
           >
-            Perdedores ({data.filter(t => t.profit < 0).length})
+            Perdedores ({data.filter(t => t.net_profit < 0).length})
           </Button>
         </div>
 
@@ -103,35 +115,41 @@ export function TradesHistoryPanel({ data, loading, onRefresh, total }: TradesHi
               <thead className="sticky top-0 bg-zinc-900">
                 <tr className="border-b border-zinc-800">
                   <th className="text-left text-zinc-400 py-2">#</th>
-                  <th className="text-left text-zinc-400 py-2">Ticket</th>
+                  <th className="text-left text-zinc-400 py-2">Posición</th>
                   <th className="text-left text-zinc-400 py-2">Símbolo</th>
                   <th className="text-left text-zinc-400 py-2">Tipo</th>
                   <th className="text-left text-zinc-400 py-2">Volumen</th>
-                  <th className="text-left text-zinc-400 py-2">Precio</th>
-                  <th className="text-left text-zinc-400 py-2">P/L</th>
+                  <th className="text-left text-zinc-400 py-2">Apertura</th>
+                  <th className="text-left text-zinc-400 py-2">Cierre</th>
+                  <th className="text-left text-zinc-400 py-2">P/L Neto</th>
                   <th className="text-left text-zinc-400 py-2">Comisión</th>
                   <th className="text-left text-zinc-400 py-2">Swap</th>
-                  <th className="text-left text-zinc-400 py-2">Fecha/Hora</th>
+                  <th className="text-left text-zinc-400 py-2">Duración</th>
+                  <th className="text-left text-zinc-400 py-2">Cerrada</th>
                 </tr>
               </thead>
               <tbody>
                 {filteredData.map((trade, index) => (
-                  <tr key={trade.ticket} className="border-b border-zinc-800 hover:bg-zinc-800/30 transition-colors">
+                  <tr key={`${trade.position_id}-${trade.leg}`} className="border-b border-zinc-800 hover:bg-zinc-800/30 transition-colors">
                     <td className="text-zinc-300 py-2">{index + 1}</td>
-                    <td className="text-zinc-300 py-2 font-mono">{trade.ticket}</td>
+                    <td className="text-zinc-300 py-2 font-mono">
+                      {trade.position_id}{trade.leg > 0 ? ` #${trade.leg + 1}` : ''}
+                    </td>
                     <td className="text-zinc-300 py-2 font-semibold">{trade.symbol}</td>
                     <td className={`py-2 font-semibold ${trade.type === 'BUY' ? 'text-green-500' : 'text-red-500'}`}>
                       {trade.type}
                     </td>
                     <td className="text-zinc-300 py-2">{trade.volume}</td>
-                    <td className="text-zinc-300 py-2 font-mono">{trade.price.toFixed(5)}</td>
-                    <td className={`py-2 font-semibold ${trade.profit >= 0 ? 'text-green-500' : 'text-red-500'}`}>
-                      ${trade.profit.toFixed(2)}
+                    <td className="text-zinc-300 py-2 font-mono">{trade.price_open?.toFixed(5) ?? '-'}</td>
+                    <td className="text-zinc-300 py-2 font-mono">{trade.price_close?.toFixed(5) ?? '-'}</td>
+                    <td className={`py-2 font-semibold ${trade.net_profit >= 0 ? 'text-green-500' : 'text-red-500'}`}>
+                      ${trade.net_profit.toFixed(2)}
                     </td>
                     <td className="text-zinc-400 py-2">${trade.commission.toFixed(2)}</td>
                     <td className="text-zinc-400 py-2">${trade.swap.toFixed(2)}</td>
+                    <td className="text-zinc-400 py-2">{formatDuration(trade.duration_minutes)}</td>
                     <td className="text-zinc-400 py-2 text-xs">
-                      {new Date(trade.time).toLocaleString('es-ES')}
+                      {new Date(trade.close_time).toLocaleString('es-ES')}
                     </td>
                   </tr>
                 ))}